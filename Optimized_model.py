@@ -3,28 +3,31 @@ Script para optimizar YOLO11s a TensorRT para Jetson Nano
 Asegúrate de tener instalado: ultralytics, torch
 """
 
-from ultralytics import YOLO
-import torch
-
-def optimize_model_for_jetson(model_path, output_name="yolo11s_optimized"):
+def optimize_model_for_jetson(model_path, output_name="yolo11s_optimized", videos_calibracion=None,
+                              validacion=None):
     """
     Convierte el modelo YOLO11s a diferentes formatos optimizados
     
     Args:
         model_path: Ruta al modelo .pt original
         output_name: Nombre base para los archivos de salida
+        videos_calibracion: Carpeta de videos de obra para la cuantización INT8 (None = omitir)
+        validacion: Conjunto etiquetado (images/ + labels/) para el reporte INT8 vs FP32
     """
     
     print("=" * 60)
     print("OPTIMIZACIÓN DE YOLO11s PARA JETSON NANO")
     print("=" * 60)
     
+    from ultralytics import YOLO
+
     # Cargar el modelo
     print(f"\n1. Cargando modelo desde: {model_path}")
     model = YOLO(model_path)
     
     # Opción 1: Exportar a ONNX (Intermedio, recomendado primero)
     print("\n2. Exportando a ONNX...")
+    onnx_path = None
     try:
         onnx_path = model.export(
             format="onnx",
@@ -36,18 +39,27 @@ def optimize_model_for_jetson(model_path, output_name="yolo11s_optimized"):
     except Exception as e:
         print(f"   ✗ Error exportando ONNX: {e}")
     
+    # Opción INT8: ONNX cuantizado para equipos sólo-CPU (onnxruntime)
+    int8_path = None
+    if videos_calibracion and onnx_path:
+        print("\n2b. Cuantizando ONNX a INT8 (calibración con videos de obra)...")
+        try:
+            from cuantizacion import cuantizar_int8, reporte_cuantizacion
+            int8_path = cuantizar_int8(onnx_path, videos_calibracion)
+            if validacion:
+                reporte_cuantizacion(onnx_path, int8_path, validacion,
+                                     salida_json=f"{output_name}_int8_reporte.json")
+        except Exception as e:
+            print(f"   ✗ Error cuantizando a INT8: {e}")
+    
     # Opción 2: Exportar a TensorRT (Mejor rendimiento en Jetson)
     # NOTA: Esto debe ejecutarse EN LA JETSON NANO para mejor compatibilidad
     print("\n3. Exportando a TensorRT...")
     print("   IMPORTANTE: Para mejores resultados, ejecuta esto en la Jetson Nano")
     try:
-        engine_path = model.export(
-            format="engine",  # TensorRT
-            half=True,  # FP16 para mejor velocidad en Jetson
-            workspace=4,  # GB de memoria de trabajo
-            verbose=False,
-            simplify=True
-        )
+        # Caché por hash del modelo + imgsz + precisión: no se reconstruye tras reiniciar
+        from cache_motores import motor_en_cache
+        engine_path = motor_en_cache(model_path, imgsz=640, precision="fp16", formato="engine")
         print(f"   ✓ Motor TensorRT guardado: {engine_path}")
     except Exception as e:
         print(f"   ✗ Error exportando TensorRT: {e}")
@@ -75,6 +87,8 @@ def optimize_model_for_jetson(model_path, output_name="yolo11s_optimized"):
     print("RESUMEN DE ARCHIVOS GENERADOS:")
     print("=" * 60)
     print(f"1. {output_name}.onnx - Modelo ONNX (usa este si TensorRT falla)")
+    if int8_path:
+        print(f"   {int8_path} - Modelo INT8 para CPU (onnxruntime)")
     print(f"2. {output_name}.engine - Motor TensorRT (mejor rendimiento)")
     print(f"3. {output_name}_classes.json - Información de clases")
     
@@ -92,17 +106,13 @@ def optimize_model_for_jetson(model_path, output_name="yolo11s_optimized"):
 def convert_onnx_to_tensorrt_on_jetson(onnx_path):
     """
     Ejecutar SOLO en Jetson Nano para convertir ONNX a TensorRT
+    El motor queda en la caché (cache_motores.py) y se reutiliza en los reinicios
     """
     print("\n🚀 Conversión ONNX → TensorRT en Jetson Nano")
     
     try:
-        model = YOLO(onnx_path)
-        engine_path = model.export(
-            format="engine",
-            half=True,  # FP16
-            workspace=2,  # Reducido para Jetson Nano
-            verbose=True
-        )
+        from cache_motores import motor_en_cache
+        engine_path = motor_en_cache(onnx_path, precision="fp16", formato="engine")
         print(f"✓ Motor TensorRT creado: {engine_path}")
         return engine_path
     except Exception as e:
@@ -112,18 +122,22 @@ def convert_onnx_to_tensorrt_on_jetson(onnx_path):
 
 if __name__ == "__main__":
     import sys
+    from cache_motores import es_jetson
     
     # Configuración
     MODEL_PATH = "yolo11s.pt"  # Cambia esto a la ruta de tu modelo
     
     if len(sys.argv) > 1:
         MODEL_PATH = sys.argv[1]
+    # Opcional: carpeta de videos para INT8 y conjunto etiquetado para el reporte
+    VIDEOS_CALIBRACION = sys.argv[2] if len(sys.argv) > 2 else None
+    VALIDACION = sys.argv[3] if len(sys.argv) > 3 else None
     
     print(f"\n📦 Modelo a optimizar: {MODEL_PATH}")
-    print(f"💻 Plataforma actual: {'Jetson' if torch.cuda.is_available() else 'PC'}")
+    print(f"💻 Plataforma actual: {'Jetson' if es_jetson() else 'PC'}")
     
     # Ejecutar optimización
-    optimize_model_for_jetson(MODEL_PATH, "yolo11s_jetson")
+    optimize_model_for_jetson(MODEL_PATH, "yolo11s_jetson", VIDEOS_CALIBRACION, VALIDACION)
     
     print("\n✅ Proceso completado!")
     print("\nPara ejecutar la conversión en Jetson Nano desde ONNX:")
@@ -0,0 +1,340 @@
+"""
+Subsistema de actuadores para el control de acceso EPP
+Un hilo dedicado es dueño del servo, la LCD y los pines GPIO, de modo que
+el bucle de captura/inferencia nunca se bloquea esperando al hardware.
+"""
+
+import queue
+import threading
+import time
+
+
+class HardwareJetson:
+    """Backend real: LCD I2C, servo PWM y pines de señal de la Jetson Nano"""
+
+    def __init__(self, servo_pin, pines_detectado, pines_no_detectado, lcd_address=0x27):
+        self.servo_pin = servo_pin
+        self.pines_detectado = list(pines_detectado)
+        self.pines_no_detectado = list(pines_no_detectado)
+        self.lcd_address = lcd_address
+        self.lcd = None
+        self.servo_pwm = None
+
+    def inicializar(self):
+        """Inicializa LCD, Servo y GPIO"""
+        try:
+            # Inicializar I2C para LCD
+            import board
+            import busio
+            from adafruit_character_lcd.character_lcd_i2c import Character_LCD_I2C
+
+            i2c = busio.I2C(board.SCL, board.SDA)
+            self.lcd = Character_LCD_I2C(i2c, 16, 2, self.lcd_address)  # LCD 16x2
+            self.lcd.clear()
+            self.lcd.message = "Sistema EPP\nIniciando..."
+
+            # Inicializar GPIO
+            import Jetson.GPIO as GPIO
+            GPIO.setmode(GPIO.BCM)
+
+            # Configurar servo
+            GPIO.setup(self.servo_pin, GPIO.OUT)
+            self.servo_pwm = GPIO.PWM(self.servo_pin, 50)  # 50Hz para servo
+            self.servo_pwm.start(0)
+
+            # Configurar pines de detección
+            for pin in self.pines_detectado:
+                GPIO.setup(pin, GPIO.OUT, initial=GPIO.LOW)
+            for pin in self.pines_no_detectado:
+                GPIO.setup(pin, GPIO.OUT, initial=GPIO.LOW)
+
+            return True
+        except Exception as e:
+            print(f"⚠️  Hardware no disponible: {e}")
+            self.lcd = None
+            self.servo_pwm = None
+            return False
+
+    def mostrar_lcd(self, linea1, linea2=""):
+        """Muestra mensaje en LCD 16x2"""
+        if self.lcd:
+            try:
+                self.lcd.clear()
+                self.lcd.message = f"{linea1[:16]}\n{linea2[:16]}"
+            except:
+                pass
+
+    def mover_puerta(self, abrir):
+        """Mueve el servo a 90 grados (abrir) o 0 grados (cerrar)"""
+        if self.servo_pwm:
+            try:
+                # Ciclo de trabajo: ~7.5% para 90 grados, ~2.5% para 0 grados
+                self.servo_pwm.ChangeDutyCycle(7.5 if abrir else 2.5)
+                time.sleep(1)
+                self.servo_pwm.ChangeDutyCycle(0)  # Detener señal
+            except:
+                pass
+
+    def pines_acceso(self, permitido):
+        """Pone en HIGH los pines de acceso permitido o los de acceso denegado"""
+        try:
+            import Jetson.GPIO as GPIO
+            alto, bajo = ((self.pines_detectado, self.pines_no_detectado) if permitido
+                          else (self.pines_no_detectado, self.pines_detectado))
+            for pin in bajo:
+                GPIO.output(pin, GPIO.LOW)
+            for pin in alto:
+                GPIO.output(pin, GPIO.HIGH)
+        except:
+            pass
+
+    def apagar_pines(self):
+        """Pone en LOW todos los pines de señal"""
+        try:
+            import Jetson.GPIO as GPIO
+            for pin in self.pines_detectado + self.pines_no_detectado:
+                GPIO.output(pin, GPIO.LOW)
+        except:
+            pass
+
+    def limpiar(self):
+        """Limpia la configuración GPIO"""
+        try:
+            import Jetson.GPIO as GPIO
+            GPIO.cleanup()
+        except:
+            pass
+
+
+class HardwareMock:
+    """Backend simulado para pruebas y benchmarks en un Linux sin GPIO
+
+    Reproduce los tiempos aproximados del hardware real (pulso de servo de
+    1 s, LCD I2C de algunos milisegundos) y cuenta cada operación.
+    """
+
+    def __init__(self, t_servo=1.0, t_lcd=0.02, t_gpio=0.0005, verbose=False):
+        self.t_servo = t_servo
+        self.t_lcd = t_lcd
+        self.t_gpio = t_gpio
+        self.verbose = verbose
+        self.operaciones = {'lcd': 0, 'puerta': 0, 'pines': 0}
+        self.puerta_abierta = False
+        self.pines_permitido = None
+        self.texto_lcd = ("", "")
+
+    def inicializar(self):
+        return True
+
+    def mostrar_lcd(self, linea1, linea2=""):
+        time.sleep(self.t_lcd)
+        self.texto_lcd = (linea1[:16], linea2[:16])
+        self.operaciones['lcd'] += 1
+        if self.verbose:
+            print(f"   [LCD] {self.texto_lcd[0]} | {self.texto_lcd[1]}")
+
+    def mover_puerta(self, abrir):
+        time.sleep(self.t_servo)
+        self.puerta_abierta = abrir
+        self.operaciones['puerta'] += 1
+        if self.verbose:
+            print(f"   [SERVO] {'Abierta' if abrir else 'Cerrada'}")
+
+    def pines_acceso(self, permitido):
+        time.sleep(self.t_gpio * 8)
+        self.pines_permitido = permitido
+        self.operaciones['pines'] += 1
+
+    def apagar_pines(self):
+        time.sleep(self.t_gpio * 8)
+        self.pines_permitido = None
+        self.operaciones['pines'] += 1
+
+    def limpiar(self):
+        pass
+
+
+class ActuadorPuerta:
+    """Hilo trabajador con cola de comandos para servo, LCD y pines
+
+    Los comandos se encolan sin bloquear. El hilo vacía la cola, fusiona los
+    comandos del mismo tipo (gana el último) y sólo ejecuta los que cambian
+    el estado ya aplicado en el hardware.
+    """
+
+    # Orden de aplicación: el servo va al final porque es el más lento
+    ORDEN = ('pines', 'lcd', 'puerta')
+
+    def __init__(self, backend, metricas=None):
+        self.backend = backend
+        self.metricas = metricas      # MetricasFuente: etapa 'actuador' por comando ejecutado
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._aplicado = {}
+        self.recibidos = 0
+        self.fusionados = 0
+        self.ejecutados = 0
+
+    def iniciar(self):
+        """Arranca el hilo trabajador"""
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, name="ActuadorPuerta", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self, limpiar=True, timeout=5.0):
+        """Procesa los comandos pendientes, detiene el hilo y libera el hardware"""
+        if self._hilo is None:
+            return
+        self._cola.put(('fin', limpiar))
+        self._hilo.join(timeout)
+        self._hilo = None
+
+    def esperar(self):
+        """Bloquea hasta que todos los comandos encolados se hayan procesado"""
+        self._cola.join()
+
+    # ------------------------------------------------------------------
+    # Comandos (no bloqueantes)
+    # ------------------------------------------------------------------
+
+    def lcd(self, linea1, linea2=""):
+        self._enviar('lcd', (linea1[:16], linea2[:16]))
+
+    def puerta(self, abrir):
+        self._enviar('puerta', bool(abrir))
+
+    def pines(self, permitido):
+        self._enviar('pines', permitido)
+
+    def apagar_pines(self):
+        self._enviar('pines', None)
+
+    def acceso(self, permitido, linea1, linea2=""):
+        """Atajo: pines + LCD + puerta para una decisión de acceso"""
+        self.pines(permitido)
+        self.lcd(linea1, linea2)
+        self.puerta(permitido)
+
+    def _enviar(self, tipo, valor):
+        self.recibidos += 1
+        self._cola.put((tipo, valor))
+
+    # ------------------------------------------------------------------
+    # Hilo trabajador
+    # ------------------------------------------------------------------
+
+    def _bucle(self):
+        while True:
+            lote = [self._cola.get()]
+            while True:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+
+            pendientes = {}
+            fin = None
+            for tipo, valor in lote:
+                if tipo == 'fin':
+                    fin = valor
+                    continue
+                if tipo in pendientes:
+                    self.fusionados += 1
+                pendientes[tipo] = valor
+
+            for tipo in self.ORDEN:
+                if tipo in pendientes:
+                    self._aplicar(tipo, pendientes[tipo])
+
+            if fin:
+                self.backend.limpiar()
+
+            for _ in lote:
+                self._cola.task_done()
+
+            if fin is not None:
+                return
+
+    def _aplicar(self, tipo, valor):
+        if self._aplicado.get(tipo, object()) == valor:
+            self.fusionados += 1
+            return
+        t0 = time.perf_counter()
+        try:
+            if tipo == 'lcd':
+                self.backend.mostrar_lcd(*valor)
+            elif tipo == 'puerta':
+                self.backend.mover_puerta(valor)
+            elif tipo == 'pines':
+                if valor is None:
+                    self.backend.apagar_pines()
+                else:
+                    self.backend.pines_acceso(valor)
+            self._aplicado[tipo] = valor
+            self.ejecutados += 1
+            if self.metricas is not None:
+                self.metricas.observar('actuador', time.perf_counter() - t0)
+        except Exception as e:
+            print(f"⚠️  Error en actuador ({tipo}): {e}")
+
+
+def _bucle_simulado(frames, t_inferencia, cambio_cada, aplicar):
+    """Simula el bucle de detección: inferencia + decisión de acceso por frame"""
+    inicio = time.perf_counter()
+    for i in range(frames):
+        time.sleep(t_inferencia)
+        permitido = (i // cambio_cada) % 2 == 0
+        aplicar(permitido)
+    return time.perf_counter() - inicio
+
+
+def benchmark(frames=30, fps_modelo=30.0, cambio_cada=10, t_servo=1.0):
+    """Compara el bucle síncrono original contra el actuador en segundo plano"""
+    t_inferencia = 1.0 / fps_modelo
+
+    print("=" * 60)
+    print(" " * 12 + "⏱️  BENCHMARK ACTUADOR (MOCK)")
+    print("=" * 60)
+    print(f"\nFrames: {frames} | Modelo: {fps_modelo:.0f} FPS | Servo: {t_servo}s")
+    print(f"Cambio de decisión cada {cambio_cada} frames\n")
+
+    # Síncrono: pines + LCD + servo en el hilo de inferencia en cada frame
+    sync = HardwareMock(t_servo=t_servo)
+
+    def aplicar_sync(permitido):
+        sync.pines_acceso(permitido)
+        sync.mostrar_lcd("ACCESO PERMITIDO" if permitido else "ACCESO DENEGADO")
+        sync.mover_puerta(permitido)
+
+    t_sync = _bucle_simulado(frames, t_inferencia, cambio_cada, aplicar_sync)
+
+    # Asíncrono: comandos encolados y fusionados por el hilo actuador
+    asinc = HardwareMock(t_servo=t_servo)
+    actuador = ActuadorPuerta(asinc).iniciar()
+
+    def aplicar_async(permitido):
+        actuador.acceso(permitido, "ACCESO PERMITIDO" if permitido else "ACCESO DENEGADO")
+
+    t_async = _bucle_simulado(frames, t_inferencia, cambio_cada, aplicar_async)
+    actuador.esperar()
+    actuador.detener()
+
+    print(f"🐢 Síncrono:   {frames / t_sync:6.2f} FPS | operaciones HW: {sync.operaciones}")
+    print(f"🚀 Asíncrono:  {frames / t_async:6.2f} FPS | operaciones HW: {asinc.operaciones}")
+    print(f"   Comandos: {actuador.recibidos} recibidos, {actuador.fusionados} fusionados, "
+          f"{actuador.ejecutados} ejecutados")
+    return {'fps_sync': frames / t_sync, 'fps_async': frames / t_async}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark del actuador con backend simulado")
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--fps-modelo", type=float, default=30.0)
+    parser.add_argument("--cambio-cada", type=int, default=10)
+    parser.add_argument("--t-servo", type=float, default=1.0)
+    args = parser.parse_args()
+
+    benchmark(args.frames, args.fps_modelo, args.cambio_cada, args.t_servo)
@@ -0,0 +1,420 @@
+"""
+Sistema de Alerta de EPP Faltante
+Motor de reglas sobre el flujo de detecciones: cada regla declarativa
+("NO-Hardhat en una persona seguida durante más de 2 s", "Fall-Detected en
+cualquier momento") se evalúa de forma incremental con una ventana temporal
+deslizante por persona (O(1) amortizado por frame y regla). El enfriamiento
+y la deduplicación evitan que una misma infracción dispare una alerta por
+frame. Las alertas se publican en la cola de eventos (las caídas con
+prioridad) y, si hay almacén, quedan guardadas junto con las detecciones.
+"""
+
+import collections
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from asociacion_epp import AsociadorEPP, detecciones_de_resultado
+from seguimiento import RastreadorPersonas
+
+
+RUTA_REGLAS = "reglas_alertas.json"
+
+REGLAS_POR_DEFECTO = [
+    {"nombre": "sin_casco", "clase": "NO-Hardhat", "por_persona": True, "duracion": 2.0, "nivel": "PELIGRO"},
+    {"nombre": "sin_chaleco", "clase": "NO-Safety Vest", "por_persona": True, "duracion": 2.0,
+     "nivel": "PRECAUCIÓN"},
+    {"nombre": "sin_guantes", "clase": "NO-Gloves", "por_persona": True, "duracion": 3.0, "nivel": "PRECAUCIÓN"},
+    {"nombre": "sin_gafas", "clase": "NO-Goggles", "por_persona": True, "duracion": 3.0, "nivel": "PRECAUCIÓN"},
+    {"nombre": "sin_mascarilla", "clase": "NO-Mask", "por_persona": True, "duracion": 3.0, "nivel": "PRECAUCIÓN"},
+    {"nombre": "caida", "clase": "Fall-Detected", "duracion": 0.0, "cooldown": 10.0, "nivel": "PELIGRO"},
+]
+
+
+class Regla:
+    """Regla declarativa de alerta
+
+    Args:
+        nombre: identificador de la regla
+        clase: clase del modelo ('NO-Hardhat', 'Fall-Detected'...)
+        por_persona: evaluar sobre cada persona seguida (EPP asociado a su caja);
+            False = la clase en cualquier lugar del frame
+        duracion: segundos que la condición debe sostenerse (0 = inmediata)
+        ventana: segundos de la ventana deslizante que suaviza el parpadeo del detector
+        fraccion: fracción mínima de frames positivos dentro de la ventana
+        cooldown: segundos mínimos entre dos alertas de la misma regla y persona
+            (también el intervalo de recordatorio si la infracción continúa)
+        nivel: 'PELIGRO' o 'PRECAUCIÓN'
+        ausente: con por_persona y clase NO-X, contar también a quien no tiene X detectado
+    """
+
+    def __init__(self, nombre, clase, por_persona=False, duracion=0.0, ventana=1.0, fraccion=0.6,
+                 cooldown=30.0, nivel="PRECAUCIÓN", ausente=False):
+        self.nombre = nombre
+        self.clase = clase
+        self.por_persona = por_persona
+        self.duracion = float(duracion)
+        self.ventana = float(ventana) if duracion > 0 else 0.0
+        self.fraccion = fraccion
+        self.cooldown = float(cooldown)
+        self.nivel = nivel
+        self.ausente = ausente
+
+    @classmethod
+    def desde_dict(cls, d):
+        return cls(**d)
+
+    @property
+    def epp(self):
+        """EPP asociado a la regla ('Hardhat' para 'NO-Hardhat')"""
+        return self.clase[3:] if self.clase.startswith("NO-") else self.clase
+
+    def __repr__(self):
+        ambito = "persona" if self.por_persona else "frame"
+        return f"Regla({self.nombre}: {self.clase} por {ambito} > {self.duracion:g}s)"
+
+
+class _Estado:
+    """Ventana deslizante de una (regla, clave) con conteo incremental"""
+
+    __slots__ = ('muestras', 'positivas', 'activo_desde', 'ultimo_disparo', 'ultima_vista')
+
+    def __init__(self):
+        self.muestras = collections.deque()      # (t, bool)
+        self.positivas = 0
+        self.activo_desde = None
+        self.ultimo_disparo = None
+        self.ultima_vista = None
+
+    def actualizar(self, t, valor, regla):
+        """Agrega una muestra y devuelve True si la regla debe disparar ahora"""
+        self.ultima_vista = t
+        self.muestras.append((t, valor))
+        self.positivas += valor
+        while self.muestras and t - self.muestras[0][0] > regla.ventana:
+            self.positivas -= self.muestras.popleft()[1]
+
+        if valor and self.positivas >= regla.fraccion * len(self.muestras):
+            if self.activo_desde is None:
+                self.activo_desde = t
+        elif self.positivas < regla.fraccion * len(self.muestras):
+            self.activo_desde = None
+
+        if self.activo_desde is None or t - self.activo_desde < regla.duracion:
+            return False
+        if self.ultimo_disparo is not None and t - self.ultimo_disparo < regla.cooldown:
+            return False
+        self.ultimo_disparo = t
+        return True
+
+
+class MotorReglas:
+    """Evalúa las reglas frame a frame sobre las detecciones
+
+    Args:
+        names: dict id -> nombre de clase del modelo
+        reglas: lista de Regla o de dicts (None = REGLAS_POR_DEFECTO)
+        ttl: segundos sin ver una persona antes de olvidar su estado
+    """
+
+    def __init__(self, names, reglas=None, ttl=5.0):
+        self.names = {int(k): v for k, v in names.items()}
+        ids = {v: k for k, v in self.names.items()}
+        reglas = [r if isinstance(r, Regla) else Regla.desde_dict(r) for r in (reglas or REGLAS_POR_DEFECTO)]
+        desconocidas = [r for r in reglas if r.clase not in ids]
+        for r in desconocidas:
+            print(f"⚠️  Regla '{r.nombre}' ignorada: el modelo no tiene la clase {r.clase}")
+        self.reglas = [r for r in reglas if r.clase in ids]
+        self.ttl = ttl
+
+        # Reglas por persona: un solo asociador con todo el EPP involucrado
+        self._por_persona = [r for r in self.reglas if r.por_persona]
+        requeridos = list(dict.fromkeys(r.epp for r in self._por_persona if r.epp in ids))
+        self.asociador = AsociadorEPP(self.names, requeridos) if self._por_persona else None
+        self.rastreador = RastreadorPersonas() if self._por_persona else None
+        self._columna = {r.nombre: requeridos.index(r.epp) for r in self._por_persona if r.epp in requeridos}
+
+        # Reglas de frame: presencia de la clase en cualquier caja
+        self._de_frame = [(r, ids[r.clase]) for r in self.reglas if not r.por_persona]
+
+        self._estados = {}
+        self._t_purga = None
+        self._suscriptores = []
+        self.disparadas = collections.Counter()
+        self.suprimidas = 0
+        self.frames = 0
+
+    @property
+    def ids_necesarios(self):
+        """Ids de clase que el detector debe conservar para evaluar las reglas"""
+        ids = set(self.asociador.ids_necesarios) if self.asociador else set()
+        ids.update(k for _, k in self._de_frame)
+        return sorted(ids)
+
+    def suscribir(self, funcion):
+        """funcion(alerta) se llama con cada alerta disparada"""
+        self._suscriptores.append(funcion)
+        return funcion
+
+    def _estado(self, clave):
+        estado = self._estados.get(clave)
+        if estado is None:
+            estado = self._estados[clave] = _Estado()
+        return estado
+
+    def procesar(self, xyxy, cls, conf=None, t=None, frame=None):
+        """Evalúa un frame de detecciones
+
+        Args:
+            xyxy, cls, conf: arrays de detecciones (detecciones_de_resultado)
+            t: marca de tiempo en segundos (None = reloj monotónico)
+            frame: número de frame (sólo informativo)
+
+        Returns:
+            (tracks, alertas): personas vistas en el frame y alertas nuevas
+        """
+        t = time.monotonic() if t is None else t
+        self.frames += 1
+        alertas = []
+
+        # Reglas de frame (una sola clave por regla)
+        presentes = set(cls.tolist())
+        for regla, id_clase in self._de_frame:
+            positivo = id_clase in presentes
+            if self._evaluar(regla, (regla.nombre, None), t, positivo):
+                idx = np.flatnonzero(cls == id_clase)
+                caja = None
+                if len(idx):
+                    caja = xyxy[idx[np.argmax(conf[idx])] if conf is not None else idx[0]]
+                alertas.append(self._alerta(regla, t, frame, None, caja))
+
+        # Reglas por persona: asociación vectorizada una vez por frame
+        tracks = []
+        if self.asociador is not None:
+            personas = np.flatnonzero(cls == self.asociador.id_persona)
+            tracks = self.rastreador.actualizar(xyxy[personas], None if conf is None else conf[personas])
+            if tracks:
+                asociacion = self.asociador.evaluar(xyxy, cls)
+                for regla in self._por_persona:
+                    k = self._columna.get(regla.nombre)
+                    if k is None:
+                        continue
+                    if regla.clase.startswith("NO-"):
+                        columna = asociacion.viola[:, k]
+                        if regla.ausente:
+                            columna = columna | ~asociacion.tiene[:, k]
+                    else:
+                        columna = asociacion.tiene[:, k]
+                    for track in tracks:
+                        if self._evaluar(regla, (regla.nombre, track.id), t, bool(columna[track.indice])):
+                            alertas.append(self._alerta(regla, t, frame, track.id, track.caja))
+
+        self._purgar(t)
+        for alerta in alertas:
+            self.disparadas[alerta['regla']] += 1
+            for funcion in self._suscriptores:
+                funcion(alerta)
+        return tracks, alertas
+
+    def procesar_resultado(self, resultado, t=None, frame=None):
+        """Atajo para un resultado de ultralytics / ResultadoONNX"""
+        return self.procesar(*detecciones_de_resultado(resultado), t=t, frame=frame)
+
+    def _evaluar(self, regla, clave, t, positivo):
+        estado = self._estados.get(clave)
+        if estado is None and not positivo:
+            return False        # Sin historial y sin infracción: nada que seguir
+        estado = estado or self._estado(clave)
+        activo_antes = estado.activo_desde is not None and estado.ultimo_disparo is not None
+        disparar = estado.actualizar(t, positivo, regla)
+        if not disparar and activo_antes and positivo:
+            self.suprimidas += 1
+        return disparar
+
+    def _alerta(self, regla, t, frame, persona_id, caja):
+        return {
+            'regla': regla.nombre,
+            'clase': regla.clase,
+            'nivel': regla.nivel,
+            'persona_id': persona_id,
+            't': t,
+            'frame': frame,
+            'caja': None if caja is None else [round(float(v), 1) for v in caja],
+        }
+
+    def _purgar(self, t):
+        """Olvida el estado de personas que ya no se ven (memoria acotada)"""
+        if self._t_purga is not None and t - self._t_purga < self.ttl:
+            return
+        self._t_purga = t
+        for clave in [c for c, e in self._estados.items() if t - e.ultima_vista > self.ttl]:
+            del self._estados[clave]
+
+    def activas(self, t=None):
+        """Claves (regla, persona_id) con la infracción sostenida en este momento"""
+        t = time.monotonic() if t is None else t
+        reglas = {r.nombre: r for r in self.reglas}
+        return [clave for clave, e in self._estados.items()
+                if e.activo_desde is not None and t - e.activo_desde >= reglas[clave[0]].duracion]
+
+    def resumen(self):
+        return {'frames': self.frames, 'alertas': dict(self.disparadas), 'suprimidas': self.suprimidas}
+
+
+def cargar_reglas(ruta=RUTA_REGLAS):
+    """Reglas desde un JSON (lista de dicts con los argumentos de Regla) o las por defecto"""
+    if not ruta or not Path(ruta).exists():
+        return [Regla.desde_dict(r) for r in REGLAS_POR_DEFECTO]
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return [Regla.desde_dict(r) for r in json.load(f)]
+
+
+def dibujar_alertas_epp(annotated, tracks, motor, t):
+    """Marco rojo y etiqueta sobre cada persona con una infracción activa"""
+    import cv2
+
+    activas = {}
+    for nombre, persona_id in motor.activas(t):
+        activas.setdefault(persona_id, []).append(nombre)
+    for track in tracks:
+        reglas = activas.get(track.id)
+        x1, y1, x2, y2 = track.caja.astype(int)
+        color = (0, 0, 255) if reglas else (0, 255, 0)
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 3)
+        texto = f"Persona #{track.id}" + (f" ALERTA: {', '.join(reglas)}" if reglas else "")
+        cv2.putText(annotated, texto, (x1, max(15, y1 - 8)), cv2.FONT_HERSHEY_SIMPLEX, 0.55, color, 2)
+
+    generales = activas.get(None)
+    if generales:
+        cv2.rectangle(annotated, (0, 0), (annotated.shape[1], 40), (0, 0, 255), -1)
+        cv2.putText(annotated, f"PELIGRO: {', '.join(generales)}", (10, 28),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+    return annotated
+
+
+def main_video_alertas(model_path, video_source=0, reglas=None, conf=0.35, imgsz=640, mostrar=True):
+    """Procesa video con sistema de alertas de EPP faltante
+
+    Args:
+        model_path: modelo .pt / .onnx / .engine
+        video_source: índice de cámara o ruta de video
+        reglas: lista de Regla / dicts (None = reglas_alertas.json o las por defecto)
+        mostrar: ventana con las alertas dibujadas (ESC para salir)
+    """
+    import cv2
+    from almacen_eventos import abrir_almacen
+    from captura import CapturaHilo
+    from eventos import PRIORIDAD_CAIDA, PRIORIDAD_EPP, eventos, imprimir_evento
+    from metricas import metricas as registro_metricas
+    from modelos import obtener_modelo
+    from renderizado import Renderizador
+
+    print("=" * 70)
+    print(" " * 15 + "🚨 SISTEMA DE ALERTA EPP FALTANTE")
+    print("=" * 70)
+
+    model = obtener_modelo(model_path, imgsz=imgsz)
+    print(f"✅ Modelo cargado: {model_path}")
+    motor = MotorReglas(model.names, reglas if reglas is not None else cargar_reglas())
+    for regla in motor.reglas:
+        print(f"   • {regla}")
+
+    # Cámara: hilo de captura (frame más reciente); archivo: todos los frames, tiempo del clip
+    en_vivo = isinstance(video_source, int) or str(video_source).isdigit()
+    if en_vivo:
+        cap = CapturaHilo(int(video_source))
+        if not cap.iniciar():
+            print("❌ Error al abrir la fuente de video")
+            return motor.resumen()
+        fps = 0
+    else:
+        cap = cv2.VideoCapture(str(video_source))
+        if not cap.isOpened():
+            print("❌ Error al abrir la fuente de video")
+            return motor.resumen()
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    # Alertas → cola de eventos (caídas primero) → consola y almacén (EPP_EVENTOS_BD)
+    camara = "camara" if en_vivo else Path(str(video_source)).stem
+    metricas = registro_metricas.fuente(camara)
+    almacen = abrir_almacen()
+    eventos.suscribir(imprimir_evento)
+    if almacen:
+        eventos.suscribir(almacen.registrar_evento)
+    t_frame = None
+
+    @motor.suscribir
+    def publicar(alerta):
+        caida = alerta['clase'] == "Fall-Detected"
+        evento = {
+            'tipo': 'caida' if caida else 'epp',
+            'fuente': camara,
+            'clase': alerta['clase'],
+            'nivel': alerta['nivel'],
+            'regla': alerta['regla'],
+            'persona_id': alerta['persona_id'],
+            'faltantes': [] if caida else [alerta['clase'][3:] if alerta['clase'].startswith("NO-")
+                                           else alerta['clase']],
+            'detalle': f"{alerta['clase']} ({alerta['regla']})",
+            'frame': alerta['frame'],
+            'caja': alerta['caja'],
+        }
+        eventos.publicar(evento, PRIORIDAD_CAIDA if caida else PRIORIDAD_EPP, t_frame=t_frame, metricas=metricas)
+
+    render = Renderizador(mostrar=mostrar, names=model.names)
+    print("🎥 Iniciando detección...")
+    if mostrar:
+        print("   Presiona ESC para salir")
+
+    frame_count = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_count += 1
+            t_frame = cap.t_captura if en_vivo else time.monotonic()
+            t = t_frame if en_vivo else frame_count / fps
+
+            results = model(frame, conf=conf, imgsz=imgsz, classes=motor.ids_necesarios, verbose=False)
+            detecciones = detecciones_de_resultado(results[0])
+            tracks, _ = motor.procesar(*detecciones, t=t, frame=frame_count)
+            if almacen:
+                almacen.registrar_detecciones(camara, frame_count, detecciones[1], detecciones[2], model.names)
+
+            annotated_frame = render.procesar(frame, results[0])
+            if annotated_frame is not None:
+                dibujar_alertas_epp(annotated_frame, tracks, motor, t)
+                cv2.putText(annotated_frame, f"Frame: {frame_count}", (10, annotated_frame.shape[0] - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+                cv2.imshow("Sistema de Alerta EPP", annotated_frame)
+                if cv2.waitKey(1) & 0xFF == 27:
+                    break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cap.release()
+        if mostrar:
+            cv2.destroyAllWindows()
+        eventos.vaciar()
+        if almacen:
+            eventos.desuscribir(almacen.registrar_evento)
+            almacen.detener()
+            print(f"🗃️  Almacén de eventos: {almacen.resumen()}")
+
+    resumen = motor.resumen()
+    print(f"\n✅ Procesamiento finalizado - {frame_count} frames")
+    for regla, n in sorted(resumen['alertas'].items(), key=lambda kv: -kv[1]):
+        print(f"  • {regla}: {n} alertas")
+    print(f"  ({resumen['suprimidas']} repeticiones suprimidas por enfriamiento)")
+    return resumen
+
+
+if __name__ == "__main__":
+    import sys
+
+    modelo = sys.argv[1] if len(sys.argv) > 1 else "best.pt"
+    fuente = sys.argv[2] if len(sys.argv) > 2 else 0
+    main_video_alertas(modelo, fuente)
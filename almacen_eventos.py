@@ -0,0 +1,290 @@
+"""
+Almacén local de eventos (SQLite en modo WAL)
+Detecciones por frame, decisiones de acceso e infracciones de todas las
+cámaras quedan en un archivo append-only. El pipeline sólo encola filas
+(nunca espera al disco); un hilo escritor las inserta por lotes en una
+transacción cada 'intervalo' segundos. Con WAL las consultas leen en
+paralelo sin bloquear al escritor, y los índices (cámara, clase, tiempo)
+resuelven consultas como "NO-Hardhat por hora en la puerta 2 el último mes"
+en milisegundos.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+RUTA_BD = os.environ.get("EPP_EVENTOS_BD", "eventos_epp.db")
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS detecciones (
+    t REAL NOT NULL,            -- epoch (s)
+    camara TEXT NOT NULL,
+    frame INTEGER,
+    clase TEXT NOT NULL,
+    cantidad INTEGER NOT NULL,
+    conf_max REAL
+);
+CREATE TABLE IF NOT EXISTS decisiones (
+    t REAL NOT NULL,
+    camara TEXT NOT NULL,
+    frame INTEGER,
+    permitido INTEGER NOT NULL,
+    detalle TEXT
+);
+CREATE TABLE IF NOT EXISTS infracciones (
+    t REAL NOT NULL,
+    camara TEXT NOT NULL,
+    frame INTEGER,
+    persona_id INTEGER,         -- id del track (NULL = infracción de escena, p.ej. caída)
+    clase TEXT NOT NULL,        -- 'NO-Hardhat', 'Fall-Detected'...
+    nivel TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_detecciones_camara_clase_t ON detecciones (camara, clase, t);
+CREATE INDEX IF NOT EXISTS idx_detecciones_t ON detecciones (t);
+CREATE INDEX IF NOT EXISTS idx_decisiones_camara_t ON decisiones (camara, t);
+CREATE INDEX IF NOT EXISTS idx_infracciones_camara_clase_t ON infracciones (camara, clase, t);
+CREATE INDEX IF NOT EXISTS idx_infracciones_clase_t ON infracciones (clase, t);
+"""
+
+_INSERTS = {
+    'detecciones': "INSERT INTO detecciones VALUES (?, ?, ?, ?, ?, ?)",
+    'decisiones': "INSERT INTO decisiones VALUES (?, ?, ?, ?, ?)",
+    'infracciones': "INSERT INTO infracciones VALUES (?, ?, ?, ?, ?, ?)",
+}
+
+_FIN = object()
+
+
+def _conectar(ruta):
+    conexion = sqlite3.connect(ruta, timeout=10, check_same_thread=False)
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.execute("PRAGMA synchronous=NORMAL")     # WAL: durable salvo corte de energía
+    return conexion
+
+
+def clase_infraccion(faltante):
+    """'Hardhat' → 'NO-Hardhat' (las clases NO-* y Fall-Detected se dejan igual)"""
+    if faltante.startswith("NO-") or faltante == "Fall-Detected":
+        return faltante
+    return f"NO-{faltante}"
+
+
+class AlmacenEventos:
+    """Escritura por lotes en segundo plano y consultas sobre el almacén
+
+    Args:
+        ruta: archivo SQLite (EPP_EVENTOS_BD)
+        lote: filas máximas por transacción
+        intervalo: segundos máximos que una fila espera en memoria
+        cola_max: filas pendientes; con la cola llena se descartan (el
+            pipeline nunca se bloquea por el disco)
+    """
+
+    def __init__(self, ruta=RUTA_BD, lote=2000, intervalo=1.0, cola_max=100000):
+        self.ruta = str(ruta)
+        self.lote = lote
+        self.intervalo = intervalo
+        self._cola = queue.Queue(maxsize=cola_max)
+        self._hilo = None
+        self._lectura = None
+
+        self.encoladas = 0
+        self.escritas = 0
+        self.descartadas = 0
+        self.transacciones = 0
+
+    def iniciar(self):
+        conexion = _conectar(self.ruta)
+        conexion.executescript(ESQUEMA)
+        conexion.close()
+        self._hilo = threading.Thread(target=self._escribir, name="AlmacenEventos", daemon=True)
+        self._hilo.start()
+        print(f"🗃️  Eventos en {self.ruta} (SQLite WAL)")
+        return self
+
+    # ---- Registro (desde el hilo de inferencia: sólo encola) ----
+
+    def _encolar(self, tabla, fila):
+        try:
+            self._cola.put_nowait((tabla, fila))
+            self.encoladas += 1
+        except queue.Full:
+            self.descartadas += 1
+
+    def registrar_detecciones(self, camara, frame, cls, conf, names, t=None):
+        """Una fila por clase presente en el frame (cantidad y confianza máxima)
+
+        Args:
+            cls, conf: arrays de ids de clase y confianzas del frame
+            names: dict id -> nombre de clase
+        """
+        t = time.time() if t is None else t
+        maximos = {}
+        cantidades = {}
+        for k, c in zip(cls.tolist(), conf.tolist()):
+            cantidades[k] = cantidades.get(k, 0) + 1
+            maximos[k] = max(maximos.get(k, 0.0), c)
+        for k, n in cantidades.items():
+            self._encolar('detecciones', (t, camara, frame, names.get(k, str(k)), n, round(maximos[k], 3)))
+
+    def registrar_decision(self, camara, frame, permitido, detalle="", t=None):
+        self._encolar('decisiones', (time.time() if t is None else t, camara, frame, int(bool(permitido)), detalle))
+
+    def registrar_infraccion(self, camara, frame, clase, persona_id=None, nivel=None, t=None):
+        self._encolar('infracciones', (time.time() if t is None else t, camara, frame, persona_id,
+                                       clase_infraccion(clase), nivel))
+
+    def registrar_evento(self, evento):
+        """Suscriptor de la cola de eventos: caídas y EPP faltante → infracciones"""
+        camara = evento.get('fuente') or ""
+        if evento.get('tipo') == 'caida':
+            self.registrar_infraccion(camara, evento.get('frame'), evento.get('clase', 'Fall-Detected'),
+                                      nivel=evento.get('nivel'), t=evento.get('t'))
+        elif evento.get('tipo') == 'epp':
+            for faltante in evento.get('faltantes', []):
+                self.registrar_infraccion(camara, evento.get('frame'), faltante, evento.get('persona_id'),
+                                          evento.get('nivel'), t=evento.get('t'))
+
+    # ---- Hilo escritor ----
+
+    def _escribir(self):
+        conexion = _conectar(self.ruta)
+        activo = True
+        while activo:
+            pendientes = {tabla: [] for tabla in _INSERTS}
+            n = 0
+            limite = time.monotonic() + self.intervalo
+            while n < self.lote:
+                try:
+                    item = self._cola.get(timeout=max(0.0, limite - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _FIN:
+                    activo = False
+                    break
+                pendientes[item[0]].append(item[1])
+                n += 1
+            if not n:
+                continue
+            try:
+                with conexion:      # Una transacción por lote
+                    for tabla, filas in pendientes.items():
+                        if filas:
+                            conexion.executemany(_INSERTS[tabla], filas)
+                self.escritas += n
+                self.transacciones += 1
+            except sqlite3.Error as e:
+                self.descartadas += n
+                print(f"⚠️  Almacén de eventos: no se pudo escribir un lote de {n} filas: {e}")
+        conexion.close()
+
+    def detener(self, timeout=5.0):
+        """Escribe lo pendiente y cierra
+
+        Mientras el escritor siga avanzando se le espera; sólo se abandona
+        (avisando cuántas filas quedan sin escribir) si pasa 'timeout'
+        segundos sin escribir nada.
+        """
+        if self._hilo is not None:
+            self._cola.put(_FIN)
+            escritas = self.escritas
+            self._hilo.join(timeout)
+            while self._hilo.is_alive() and self.escritas > escritas:
+                print(f"⏳ Almacén de eventos: escribiendo {self._cola.qsize()} filas pendientes...")
+                escritas = self.escritas
+                self._hilo.join(timeout)
+            if self._hilo.is_alive():
+                print(f"⚠️  Almacén de eventos: el escritor no terminó; "
+                      f"~{self._cola.qsize()} filas pendientes sin guardar")
+                return
+            self._hilo = None
+        if self._lectura is not None:
+            self._lectura.close()
+            self._lectura = None
+
+    # ---- Consultas (conexión propia de lectura; WAL no bloquea al escritor) ----
+
+    def _consultar(self, sql, parametros=()):
+        if self._lectura is None:
+            self._lectura = _conectar(self.ruta)
+        return self._lectura.execute(sql, parametros).fetchall()
+
+    @staticmethod
+    def _filtros(camara=None, clase=None, desde=None, hasta=None):
+        condiciones, parametros = [], []
+        for columna, operador, valor in (("camara", "=", camara), ("clase", "=", clase),
+                                         ("t", ">=", desde), ("t", "<", hasta)):
+            if valor is not None:
+                condiciones.append(f"{columna} {operador} ?")
+                parametros.append(valor)
+        return (" WHERE " + " AND ".join(condiciones)) if condiciones else "", parametros
+
+    def infracciones_por_hora(self, camara=None, clase=None, desde=None, hasta=None):
+        """[(hora_inicio_epoch, cantidad), ...] de infracciones, ordenado por hora"""
+        where, parametros = self._filtros(camara, clase, desde, hasta)
+        return self._consultar(
+            f"SELECT CAST(t / 3600 AS INTEGER) * 3600 AS hora, COUNT(*) FROM infracciones{where} "
+            f"GROUP BY hora ORDER BY hora", parametros)
+
+    def infracciones_por_clase(self, camara=None, desde=None, hasta=None):
+        """{clase: cantidad} de infracciones"""
+        where, parametros = self._filtros(camara, None, desde, hasta)
+        return dict(self._consultar(
+            f"SELECT clase, COUNT(*) FROM infracciones{where} GROUP BY clase ORDER BY 2 DESC", parametros))
+
+    def detecciones_por_clase(self, camara=None, desde=None, hasta=None):
+        """{clase: detecciones} (suma de cajas en todos los frames)"""
+        where, parametros = self._filtros(camara, None, desde, hasta)
+        return dict(self._consultar(
+            f"SELECT clase, SUM(cantidad) FROM detecciones{where} GROUP BY clase ORDER BY 2 DESC", parametros))
+
+    def camaras(self):
+        return [fila[0] for fila in self._consultar("SELECT DISTINCT camara FROM decisiones UNION "
+                                                    "SELECT DISTINCT camara FROM infracciones")]
+
+    def resumen(self):
+        return (f"{self.escritas} filas en {self.transacciones} transacciones, "
+                f"{self.descartadas} descartadas, {self._cola.qsize()} pendientes")
+
+
+def abrir_almacen(ruta=None):
+    """Almacén iniciado en 'ruta' o EPP_EVENTOS_BD; None si está deshabilitado ("" / "0")"""
+    ruta = RUTA_BD if ruta is None else ruta
+    if not ruta or str(ruta) == "0":
+        return None
+    try:
+        return AlmacenEventos(ruta).iniciar()
+    except sqlite3.Error as e:
+        print(f"⚠️  No se pudo abrir el almacén de eventos {ruta}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Consultas sobre el almacén de eventos EPP")
+    parser.add_argument("--bd", default=RUTA_BD)
+    parser.add_argument("--camara", help="Nombre de la cámara / puerta")
+    parser.add_argument("--clase", help="Clase de la infracción (p.ej. NO-Hardhat)")
+    parser.add_argument("--dias", type=float, default=30, help="Ventana hacia atrás en días")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.bd):
+        parser.error(f"no existe la base de eventos: {args.bd}")
+    almacen = AlmacenEventos(args.bd)
+    desde = time.time() - args.dias * 86400
+    t0 = time.perf_counter()
+    por_hora = almacen.infracciones_por_hora(args.camara, args.clase and clase_infraccion(args.clase), desde)
+    ms = (time.perf_counter() - t0) * 1000
+
+    print(f"📊 Infracciones por hora ({args.clase or 'todas'}, {args.camara or 'todas las cámaras'}, "
+          f"últimos {args.dias:g} días) - {ms:.1f} ms")
+    for hora, n in por_hora:
+        print(f"  {datetime.fromtimestamp(hora):%Y-%m-%d %H:00}  {n}")
+    print("\n📈 Por clase:")
+    for clase, n in almacen.infracciones_por_clase(args.camara, desde).items():
+        print(f"  • {clase}: {n}")
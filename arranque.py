@@ -0,0 +1,132 @@
+"""
+Benchmark de arranque
+Mide, en procesos nuevos, cuánto tarda en importarse cada punto de entrada
+(menús, servicio, Optimized_model) y desglosa los imports con
+python -X importtime para ver qué paquetes pesan (ultralytics, torch, cv2...).
+Opcionalmente mide también el tiempo hasta la primera inferencia.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+PUNTOS_DE_ENTRADA = ("menu", "menu_simple", "servicio", "Optimized_model")
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+
+
+def _ejecutar(codigo, *opciones):
+    """Corre 'codigo' en un intérprete nuevo; devuelve (segundos, stdout, stderr)"""
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, *opciones, "-c", codigo], cwd=CARPETA,
+                          capture_output=True, text=True)
+    segundos = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else codigo)
+    return segundos, proc.stdout, proc.stderr
+
+
+def perfil_imports(modulo):
+    """Imports de un módulo según -X importtime
+
+    Returns:
+        lista de {'modulo', 'propio_ms', 'acumulado_ms', 'nivel'} en orden de carga
+    """
+    _, _, stderr = _ejecutar(f"import {modulo}", "-X", "importtime")
+    registros = []
+    for linea in stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|", 2)
+        registros.append({
+            'modulo': nombre.strip(),
+            'propio_ms': int(propio) / 1000,
+            'acumulado_ms': int(acumulado) / 1000,
+            'nivel': (len(nombre) - len(nombre.lstrip()) - 1) // 2,
+        })
+    return registros
+
+
+def paquetes_pesados(registros, top=10):
+    """Paquetes de primer nivel (ultralytics, cv2, numpy...) ordenados por tiempo acumulado"""
+    por_paquete = {}
+    for r in registros:
+        paquete = r['modulo'].split(".")[0]
+        if r['modulo'] == paquete:
+            por_paquete[paquete] = max(por_paquete.get(paquete, 0.0), r['acumulado_ms'])
+    return sorted(por_paquete.items(), key=lambda kv: -kv[1])[:top]
+
+
+def medir_import(modulo, repeticiones=3):
+    """Mediana del tiempo de 'import modulo' (s) descontando el arranque del intérprete"""
+    base = statistics.median(_ejecutar("pass")[0] for _ in range(repeticiones))
+    total = statistics.median(_ejecutar(f"import {modulo}")[0] for _ in range(repeticiones))
+    return max(0.0, total - base), base
+
+
+def primera_inferencia(modelo, imgsz=640, backend="ultralytics"):
+    """Segundos de import, carga + calentamiento y primera inferencia en un proceso nuevo"""
+    codigo = (
+        "import json, time\n"
+        "t0 = time.perf_counter()\n"
+        "import numpy as np\n"
+        "from modelos import obtener_modelo\n"
+        "t1 = time.perf_counter()\n"
+        f"model = obtener_modelo({modelo!r}, imgsz={imgsz}, backend={backend!r})\n"
+        "t2 = time.perf_counter()\n"
+        f"model(np.zeros((720, 1280, 3), np.uint8), imgsz={imgsz}, verbose=False)\n"
+        "t3 = time.perf_counter()\n"
+        "print(json.dumps({'import_s': t1 - t0, 'carga_s': t2 - t1, 'primera_inferencia_s': t3 - t2}))\n"
+    )
+    _, stdout, _ = _ejecutar(codigo)
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def benchmark_arranque(modulos=PUNTOS_DE_ENTRADA, repeticiones=3, top=8, modelo=None, imgsz=640,
+                       backend="ultralytics"):
+    """Tiempos de import por punto de entrada (+ primera inferencia si hay modelo)"""
+    reporte = {'python': sys.version.split()[0], 'modulos': {}}
+    for modulo in modulos:
+        try:
+            segundos, interprete = medir_import(modulo, repeticiones)
+            pesados = paquetes_pesados(perfil_imports(modulo), top)
+        except RuntimeError as e:
+            print(f"⚠️  {modulo}: {e}")
+            continue
+        reporte['interprete_s'] = interprete
+        reporte['modulos'][modulo] = {'import_s': segundos, 'paquetes_ms': dict(pesados)}
+
+        print(f"\n📦 import {modulo}: {segundos * 1000:.0f} ms")
+        for paquete, ms in pesados:
+            print(f"   {paquete:<28}{ms:>9.1f} ms")
+
+    if modelo:
+        reporte['primera_inferencia'] = primera_inferencia(modelo, imgsz, backend)
+        p = reporte['primera_inferencia']
+        print(f"\n🚀 Hasta la primera inferencia: import {p['import_s']:.2f}s | "
+              f"carga {p['carga_s']:.2f}s | inferencia {p['primera_inferencia_s']:.2f}s")
+    return reporte
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mide el tiempo de arranque de los puntos de entrada")
+    parser.add_argument("modulos", nargs="*", default=list(PUNTOS_DE_ENTRADA))
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8, help="Paquetes más pesados a listar por módulo")
+    parser.add_argument("--modelo", help="Medir también el tiempo hasta la primera inferencia")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--backend", default="ultralytics", choices=["ultralytics", "onnxruntime"])
+    parser.add_argument("--json", help="Guardar el reporte en este archivo")
+    args = parser.parse_args()
+
+    reporte = benchmark_arranque(args.modulos, args.repeticiones, args.top, args.modelo,
+                                 args.imgsz, args.backend)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reporte, f, indent=2)
+        print(f"\n💾 Reporte guardado: {args.json}")
@@ -0,0 +1,172 @@
+"""
+Asociación de EPP a personas
+Cada caja de EPP (Hardhat, Safety Vest, Gloves...) y de NO-EPP se asigna a
+la persona que mejor la contiene, con geometría vectorizada O(P·E) sobre
+arrays NumPy. El resultado es un vector de cumplimiento por persona, de modo
+que el casco de una persona no "cubre" a otra que no lo lleva.
+"""
+
+import numpy as np
+
+from evaluacion_epp import clases_de_resultado, confianzas_de_resultado
+
+
+# Franja vertical (fracción de la altura de la persona) donde debe caer el
+# centro de cada EPP: el casco arriba, el chaleco en el torso, etc.
+FRANJAS_POR_DEFECTO = {
+    'Hardhat': (0.0, 0.35),
+    'Goggles': (0.0, 0.35),
+    'Mask': (0.0, 0.40),
+    'Safety Vest': (0.10, 0.80),
+    'Gloves': (0.20, 1.00),
+}
+
+
+def cajas_de_resultado(resultado):
+    """(xyxy, cls) de un resultado de ultralytics como arrays NumPy"""
+    xyxy = resultado.boxes.xyxy
+    if hasattr(xyxy, 'cpu'):
+        xyxy = xyxy.cpu().numpy()
+    return np.asarray(xyxy, dtype=np.float32).reshape(-1, 4), clases_de_resultado(resultado)
+
+
+def detecciones_de_resultado(resultado):
+    """(xyxy, cls, conf) de un resultado de ultralytics como arrays NumPy"""
+    return (*cajas_de_resultado(resultado), confianzas_de_resultado(resultado))
+
+
+def area(cajas):
+    return np.clip(cajas[..., 2] - cajas[..., 0], 0, None) * np.clip(cajas[..., 3] - cajas[..., 1], 0, None)
+
+
+def interseccion(a, b):
+    """Área de intersección de cada par (N×4, M×4) → N×M"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    return np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+
+def iou(a, b):
+    """IoU de cada par (N×4, M×4) → N×M"""
+    inter = interseccion(a, b)
+    union = area(a)[:, None] + area(b)[None, :] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def contencion(personas, objetos):
+    """Fracción del área de cada objeto que cae dentro de cada persona → P×E"""
+    return interseccion(personas, objetos) / np.maximum(area(objetos)[None, :], 1e-9)
+
+
+class ResultadoAsociacion:
+    """Cumplimiento por persona de un frame
+
+    personas: cajas P×4
+    tiene: P×K, la persona tiene asignado el EPP k
+    viola: P×K, la persona tiene asignada una detección NO-k
+    cumple: P×K, tiene y no viola
+    persona_ok: P, cumple todos los EPP requeridos
+    """
+
+    def __init__(self, requeridos, personas, tiene, viola):
+        self.requeridos = requeridos
+        self.personas = personas
+        self.tiene = tiene
+        self.viola = viola
+        self.cumple = tiene & ~viola
+        self.persona_ok = self.cumple.all(axis=1)
+
+    @property
+    def num_personas(self):
+        return len(self.personas)
+
+    @property
+    def todos_cumplen(self):
+        """Hay al menos una persona y todas cumplen"""
+        return self.num_personas > 0 and bool(self.persona_ok.all())
+
+    def faltantes(self):
+        """EPP que le falta a alguna persona (ordenado por frecuencia)"""
+        faltan = (~self.cumple).sum(axis=0)
+        orden = np.argsort(-faltan, kind='stable')
+        return [self.requeridos[k] for k in orden if faltan[k] > 0]
+
+
+class AsociadorEPP:
+    """Asigna cajas de EPP/NO-EPP a cajas de persona
+
+    Args:
+        names: dict id -> nombre de clase
+        requeridos: EPP exigido a cada persona (p.ej. ['Hardhat', 'Safety Vest'])
+        umbral: fracción mínima del EPP dentro de la persona para asignarlo
+        franjas: dict clase -> (desde, hasta) en fracción de altura (None = sin franja)
+    """
+
+    def __init__(self, names, requeridos, umbral=0.5, franjas=FRANJAS_POR_DEFECTO):
+        ids = {v: int(k) for k, v in names.items()}
+        self.requeridos = [c for c in requeridos if c in ids]
+        self.umbral = umbral
+        self.id_persona = ids.get('Person')
+
+        K = len(self.requeridos)
+        # Tabla id de clase -> columna k del EPP (y si es la variante NO-)
+        num_clases = max(ids.values()) + 1
+        self._columna = np.full(num_clases, -1, dtype=np.intp)
+        self._negativa = np.zeros(num_clases, dtype=bool)
+        self._franja = np.tile(np.array([0.0, 1.0], dtype=np.float32), (K, 1))
+        for k, clase in enumerate(self.requeridos):
+            self._columna[ids[clase]] = k
+            if f"NO-{clase}" in ids:
+                self._columna[ids[f"NO-{clase}"]] = k
+                self._negativa[ids[f"NO-{clase}"]] = True
+            if franjas and clase in franjas:
+                self._franja[k] = franjas[clase]
+
+    @property
+    def ids_necesarios(self):
+        """Ids que el detector debe conservar: Person, EPP requerido y su NO-"""
+        ids = np.flatnonzero(self._columna >= 0).tolist()
+        if self.id_persona is not None:
+            ids.append(self.id_persona)
+        return sorted(ids)
+
+    def evaluar(self, xyxy, cls):
+        """Asocia las cajas de un frame (xyxy N×4, cls N) y devuelve ResultadoAsociacion"""
+        K = len(self.requeridos)
+        personas = xyxy[cls == self.id_persona] if self.id_persona is not None else xyxy[:0]
+        columna = self._columna[cls]
+        es_epp = columna >= 0
+        equipos = xyxy[es_epp]
+        col = columna[es_epp]
+        neg = self._negativa[cls[es_epp]]
+
+        P, E = len(personas), len(equipos)
+        if P == 0 or E == 0 or K == 0:
+            vacio = np.zeros((P, K), dtype=bool)
+            return ResultadoAsociacion(self.requeridos, personas, vacio, vacio.copy())
+
+        # Puntuación P×E: contención, anulada fuera de la franja vertical del EPP
+        puntuacion = contencion(personas, equipos)
+        alto = np.maximum(personas[:, 3] - personas[:, 1], 1e-9)
+        cy = (equipos[:, 1] + equipos[:, 3]) * 0.5
+        rel = (cy[None, :] - personas[:, 1, None]) / alto[:, None]
+        franja = self._franja[col]
+        puntuacion[(rel < franja[:, 0]) | (rel > franja[:, 1])] = 0.0
+
+        # Cada EPP se asigna a una sola persona (la que mejor lo contiene)
+        mejor = puntuacion.argmax(axis=0)
+        valido = puntuacion[mejor, np.arange(E)] >= self.umbral
+        asignado = np.zeros((P, E), dtype=np.int32)
+        asignado[mejor[valido], np.flatnonzero(valido)] = 1
+
+        # Matrices E×K de EPP positivo / negativo → P×K
+        onehot = col[:, None] == np.arange(K)[None, :]
+        tiene = (asignado @ (onehot & ~neg[:, None])) > 0
+        viola = (asignado @ (onehot & neg[:, None])) > 0
+        return ResultadoAsociacion(self.requeridos, personas, tiene, viola)
+
+    def evaluar_resultado(self, resultado):
+        """Atajo para un resultado de ultralytics"""
+        return self.evaluar(*cajas_de_resultado(resultado))
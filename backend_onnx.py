@@ -0,0 +1,283 @@
+"""
+Backend nativo de ONNX Runtime para el modelo YOLO exportado (best.onnx)
+Letterbox directo sobre un buffer NCHW float32 preasignado, IO binding sin
+copias de entrada/salida y decodificación + NMS vectorizados con NumPy.
+Devuelve resultados con la misma interfaz mínima que ultralytics
+(boxes.xyxy / boxes.cls / boxes.conf / plot()) para usarse en los mismos bucles.
+"""
+
+import ast
+import time
+
+import cv2
+import numpy as np
+
+from evaluacion_epp import cargar_info_clases
+from renderizado import dibujar_detecciones
+
+
+def nms(cajas, puntajes, umbral_iou=0.45, max_det=300):
+    """NMS voraz vectorizado: cada paso calcula el IoU contra todas las restantes"""
+    orden = np.argsort(-puntajes)
+    areas = (cajas[:, 2] - cajas[:, 0]) * (cajas[:, 3] - cajas[:, 1])
+    conservar = []
+    while orden.size and len(conservar) < max_det:
+        i = orden[0]
+        conservar.append(i)
+        resto = orden[1:]
+        xx1 = np.maximum(cajas[i, 0], cajas[resto, 0])
+        yy1 = np.maximum(cajas[i, 1], cajas[resto, 1])
+        xx2 = np.minimum(cajas[i, 2], cajas[resto, 2])
+        yy2 = np.minimum(cajas[i, 3], cajas[resto, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / np.maximum(areas[i] + areas[resto] - inter, 1e-9)
+        orden = resto[iou <= umbral_iou]
+    return np.array(conservar, dtype=np.intp)
+
+
+def _multiplo_32(tamano):
+    return max(32, int(tamano) // 32 * 32)
+
+
+class CajasONNX:
+    """Equivalente mínimo de ultralytics Boxes (arrays NumPy)"""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.cls)
+
+
+class ResultadoONNX:
+    """Equivalente mínimo de ultralytics Results"""
+
+    def __init__(self, orig_img, cajas, names, speed):
+        self.orig_img = orig_img
+        self.boxes = cajas
+        self.names = names
+        self.speed = speed
+
+    def plot(self, img=None):
+        """Dibuja las cajas sobre una copia del frame"""
+        lienzo = (self.orig_img if img is None else img).copy()
+        return dibujar_detecciones(lienzo, self.boxes.xyxy, self.boxes.cls, self.boxes.conf, self.names)
+
+
+class DetectorONNX:
+    """Detector YOLO sobre onnxruntime con entrada/salida preasignadas
+
+    Args:
+        ruta: archivo .onnx exportado por ultralytics (salida 1 x (4+nc) x N)
+        names: dict id -> nombre (None = metadatos del ONNX o el JSON de clases)
+        conf: umbral de confianza por defecto
+        iou: umbral IoU del NMS
+        providers: proveedores de onnxruntime (None = TensorRT/CUDA si existen, si no CPU)
+        imgsz: tamaño inicial de entrada si el ONNX tiene dimensiones dinámicas
+            (luego lo fija el imgsz de cada llamada); con forma fija se ignora
+    """
+
+    def __init__(self, ruta, names=None, conf=0.25, iou=0.45, providers=None, imgsz=640):
+        import onnxruntime as ort
+
+        disponibles = ort.get_available_providers()
+        if providers is None:
+            providers = [p for p in ('TensorrtExecutionProvider', 'CUDAExecutionProvider')
+                         if p in disponibles] + ['CPUExecutionProvider']
+        self.sesion = ort.InferenceSession(str(ruta), providers=providers)
+        self.ruta = str(ruta)
+        self.conf = conf
+        self.iou = iou
+
+        self.names = names or self._names_de_metadatos() or cargar_info_clases()['names']
+
+        # Forma fija: buffers para el tamaño exportado. Dinámica: se rehacen
+        # cuando cambia el imgsz pedido (múltiplo de 32)
+        alto, ancho = self.sesion.get_inputs()[0].shape[2:]
+        self.dinamico = not (isinstance(alto, int) and isinstance(ancho, int))
+        if self.dinamico:
+            alto = ancho = _multiplo_32(imgsz)
+        self._preparar_buffers(alto, ancho)
+
+        # Latencia por etapa (ms, última inferencia y acumulado)
+        self.speed = {'preprocess': 0.0, 'inference': 0.0, 'postprocess': 0.0}
+        self.acumulado = {'preprocess': 0.0, 'inference': 0.0, 'postprocess': 0.0, 'frames': 0}
+
+    def _preparar_buffers(self, alto, ancho):
+        """Buffer NCHW de entrada e IO binding para un tamaño de entrada"""
+        entrada = self.sesion.get_inputs()[0]
+        salida = self.sesion.get_outputs()[0]
+        self.alto, self.ancho = alto, ancho
+        self._entrada = np.full((1, 3, alto, ancho), 114 / 255.0, dtype=np.float32)
+        forma_salida = [d if isinstance(d, int) else None for d in salida.shape]
+        self._salida = None
+        self._binding = self.sesion.io_binding()
+        self._binding.bind_cpu_input(entrada.name, self._entrada)
+        if None not in forma_salida:
+            self._salida = np.empty(forma_salida, dtype=np.float32)
+            self._binding.bind_output(salida.name, 'cpu', 0, np.float32, forma_salida,
+                                      self._salida.ctypes.data)
+        else:
+            self._binding.bind_output(salida.name, 'cpu')
+        self._geometria = None
+
+    def _names_de_metadatos(self):
+        meta = self.sesion.get_modelmeta().custom_metadata_map
+        try:
+            return {int(k): v for k, v in ast.literal_eval(meta['names']).items()}
+        except (KeyError, ValueError, SyntaxError):
+            return None
+
+    # ------------------------------------------------------------------
+    # Etapas
+    # ------------------------------------------------------------------
+
+    def preprocesar(self, frame):
+        """Letterbox + BGR→RGB + /255 escrito directamente en el buffer NCHW"""
+        h, w = frame.shape[:2]
+        if self._geometria is None or self._geometria[:2] != (h, w):
+            r = min(self.alto / h, self.ancho / w)
+            nw, nh = int(round(w * r)), int(round(h * r))
+            x, y = (self.ancho - nw) // 2, (self.alto - nh) // 2
+            self._entrada.fill(114 / 255.0)
+            self._geometria = (h, w, r, x, y, nw, nh)
+        _, _, r, x, y, nw, nh = self._geometria
+
+        redim = frame if (nw, nh) == (w, h) else cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        np.multiply(redim[..., ::-1].transpose(2, 0, 1), 1 / 255.0,
+                    out=self._entrada[0, :, y:y + nh, x:x + nw], casting='unsafe')
+
+    def inferir(self):
+        self.sesion.run_with_iobinding(self._binding)
+        if self._salida is not None:
+            return self._salida
+        return self._binding.copy_outputs_to_cpu()[0]
+
+    def postprocesar(self, salida, forma, conf, classes=None):
+        """Decodificación vectorizada (1, 4+nc, N) → cajas xyxy en coordenadas del frame"""
+        pred = salida[0].T                       # N x (4+nc)
+        puntajes = pred[:, 4:]
+        cls = puntajes.argmax(axis=1)
+        confianza = puntajes[np.arange(len(cls)), cls]
+        mascara = confianza >= conf
+        if classes is not None:
+            mascara &= np.isin(cls, classes)
+        pred, cls, confianza = pred[mascara], cls[mascara], confianza[mascara]
+
+        cajas = np.empty((len(pred), 4), dtype=np.float32)
+        cajas[:, :2] = pred[:, :2] - pred[:, 2:4] / 2
+        cajas[:, 2:] = pred[:, :2] + pred[:, 2:4] / 2
+
+        # NMS por clase desplazando cada clase a su propia región
+        desplazadas = cajas + (cls * 4096.0)[:, None]
+        conservar = nms(desplazadas, confianza, self.iou)
+        cajas, cls, confianza = cajas[conservar], cls[conservar], confianza[conservar]
+
+        # Deshacer el letterbox
+        _, _, r, x, y, _, _ = self._geometria
+        cajas -= (x, y, x, y)
+        cajas /= r
+        h, w = forma
+        cajas[:, [0, 2]] = np.clip(cajas[:, [0, 2]], 0, w)
+        cajas[:, [1, 3]] = np.clip(cajas[:, [1, 3]], 0, h)
+        return CajasONNX(cajas, confianza.astype(np.float32), cls.astype(np.intp))
+
+    # ------------------------------------------------------------------
+    # Interfaz tipo ultralytics
+    # ------------------------------------------------------------------
+
+    def __call__(self, fuente, conf=None, classes=None, verbose=False, imgsz=None, **kwargs):
+        """Detecta sobre un frame o una lista de frames; devuelve una lista de resultados
+
+        imgsz sólo se aplica a un ONNX con dimensiones dinámicas (letterbox a
+        ese tamaño, múltiplo de 32); con forma fija manda el ONNX exportado.
+        Los demás argumentos de ultralytics se aceptan y se ignoran.
+        """
+        if self.dinamico and imgsz is not None:
+            alto, ancho = ((imgsz, imgsz) if isinstance(imgsz, int) else tuple(imgsz))
+            alto, ancho = _multiplo_32(alto), _multiplo_32(ancho)
+            if (alto, ancho) != (self.alto, self.ancho):
+                self._preparar_buffers(alto, ancho)
+        frames = fuente if isinstance(fuente, (list, tuple)) else [fuente]
+        conf = self.conf if conf is None else conf
+        resultados = []
+        for frame in frames:
+            t0 = time.perf_counter()
+            self.preprocesar(frame)
+            t1 = time.perf_counter()
+            salida = self.inferir()
+            t2 = time.perf_counter()
+            cajas = self.postprocesar(salida, frame.shape[:2], conf, classes)
+            t3 = time.perf_counter()
+
+            self.speed = {'preprocess': (t1 - t0) * 1000, 'inference': (t2 - t1) * 1000,
+                          'postprocess': (t3 - t2) * 1000}
+            for etapa, ms in self.speed.items():
+                self.acumulado[etapa] += ms
+            self.acumulado['frames'] += 1
+            resultados.append(ResultadoONNX(frame, cajas, self.names, dict(self.speed)))
+        return resultados
+
+    def latencia_media(self):
+        n = max(1, self.acumulado['frames'])
+        return {etapa: self.acumulado[etapa] / n for etapa in ('preprocess', 'inference', 'postprocess')}
+
+
+def comparar_con_ultralytics(ruta_onnx, frames, conf=0.25):
+    """Latencia media por etapa (ms) de ultralytics vs. el backend nativo sobre los mismos frames"""
+    from ultralytics import YOLO
+
+    yolo = YOLO(ruta_onnx, task='detect')
+    nativo = DetectorONNX(ruta_onnx, conf=conf)
+    imgsz = nativo.alto
+
+    # Calentamiento
+    yolo(frames[0], imgsz=imgsz, conf=conf, verbose=False)
+    nativo(frames[0])
+    nativo.acumulado = {'preprocess': 0.0, 'inference': 0.0, 'postprocess': 0.0, 'frames': 0}
+
+    suma = {'preprocess': 0.0, 'inference': 0.0, 'postprocess': 0.0}
+    for frame in frames:
+        r = yolo(frame, imgsz=imgsz, conf=conf, verbose=False)[0]
+        for etapa in suma:
+            suma[etapa] += r.speed[etapa]
+        nativo(frame)
+
+    tabla = {
+        'ultralytics': {etapa: v / len(frames) for etapa, v in suma.items()},
+        'onnxruntime': nativo.latencia_media(),
+    }
+    print(f"\n{'Etapa':<14}{'ultralytics':>14}{'onnxruntime':>14}")
+    for etapa in suma:
+        print(f"{etapa:<14}{tabla['ultralytics'][etapa]:>11.2f} ms{tabla['onnxruntime'][etapa]:>11.2f} ms")
+    total_u = sum(tabla['ultralytics'].values())
+    total_o = sum(tabla['onnxruntime'].values())
+    print(f"{'total':<14}{total_u:>11.2f} ms{total_o:>11.2f} ms")
+    return tabla
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compara el backend ONNX Runtime nativo con ultralytics")
+    parser.add_argument("modelo", help="Archivo .onnx")
+    parser.add_argument("--video", help="Video de prueba (por defecto frames sintéticos)")
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        muestras = []
+        while len(muestras) < args.frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            muestras.append(frame)
+        cap.release()
+    else:
+        from captura import fuente_sintetica
+        muestras = list(fuente_sintetica(1280, 720, fps=None, frames=args.frames))
+
+    comparar_con_ultralytics(args.modelo, muestras)
@@ -0,0 +1,316 @@
+"""
+Benchmark reproducible de los pipelines de detección
+Ejecuta cada variante (video frame a frame, por lotes, con escritura,
+en vivo con una y dos puertas) sin ventanas y con actuadores simulados
+sobre clips fijos: sintéticos generados de forma determinista y grabados
+opcionales. Cada corrida va en un proceso nuevo (memoria pico aislada) y
+registra FPS, latencia p50/p95/p99, RSS pico y uso de CPU en un JSON.
+'comparar' marca las regresiones entre dos resultados.
+
+    python benchmark.py ejecutar best.pt --clips videos/obra.mp4 --salida base.json
+    python benchmark.py ejecutar best.pt --salida nuevo.json
+    python benchmark.py comparar base.json nuevo.json
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+CARPETA = Path(__file__).resolve().parent
+CARPETA_CLIPS = CARPETA / "benchmarks" / "clips"
+
+# Clips sintéticos fijos: (nombre, ancho, alto, frames) a 30 FPS
+CLIPS_SINTETICOS = (("sintetico_480p", 640, 480, 300), ("sintetico_720p", 1280, 720, 300))
+
+VARIANTES = {
+    'video': {'tipo': 'video', 'lote': 1},
+    'video_lotes': {'tipo': 'video', 'lote': 8},
+    'video_guardar': {'tipo': 'video', 'lote': 1, 'guardar': True},
+    'vivo': {'tipo': 'vivo', 'puertas': 1},
+    'vivo_2_puertas': {'tipo': 'vivo', 'puertas': 2},
+}
+
+# Métricas comparadas: (clave, True si más alto es mejor)
+METRICAS_COMPARADAS = (('fps', True), ('latencia_p95_ms', False), ('latencia_p99_ms', False),
+                       ('rss_pico_mb', False), ('cpu_pct', False))
+
+
+def generar_clips_sinteticos(carpeta=CARPETA_CLIPS):
+    """Escribe (una sola vez) los clips sintéticos y devuelve sus rutas"""
+    import cv2
+    from captura import fuente_sintetica
+
+    carpeta.mkdir(parents=True, exist_ok=True)
+    rutas = []
+    for nombre, ancho, alto, frames in CLIPS_SINTETICOS:
+        ruta = carpeta / f"{nombre}.mp4"
+        if not ruta.exists():
+            writer = cv2.VideoWriter(str(ruta), cv2.VideoWriter_fourcc(*'mp4v'), 30, (ancho, alto))
+            for frame in fuente_sintetica(ancho, alto, fps=None, frames=frames):
+                writer.write(frame)
+            writer.release()
+        rutas.append(ruta)
+    return rutas
+
+
+# ----------------------------------------------------------------------
+# Proceso hijo: una variante sobre un clip
+# ----------------------------------------------------------------------
+
+def _uso_recursos():
+    """(segundos de CPU, RSS pico en MB) del proceso actual"""
+    try:
+        import resource
+    except ImportError:        # Windows
+        t = os.times()
+        return t.user + t.system, None
+    uso = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss: bytes en macOS, KB en Linux
+    rss_mb = uso.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return uso.ru_utime + uso.ru_stime, rss_mb
+
+
+def _percentiles_ms(segundos):
+    if not segundos:
+        return {}
+    valores = sorted(s * 1000 for s in segundos)
+
+    def p(q):
+        return valores[min(len(valores) - 1, int(round(q * (len(valores) - 1))))]
+    return {'latencia_p50_ms': p(0.5), 'latencia_p95_ms': p(0.95), 'latencia_p99_ms': p(0.99)}
+
+
+def _correr_video(opciones, modelo, clip, imgsz, conf, backend):
+    """_procesar_video de MenuEPP tal cual, sin ventana y con GPIO simulado"""
+    from menu_simple import MenuEPP
+    from metricas import metricas
+
+    menu = MenuEPP()
+    menu.model_path, menu.backend, menu.imgsz = modelo, backend, imgsz
+    menu.hardware_mock = True
+    menu.ruta_roi = None
+    menu._procesar_video(str(clip), ['Hardhat', 'Safety Vest'], conf, guardar=opciones.get('guardar', False),
+                         mostrar=False, imgsz=imgsz, lote=opciones.get('lote', 1))
+
+    fuente = metricas.fuente(Path(clip).stem)
+    if fuente.frames == 0:
+        raise RuntimeError("el pipeline no procesó ningún frame")
+    # FPS en régimen: del primer al último frame (sin carga del modelo ni cierre).
+    # La latencia es por frame, de su decodificación a su decisión: con lotes
+    # el ciclo entre frames no la refleja (cada frame espera a que se llene su lote)
+    ciclo = fuente.ciclo
+    resumen = fuente.resumen()
+    latencia = resumen['latencia'] or {}
+    return {
+        'frames': fuente.frames,
+        'fps': ciclo.n / ciclo.suma if ciclo.suma else 0.0,
+        'latencia_p50_ms': latencia.get('p50_ms'),
+        'latencia_p95_ms': latencia.get('p95_ms'),
+        'latencia_p99_ms': latencia.get('p99_ms'),
+        'etapas': resumen['etapas'],
+    }
+
+
+def _correr_vivo(opciones, modelo, clip, imgsz, conf, backend, duracion):
+    """Servicio multi-cámara con el clip como cámara (ritmo real) y actuadores simulados"""
+    import collections
+    from actuador import HardwareMock
+    from modelos import obtener_modelo
+    from multicamara import Flujo, ServicioMulticamara
+
+    model = obtener_modelo(modelo, imgsz=imgsz, backend=backend)
+    flujos = [Flujo(f"puerta{i}", str(clip), HardwareMock(t_servo=0.2, t_lcd=0.005))
+              for i in range(opciones.get('puertas', 1))]
+    for flujo in flujos:
+        flujo.latencias = collections.deque()      # Todas las muestras, no sólo las últimas
+    servicio = ServicioMulticamara(model, flujos, conf=conf, imgsz=imgsz, intervalo_stats=0)
+    servicio.iniciar()
+    t0 = time.perf_counter()
+    servicio.ejecutar(duracion)
+    segundos = time.perf_counter() - t0
+
+    latencias = [l for f in flujos for l in f.latencias]
+    frames = sum(f.frames for f in flujos)
+    return {
+        'frames': frames,
+        'fps': frames / segundos / len(flujos),          # Por puerta
+        'descartados': sum(f.captura.descartados for f in flujos),
+        'frames_por_lote': servicio.estadisticas()['frames_por_lote'],
+        **_percentiles_ms(latencias),
+    }
+
+
+def correr_variante(variante, modelo, clip, imgsz=640, conf=0.25, backend='ultralytics', duracion=20.0):
+    """Ejecuta una variante en ESTE proceso y devuelve sus métricas"""
+    from modelos import obtener_modelo
+
+    opciones = VARIANTES[variante]
+    # Carga y calentamiento fuera de la medición
+    obtener_modelo(modelo, imgsz=imgsz, backend=backend)
+    cpu0, _ = _uso_recursos()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if opciones['tipo'] == 'video':
+            resultado = _correr_video(opciones, modelo, clip, imgsz, conf, backend)
+        else:
+            resultado = _correr_vivo(opciones, modelo, clip, imgsz, conf, backend, duracion)
+    pared = time.perf_counter() - t0
+    cpu1, rss = _uso_recursos()
+    resultado.update({
+        'segundos': pared,
+        'rss_pico_mb': rss,
+        'cpu_pct': (cpu1 - cpu0) / pared * 100,          # 100 = un núcleo completo
+    })
+    return resultado
+
+
+def _en_proceso_nuevo(variante, modelo, clip, imgsz, conf, backend, duracion):
+    """Corre la variante en un intérprete nuevo (cwd temporal para los videos de salida)"""
+    argumentos = json.dumps({'variante': variante, 'modelo': str(Path(modelo).resolve()),
+                             'clip': str(Path(clip).resolve()), 'imgsz': imgsz, 'conf': conf,
+                             'backend': backend, 'duracion': duracion})
+    entorno = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(CARPETA),
+                                                                       os.environ.get("PYTHONPATH")])),
+                   EPP_METRICAS_INTERVALO="0", EPP_HEADLESS="1")
+    entorno.pop("EPP_METRICAS_PUERTO", None)
+    with tempfile.TemporaryDirectory() as temporal:
+        proc = subprocess.run([sys.executable, str(CARPETA / "benchmark.py"), "_hijo", argumentos],
+                              cwd=temporal, env=entorno, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError((proc.stderr.strip().splitlines() or ["error desconocido"])[-1])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# ----------------------------------------------------------------------
+# Ejecución y comparación
+# ----------------------------------------------------------------------
+
+def ejecutar(modelo, clips=(), variantes=tuple(VARIANTES), repeticiones=3, imgsz=640, conf=0.25,
+             backend='ultralytics', duracion=20.0, salida=None, sinteticos=True):
+    """Corre la matriz variantes x clips y guarda la mediana de cada métrica"""
+    clips = [Path(c) for c in clips] + (generar_clips_sinteticos() if sinteticos else [])
+    reporte = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'host': platform.node(),
+        'maquina': platform.machine(),
+        'python': platform.python_version(),
+        'modelo': str(modelo),
+        'imgsz': imgsz,
+        'backend': backend,
+        'repeticiones': repeticiones,
+        'resultados': {},
+    }
+    for variante in variantes:
+        for clip in clips:
+            clave = f"{variante}/{clip.stem}"
+            print(f"⏱️  {clave} ({repeticiones}x)...", flush=True)
+            corridas = []
+            for _ in range(repeticiones):
+                try:
+                    corridas.append(_en_proceso_nuevo(variante, modelo, clip, imgsz, conf, backend, duracion))
+                except RuntimeError as e:
+                    print(f"   ❌ {e}")
+                    break
+            if not corridas:
+                continue
+            mediana = {k: statistics.median(c[k] for c in corridas)
+                       for k, v in corridas[0].items() if isinstance(v, (int, float)) and v is not None}
+            mediana['corridas'] = corridas
+            reporte['resultados'][clave] = mediana
+            print(f"   {mediana['fps']:6.1f} FPS | p95 {mediana.get('latencia_p95_ms', 0):6.1f} ms | "
+                  f"RSS {mediana.get('rss_pico_mb') or 0:6.0f} MB | CPU {mediana['cpu_pct']:5.0f}%")
+
+    salida = salida or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(salida, 'w') as f:
+        json.dump(reporte, f, indent=2)
+    print(f"\n💾 Resultados guardados: {salida}")
+    return reporte
+
+
+def comparar(base, nuevo, umbral=0.05):
+    """Regresiones de 'nuevo' respecto de 'base' (rutas o dicts)
+
+    Args:
+        umbral: variación relativa tolerada (0.05 = 5%)
+
+    Returns:
+        lista de (clave, metrica, valor_base, valor_nuevo, variacion)
+    """
+    if not isinstance(base, dict):
+        with open(base) as f:
+            base = json.load(f)
+    if not isinstance(nuevo, dict):
+        with open(nuevo) as f:
+            nuevo = json.load(f)
+    if (base.get('host'), base.get('modelo')) != (nuevo.get('host'), nuevo.get('modelo')):
+        print("⚠️  Resultados de distinto equipo o modelo: la comparación es orientativa")
+
+    regresiones = []
+    print(f"\n{'Variante/clip':<34}{'Métrica':<18}{'Base':>10}{'Nuevo':>10}{'Cambio':>9}")
+    for clave in sorted(set(base['resultados']) & set(nuevo['resultados'])):
+        a, b = base['resultados'][clave], nuevo['resultados'][clave]
+        for metrica, mayor_es_mejor in METRICAS_COMPARADAS:
+            if a.get(metrica) is None or b.get(metrica) is None or not a[metrica]:
+                continue
+            cambio = (b[metrica] - a[metrica]) / a[metrica]
+            peor = -cambio if mayor_es_mejor else cambio
+            marca = "❌" if peor > umbral else "  "
+            if peor > umbral:
+                regresiones.append((clave, metrica, a[metrica], b[metrica], cambio))
+            print(f"{clave:<34}{metrica:<18}{a[metrica]:>10.1f}{b[metrica]:>10.1f}{cambio * 100:>+8.1f}% {marca}")
+    for clave in sorted(set(base['resultados']) - set(nuevo['resultados'])):
+        print(f"⚠️  {clave}: sin resultado en la corrida nueva")
+
+    print(f"\n{'❌ ' + str(len(regresiones)) + ' regresiones' if regresiones else '✅ Sin regresiones'} "
+          f"(umbral {umbral * 100:.0f}%)")
+    return regresiones
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark reproducible de los pipelines de detección")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("ejecutar", help="Corre las variantes y guarda un JSON de resultados")
+    p.add_argument("modelo")
+    p.add_argument("--clips", nargs="*", default=[], help="Clips grabados además de los sintéticos")
+    p.add_argument("--sin-sinteticos", action="store_true")
+    p.add_argument("--variantes", nargs="*", default=list(VARIANTES), choices=list(VARIANTES))
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.add_argument("--imgsz", type=int, default=640)
+    p.add_argument("--conf", type=float, default=0.25)
+    p.add_argument("--backend", default="ultralytics", choices=["ultralytics", "onnxruntime"])
+    p.add_argument("--duracion", type=float, default=20.0, help="Segundos de las variantes en vivo")
+    p.add_argument("--salida")
+
+    p = sub.add_parser("comparar", help="Marca regresiones entre dos resultados")
+    p.add_argument("base")
+    p.add_argument("nuevo")
+    p.add_argument("--umbral", type=float, default=0.05)
+
+    p = sub.add_parser("_hijo")
+    p.add_argument("argumentos")
+
+    args = parser.parse_args()
+
+    if args.comando == "ejecutar":
+        ejecutar(args.modelo, args.clips, args.variantes, args.repeticiones, args.imgsz, args.conf,
+                 args.backend, args.duracion, args.salida, sinteticos=not args.sin_sinteticos)
+    elif args.comando == "comparar":
+        sys.exit(1 if comparar(args.base, args.nuevo, args.umbral) else 0)
+    else:
+        a = json.loads(args.argumentos)
+        resultado = correr_variante(a['variante'], a['modelo'], a['clip'], a['imgsz'], a['conf'],
+                                    a['backend'], a['duracion'])
+        print(json.dumps(resultado))
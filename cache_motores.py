@@ -0,0 +1,224 @@
+"""
+Caché en disco de motores compilados (TensorRT .engine, ONNX, OpenVINO)
+La clave es el hash SHA-256 del modelo + imgsz + precisión: tras un reinicio
+se reutiliza el motor ya construido en lugar de volver a exportar (varios
+minutos en la Jetson). Los .engine dependen de la GPU y de la versión de
+TensorRT, por eso cada entrada guarda el entorno en que se construyó y se
+reconstruye si no coincide. Carpeta: EPP_CACHE_MOTORES (por defecto
+~/.cache/eppia/motores).
+"""
+
+import hashlib
+import json
+import os
+import platform
+import shutil
+import time
+from datetime import datetime
+from importlib import metadata
+from pathlib import Path
+
+
+CARPETA_CACHE = Path(os.environ.get("EPP_CACHE_MOTORES", Path.home() / ".cache" / "eppia" / "motores"))
+EXTENSIONES = {'engine': '.engine', 'onnx': '.onnx', 'openvino': '_openvino_model'}
+
+
+def es_jetson():
+    """Detección barata de la Jetson (sin importar torch)"""
+    if Path("/etc/nv_tegra_release").exists():
+        return True
+    try:
+        return "jetson" in Path("/proc/device-tree/model").read_text(errors="ignore").lower()
+    except OSError:
+        return False
+
+
+def hash_archivo(ruta, bloque=1 << 20):
+    """SHA-256 del archivo leído por bloques"""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for parte in iter(lambda: f.read(bloque), b''):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def _version(paquete):
+    try:
+        return metadata.version(paquete)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def entorno_motor(formato):
+    """Lo que invalida un motor construido: equipo y versión del runtime"""
+    runtime = {'engine': 'tensorrt', 'onnx': 'onnx', 'openvino': 'openvino'}[formato]
+    return {'maquina': platform.machine(), 'host': platform.node(), runtime: _version(runtime)}
+
+
+def _exportar_ultralytics(ruta, imgsz, precision, formato):
+    from ultralytics import YOLO
+
+    kwargs = {'format': formato, 'imgsz': imgsz, 'half': precision == 'fp16',
+              'int8': precision == 'int8'}
+    if formato == 'onnx':
+        kwargs.update(dynamic=False, simplify=True, opset=12)
+    elif formato == 'engine':
+        kwargs.update(workspace=2, simplify=True)     # Reducido para Jetson Nano
+    return YOLO(ruta).export(**kwargs)
+
+
+class CacheMotores:
+    """Motores construidos indexados por (hash del modelo, imgsz, precisión, formato)
+
+    Args:
+        carpeta: directorio de la caché
+        exportar: función (ruta, imgsz, precision, formato) -> ruta exportada
+            (por defecto model.export de ultralytics)
+    """
+
+    def __init__(self, carpeta=CARPETA_CACHE, exportar=_exportar_ultralytics):
+        self.carpeta = Path(carpeta)
+        self.exportar = exportar
+        self._hashes = None
+
+    # ------------------------------------------------------------------
+    # Hash del modelo (memorizado por tamaño + mtime para no releer el .pt)
+    # ------------------------------------------------------------------
+
+    @property
+    def _ruta_hashes(self):
+        return self.carpeta / "hashes.json"
+
+    def huella(self, ruta):
+        ruta = os.path.abspath(ruta)
+        st = os.stat(ruta)
+        if self._hashes is None:
+            try:
+                self._hashes = json.loads(self._ruta_hashes.read_text())
+            except (OSError, ValueError):
+                self._hashes = {}
+        previo = self._hashes.get(ruta)
+        if previo and previo['tamano'] == st.st_size and previo['mtime_ns'] == st.st_mtime_ns:
+            return previo['sha256']
+
+        sha = hash_archivo(ruta)
+        self._hashes[ruta] = {'tamano': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha}
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        self._ruta_hashes.write_text(json.dumps(self._hashes, indent=2))
+        return sha
+
+    # ------------------------------------------------------------------
+    # Entradas
+    # ------------------------------------------------------------------
+
+    def clave(self, ruta, imgsz=640, precision='fp16', formato='engine'):
+        return f"{Path(ruta).stem}_{self.huella(ruta)[:16]}_{imgsz}_{precision}"
+
+    def ruta_motor(self, ruta, imgsz=640, precision='fp16', formato='engine'):
+        return self.carpeta / f"{self.clave(ruta, imgsz, precision, formato)}{EXTENSIONES[formato]}"
+
+    def buscar(self, ruta, imgsz=640, precision='fp16', formato='engine'):
+        """Ruta del motor si existe y se construyó en este mismo entorno (si no, None)"""
+        destino = self.ruta_motor(ruta, imgsz, precision, formato)
+        meta = Path(f"{destino}.json")
+        if not destino.exists() or not meta.exists():
+            return None
+        try:
+            if json.loads(meta.read_text()).get('entorno') != entorno_motor(formato):
+                print(f"⚠️  Motor en caché construido en otro entorno: {destino.name}")
+                return None
+        except ValueError:
+            return None
+        return destino
+
+    def obtener(self, ruta, imgsz=640, precision='fp16', formato='engine'):
+        """Motor para el modelo: de la caché o construido (y guardado) ahora"""
+        existente = self.buscar(ruta, imgsz, precision, formato)
+        if existente is not None:
+            print(f"♻️  Motor en caché: {existente}")
+            return existente
+
+        destino = self.ruta_motor(ruta, imgsz, precision, formato)
+        print(f"🔧 Construyendo motor {formato} ({precision}, imgsz={imgsz}) para {Path(ruta).name}...")
+        t0 = time.perf_counter()
+        salida = Path(self.exportar(str(ruta), imgsz, precision, formato))
+        segundos = time.perf_counter() - t0
+
+        # Mover y luego renombrar: nunca queda un motor a medio copiar con el nombre final
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        temporal = self.carpeta / f".{destino.name}.tmp"
+        if temporal.exists():
+            shutil.rmtree(temporal) if temporal.is_dir() else temporal.unlink()
+        shutil.move(str(salida), str(temporal))
+        if destino.exists():
+            shutil.rmtree(destino) if destino.is_dir() else destino.unlink()
+        os.replace(temporal, destino)
+
+        Path(f"{destino}.json").write_text(json.dumps({
+            'modelo': os.path.abspath(ruta),
+            'sha256': self.huella(ruta),
+            'imgsz': imgsz,
+            'precision': precision,
+            'formato': formato,
+            'entorno': entorno_motor(formato),
+            'segundos_construccion': round(segundos, 1),
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+        }, indent=2))
+        print(f"✅ Motor guardado en caché: {destino} ({segundos:.0f}s)")
+        return destino
+
+    def listar(self):
+        """Metadatos de todas las entradas de la caché"""
+        entradas = []
+        for meta in sorted(self.carpeta.glob("*.json")):
+            if meta.name == "hashes.json":
+                continue
+            try:
+                entradas.append(dict(json.loads(meta.read_text()), ruta=str(meta)[:-len(".json")]))
+            except ValueError:
+                continue
+        return entradas
+
+
+# Caché compartida por el servicio, los menús y Optimized_model.py
+cache = CacheMotores()
+
+
+def motor_en_cache(ruta, imgsz=640, precision='fp16', formato='engine'):
+    """Atajo para cache.obtener()"""
+    return cache.obtener(ruta, imgsz, precision, formato)
+
+
+def resolver_modelo(ruta, imgsz=640, motor=None):
+    """Ruta a cargar: el motor en caché si se pide uno y el modelo es un .pt/.onnx
+
+    Args:
+        motor: None (el archivo tal cual), 'engine', 'onnx' u 'openvino', o un
+            dict {"formato": "engine", "precision": "fp16"}
+    """
+    if not motor or Path(ruta).suffix not in ('.pt', '.onnx'):
+        return ruta
+    if isinstance(motor, str):
+        motor = {'formato': motor}
+    formato = motor.get('formato', 'engine')
+    if formato == 'onnx' and Path(ruta).suffix == '.onnx':
+        return ruta
+    return str(motor_en_cache(ruta, imgsz, motor.get('precision', 'fp16'), formato))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Caché de motores compilados (hash del modelo + imgsz + precisión)")
+    parser.add_argument("modelo", nargs="?", help="Modelo .pt / .onnx a compilar (sin modelo = listar la caché)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--precision", default="fp16", choices=["fp32", "fp16", "int8"])
+    parser.add_argument("--formato", default="engine", choices=sorted(EXTENSIONES))
+    args = parser.parse_args()
+
+    if args.modelo:
+        print(motor_en_cache(args.modelo, args.imgsz, args.precision, args.formato))
+    else:
+        for e in cache.listar():
+            print(f"{Path(e['ruta']).name:<60} {e['formato']:<9} {e['precision']:<5} "
+                  f"imgsz={e['imgsz']:<5} {e['segundos_construccion']:>6.0f}s  {e['fecha']}")
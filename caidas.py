@@ -0,0 +1,112 @@
+"""
+Ruta prioritaria para caídas
+Fall-Detected (clase 0 del modelo) no se trata como una etiqueta más: al
+verla, el flujo entra en modo prioritario durante unos segundos (sin salto
+de frames ni agrupación en lotes: cada frame se infiere en cuanto llega) y
+la alerta se publica en la cola de eventos por delante del EPP pendiente.
+"""
+
+import os
+import time
+
+import numpy as np
+
+from asociacion_epp import detecciones_de_resultado
+from eventos import PRIORIDAD_CAIDA, eventos
+
+
+NOMBRE_CAIDA = "Fall-Detected"
+
+# Segundos en modo prioritario tras la última caída vista
+VENTANA_PRIORIDAD = float(os.environ.get("EPP_CAIDA_VENTANA", "5"))
+
+
+def id_caida(names):
+    """Id de Fall-Detected en model.names (None si el modelo no la tiene)"""
+    return next((int(k) for k, v in names.items() if v == NOMBRE_CAIDA), None)
+
+
+class DetectorCaidas:
+    """Vigila Fall-Detected en un flujo y activa su modo prioritario
+
+    Args:
+        names: dict id -> nombre de clase del modelo
+        fuente: nombre de la cámara / video (va en el evento)
+        ventana: segundos de modo prioritario tras la última caída vista
+        cooldown: segundos mínimos entre dos alertas de caída del mismo flujo
+        conf_min: confianza mínima de la caja Fall-Detected
+        metricas: MetricasFuente donde registrar el tiempo-a-alerta
+        cola: ColaEventos (por defecto la compartida)
+    """
+
+    def __init__(self, names, fuente="", ventana=None, cooldown=10.0, conf_min=0.0, metricas=None, cola=None):
+        self.id = id_caida(names)
+        self.fuente = fuente
+        self.ventana = VENTANA_PRIORIDAD if ventana is None else ventana
+        self.cooldown = cooldown
+        self.conf_min = conf_min
+        self.metricas = metricas
+        self.cola = cola or eventos
+        self.hasta = 0.0
+        self._ultima_alerta = None
+        self.vistas = 0
+        self.alertas = 0
+
+    @classmethod
+    def para_modelo(cls, names, **kwargs):
+        """DetectorCaidas si el modelo tiene la clase; si no, None"""
+        return cls(names, **kwargs) if id_caida(names) is not None else None
+
+    @property
+    def prioritario(self):
+        """True mientras el flujo deba saltarse el salto de frames y los lotes"""
+        return time.monotonic() < self.hasta
+
+    def revisar(self, resultado, t_frame=None, frame=None):
+        """Revisa un resultado de ultralytics / ResultadoONNX (ver revisar_detecciones)"""
+        if resultado is None:
+            return None
+        return self.revisar_detecciones(*detecciones_de_resultado(resultado), t_frame=t_frame, frame=frame)
+
+    def revisar_detecciones(self, xyxy, cls, conf, t_frame=None, frame=None):
+        """Activa el modo prioritario y publica la alerta si hay una caída
+
+        Args:
+            t_frame: time.monotonic() de la captura/decodificación del frame
+            frame: número de frame (sólo informativo)
+
+        Returns:
+            el evento publicado o None (sin caída o en enfriamiento)
+        """
+        if self.id is None:
+            return None
+        caidas = np.flatnonzero((cls == self.id) & (conf >= self.conf_min))
+        if not len(caidas):
+            return None
+
+        ahora = time.monotonic()
+        if not self.prioritario:
+            print(f"⚡ [{self.fuente}] Caída: modo prioritario por {self.ventana:g}s (sin salto ni lotes)")
+        self.hasta = ahora + self.ventana
+        self.vistas += 1
+        if self._ultima_alerta is not None and ahora - self._ultima_alerta < self.cooldown:
+            return None
+
+        self._ultima_alerta = ahora
+        self.alertas += 1
+        mejor = caidas[np.argmax(conf[caidas])]
+        evento = {
+            'tipo': 'caida',
+            'fuente': self.fuente,
+            'clase': NOMBRE_CAIDA,
+            'nivel': 'PELIGRO',
+            'conf': float(conf[mejor]),
+            'caja': [round(float(v), 1) for v in xyxy[mejor]],
+            'frame': frame,
+        }
+        self.cola.publicar(evento, PRIORIDAD_CAIDA, t_frame=t_frame if t_frame is not None else ahora,
+                           metricas=self.metricas)
+        return evento
+
+    def resumen(self):
+        return f"{self.alertas} alertas de caída ({self.vistas} frames con caída)"
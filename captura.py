@@ -0,0 +1,242 @@
+"""
+Captura de frames en un hilo de fondo
+Decodifica en un buffer circular preasignado; el consumidor siempre recibe
+el frame más reciente y puede consultar cuántos se descartaron.
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+def fuente_sintetica(ancho=640, alto=480, fps=30.0, frames=None):
+    """Generador de frames sintéticos (rectángulo en movimiento) para pruebas sin cámara
+
+    Args:
+        ancho, alto: resolución de los frames
+        fps: ritmo de generación (None = tan rápido como se pueda)
+        frames: número total de frames (None = infinito)
+    """
+    base = np.zeros((alto, ancho, 3), dtype=np.uint8)
+    lado = max(16, min(ancho, alto) // 4)
+    periodo = 1.0 / fps if fps else 0.0
+    siguiente = time.perf_counter()
+    i = 0
+    while frames is None or i < frames:
+        frame = base.copy()
+        x = (i * 7) % max(1, ancho - lado)
+        y = (i * 3) % max(1, alto - lado)
+        frame[y:y + lado, x:x + lado] = (0, 200, 255)
+        if periodo:
+            siguiente += periodo
+            espera = siguiente - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+        yield frame
+        i += 1
+
+
+class CapturaHilo:
+    """Capturador de frames con buffer circular "gana el último frame"
+
+    Args:
+        fuente: índice de webcam (int), ruta de archivo / URL (str), o un
+            iterable/generador de frames (p.ej. fuente_sintetica())
+        slots: tamaño del buffer circular (mínimo 3: uno en uso por el
+            consumidor, uno listo y uno en escritura)
+        descartar: True para cámaras en vivo (se sobrescriben frames no leídos);
+            False para archivos (el hilo espera al consumidor, sin pérdidas)
+        tiempo_real: decodificar un archivo al ritmo de su FPS, como si fuera
+            una cámara (archivos usados como sustitutos de cámaras)
+        repetir: volver al inicio del archivo al terminar
+    """
+
+    def __init__(self, fuente=0, slots=3, descartar=True, tiempo_real=False, repetir=False):
+        self.fuente = fuente
+        self.num_slots = max(3, int(slots))
+        self.descartar = descartar
+        self.tiempo_real = tiempo_real
+        self.repetir = repetir
+
+        self.cap = None
+        self._iterador = None
+        self._slots = []
+        self._tiempos = []
+        self._ultimo = None      # Slot con el frame más reciente
+        self._en_uso = None      # Slot entregado al consumidor
+        self._nuevo = False      # Hay un frame que el consumidor aún no leyó
+        self._fin = False
+        self._hilo = None
+        self._cond = threading.Condition()
+
+        self.capturados = 0
+        self.descartados = 0
+        self.entregados = 0
+        self.fps = 0
+        self.ancho = 0
+        self.alto = 0
+        self.total_frames = 0
+        self.t_captura = None    # Marca de tiempo del último frame entregado
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def iniciar(self):
+        """Abre la fuente, preasigna el buffer y arranca el hilo de captura"""
+        if isinstance(self.fuente, (int, str)):
+            self.cap = cv2.VideoCapture(self.fuente)
+            if not self.cap.isOpened():
+                return False
+            self.fps = int(self.cap.get(cv2.CAP_PROP_FPS))
+            self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            ok, primero = self.cap.read()
+        else:
+            self._iterador = iter(self.fuente)
+            primero = next(self._iterador, None)
+            ok = primero is not None
+
+        if not ok:
+            self._liberar_fuente()
+            return False
+
+        self.alto, self.ancho = primero.shape[:2]
+        self._slots = [np.empty_like(primero) for _ in range(self.num_slots)]
+        self._tiempos = [0.0] * self.num_slots
+        self._publicar(0, primero)
+
+        self._hilo = threading.Thread(target=self._bucle, name="CapturaHilo", daemon=True)
+        self._hilo.start()
+        return True
+
+    def isOpened(self):
+        """Compatibilidad con cv2.VideoCapture"""
+        return self._hilo is not None and not (self._fin and not self._nuevo)
+
+    def detener(self):
+        """Detiene el hilo y libera la fuente"""
+        with self._cond:
+            self._fin = True
+            self._cond.notify_all()
+        if self._hilo is not None:
+            self._hilo.join(timeout=2.0)
+            self._hilo = None
+        self._liberar_fuente()
+
+    release = detener
+
+    def __enter__(self):
+        if not self.iniciar():
+            raise RuntimeError(f"No se puede abrir la fuente de video: {self.fuente}")
+        return self
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    # ------------------------------------------------------------------
+    # Consumidor
+    # ------------------------------------------------------------------
+
+    def leer(self, timeout=None):
+        """Devuelve (ok, frame) con el frame más reciente
+
+        El frame es una vista del buffer interno y sigue siendo válido hasta
+        la siguiente llamada a leer(). Bloquea hasta que haya un frame nuevo.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._nuevo or self._fin, timeout):
+                return False, None
+            if not self._nuevo:
+                return False, None
+            self._en_uso = self._ultimo
+            self._nuevo = False
+            self.entregados += 1
+            self.t_captura = self._tiempos[self._en_uso]
+            self._cond.notify_all()
+            return True, self._slots[self._en_uso]
+
+    read = leer
+
+    @property
+    def estadisticas(self):
+        return {
+            'capturados': self.capturados,
+            'entregados': self.entregados,
+            'descartados': self.descartados,
+        }
+
+    # ------------------------------------------------------------------
+    # Productor
+    # ------------------------------------------------------------------
+
+    def _bucle(self):
+        periodo = 1.0 / self.fps if self.tiempo_real and self.fps > 0 else 0.0
+        siguiente = time.perf_counter()
+        while True:
+            if periodo:
+                siguiente += periodo
+                espera = siguiente - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+            with self._cond:
+                if not self.descartar:
+                    self._cond.wait_for(lambda: not self._nuevo or self._fin)
+                if self._fin:
+                    return
+                libre = next(i for i in range(self.num_slots)
+                             if i != self._ultimo and i != self._en_uso)
+
+            ok = self._decodificar(libre)
+
+            with self._cond:
+                if not ok:
+                    self._fin = True
+                    self._cond.notify_all()
+                    return
+                self._marcar_listo(libre)
+
+    def _decodificar(self, i):
+        """Decodifica el siguiente frame directamente en el slot i"""
+        destino = self._slots[i]
+        if self.cap is not None:
+            ok, frame = self.cap.read(destino)
+            if not ok and self.repetir and self.total_frames > 0:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = self.cap.read(destino)
+        else:
+            frame = next(self._iterador, None)
+            ok = frame is not None
+            if ok and frame.shape == destino.shape:
+                np.copyto(destino, frame)
+                frame = destino
+        if ok and not np.may_share_memory(frame, destino):
+            # Cambió la resolución de la fuente: se reemplaza el slot
+            self._slots[i] = frame
+        return ok
+
+    def _publicar(self, i, frame):
+        np.copyto(self._slots[i], frame)
+        with self._cond:
+            self._marcar_listo(i)
+
+    def _marcar_listo(self, i):
+        if self._nuevo:
+            self.descartados += 1
+        self._tiempos[i] = time.monotonic()
+        self._ultimo = i
+        self._nuevo = True
+        self.capturados += 1
+        self._cond.notify_all()
+
+    def _liberar_fuente(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        if self._iterador is not None and hasattr(self._iterador, 'close'):
+            try:
+                self._iterador.close()
+            except ValueError:
+                pass  # El hilo aún está dentro del generador
+        self._iterador = None
@@ -0,0 +1,174 @@
+"""
+Clips de evidencia con pre-roll
+Mantiene en memoria los últimos N segundos como JPEG (memoria acotada, no
+arrays crudos). Al dispararse un evento (acceso denegado, clases NO-* que
+persisten) se arma un clip con los segundos previos y los posteriores, y se
+escribe a disco en un hilo aparte sin frenar la detección.
+"""
+
+import collections
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+_FIN = object()
+
+
+class GrabadorClips:
+    """Buffer circular de frames JPEG + escritura asíncrona de clips
+
+    Args:
+        carpeta: destino de los clips (.mp4 + .json con el motivo)
+        segundos_previos: pre-roll
+        segundos_posteriores: post-roll tras el último disparo
+        fps: frames por segundo almacenados (se descartan los intermedios)
+        calidad: calidad JPEG (0-100)
+        max_segundos: duración máxima de un clip aunque se siga disparando
+        max_bytes: tope de memoria del buffer circular
+    """
+
+    def __init__(self, carpeta="clips", segundos_previos=5.0, segundos_posteriores=5.0, fps=10.0,
+                 calidad=80, max_segundos=60.0, max_bytes=64 * 1024 * 1024):
+        self.carpeta = Path(carpeta)
+        self.segundos_previos = segundos_previos
+        self.segundos_posteriores = segundos_posteriores
+        self.intervalo = 1.0 / fps
+        self.fps = fps
+        self.parametros = [int(cv2.IMWRITE_JPEG_QUALITY), int(calidad)]
+        self.max_segundos = max_segundos
+        self.max_bytes = max_bytes
+
+        self._buffer = collections.deque()       # (t, jpeg)
+        self.bytes_buffer = 0
+        self._t_ultimo = None
+        self._clip = None
+        self._cola = queue.Queue()
+        self._hilo = None
+
+        self.eventos = 0
+        self.clips_escritos = 0
+        self.rutas = []
+
+    def iniciar(self):
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        self._hilo = threading.Thread(target=self._bucle, name="GrabadorClips", daemon=True)
+        self._hilo.start()
+        return self
+
+    def agregar(self, frame, ahora=None):
+        """Comprime y guarda el frame (a lo sumo 'fps' por segundo)"""
+        ahora = time.monotonic() if ahora is None else ahora
+        if self._t_ultimo is not None and ahora - self._t_ultimo < self.intervalo:
+            return
+        self._t_ultimo = ahora
+        ok, jpeg = cv2.imencode(".jpg", frame, self.parametros)
+        if not ok:
+            return
+        entrada = (ahora, jpeg)
+
+        self._buffer.append(entrada)
+        self.bytes_buffer += jpeg.nbytes
+        while self._buffer and (ahora - self._buffer[0][0] > self.segundos_previos or
+                                self.bytes_buffer > self.max_bytes):
+            self.bytes_buffer -= self._buffer.popleft()[1].nbytes
+
+        if self._clip is not None:
+            self._clip['frames'].append(entrada)
+            if ahora >= self._clip['hasta'] or ahora - self._clip['inicio'] >= self.max_segundos:
+                self._cerrar()
+
+    def disparar(self, motivo, ahora=None, **datos):
+        """Evento: abre un clip con el pre-roll o extiende el post-roll del abierto"""
+        ahora = time.monotonic() if ahora is None else ahora
+        if self._clip is None:
+            self.eventos += 1
+            self._clip = {
+                'motivo': motivo,
+                'fecha': datetime.now(),
+                'inicio': ahora,
+                'hasta': ahora + self.segundos_posteriores,
+                'frames': list(self._buffer),
+                'eventos': [],
+            }
+        else:
+            self._clip['hasta'] = ahora + self.segundos_posteriores
+        self._clip['eventos'].append({'motivo': motivo, 't': round(ahora - self._clip['inicio'], 2), **datos})
+
+    @property
+    def grabando(self):
+        return self._clip is not None
+
+    def _cerrar(self):
+        self._cola.put(self._clip)
+        self._clip = None
+
+    def _bucle(self):
+        while True:
+            clip = self._cola.get()
+            if clip is _FIN:
+                return
+            try:
+                self._escribir(clip)
+            except Exception as e:
+                print(f"⚠️  No se pudo escribir el clip: {e}")
+
+    def _escribir(self, clip):
+        if not clip['frames']:
+            return
+        nombre = f"clip_{clip['fecha'].strftime('%Y%m%d_%H%M%S')}_{clip['motivo']}"
+        ruta = self.carpeta / f"{nombre}.mp4"
+        primero = cv2.imdecode(clip['frames'][0][1], cv2.IMREAD_COLOR)
+        alto, ancho = primero.shape[:2]
+        writer = cv2.VideoWriter(str(ruta), cv2.VideoWriter_fourcc(*'mp4v'), self.fps, (ancho, alto))
+        for _, jpeg in clip['frames']:
+            writer.write(cv2.imdecode(jpeg, cv2.IMREAD_COLOR))
+        writer.release()
+
+        with open(self.carpeta / f"{nombre}.json", 'w') as f:
+            json.dump({'motivo': clip['motivo'], 'fecha': clip['fecha'].isoformat(timespec='seconds'),
+                       'frames': len(clip['frames']), 'pre_roll_s': self.segundos_previos,
+                       'eventos': clip['eventos']}, f, indent=2, default=str)
+        self.clips_escritos += 1
+        self.rutas.append(ruta)
+        print(f"🎬 Clip guardado: {ruta}")
+
+    def detener(self):
+        """Cierra el clip abierto y espera a que se escriban los pendientes"""
+        if self._clip is not None:
+            self._cerrar()
+        if self._hilo is not None:
+            self._cola.put(_FIN)
+            self._hilo.join()
+            self._hilo = None
+
+
+class PersistenciaClases:
+    """Dispara cuando alguna clase vigilada aparece N detecciones seguidas
+
+    Args:
+        ids: ids de clase a vigilar (p.ej. todas las NO-*)
+        frames_min: detecciones consecutivas necesarias
+    """
+
+    def __init__(self, ids, frames_min=5):
+        self.ids = np.asarray(sorted(ids), dtype=np.intp)
+        self.frames_min = frames_min
+        self._rachas = np.zeros(len(self.ids), dtype=np.int64)
+
+    @classmethod
+    def clases_no(cls, names, frames_min=5):
+        """Vigila todas las clases NO-* del modelo"""
+        return cls([int(k) for k, v in names.items() if v.startswith('NO-')], frames_min)
+
+    def actualizar(self, cls):
+        """Procesa las clases de un frame y devuelve los ids que acaban de alcanzar la racha"""
+        presentes = np.isin(self.ids, cls)
+        self._rachas = np.where(presentes, self._rachas + 1, 0)
+        return self.ids[self._rachas == self.frames_min].tolist()
@@ -0,0 +1,127 @@
+"""
+Máquina de estados del control de acceso
+Sólo toca el hardware (pines, LCD, servo) en las transiciones, con
+histéresis para que la puerta no vibre cuando las detecciones parpadean.
+
+    DENEGADO → VERIFICANDO → PERMITIDO → MANTENER_ABIERTO → CERRANDO → DENEGADO
+"""
+
+import time
+
+
+DENEGADO = "DENEGADO"
+VERIFICANDO = "VERIFICANDO"
+PERMITIDO = "PERMITIDO"
+MANTENER_ABIERTO = "MANTENER_ABIERTO"
+CERRANDO = "CERRANDO"
+
+
+class MaquinaAcceso:
+    """Decisión de acceso con histéresis, disparada por flancos
+
+    Args:
+        actuador: ActuadorPuerta (o None para sólo calcular estados)
+        frames_para_permitir: frames consecutivos con EPP completo antes de abrir
+        tiempo_min_abierto: segundos que la puerta sigue abierta tras el último frame válido
+        tiempo_cierre: segundos que dura el cierre del servo
+    """
+
+    def __init__(self, actuador=None, frames_para_permitir=5, tiempo_min_abierto=3.0,
+                 tiempo_cierre=1.0):
+        self.actuador = actuador
+        self.frames_para_permitir = max(1, int(frames_para_permitir))
+        self.tiempo_min_abierto = tiempo_min_abierto
+        self.tiempo_cierre = tiempo_cierre
+
+        self.estado = DENEGADO
+        self.consecutivos = 0
+        self.t_estado = None
+        self.t_ultimo_ok = None
+        self.detalle_incumple = ""     # Detalle del último frame sin EPP (para la LCD al denegar)
+        self.transiciones = 0
+
+    def iniciar(self, ahora=None):
+        """Deja el hardware en el estado inicial (acceso denegado, puerta cerrada)"""
+        self.estado = DENEGADO
+        self.consecutivos = 0
+        self.t_estado = self._ahora(ahora)
+        if self.actuador:
+            self.actuador.pines(False)
+            self.actuador.puerta(False)
+        return self
+
+    @property
+    def puerta_abierta(self):
+        return self.estado in (PERMITIDO, MANTENER_ABIERTO)
+
+    def actualizar(self, cumple, detalle="", ahora=None):
+        """Procesa la decisión de un frame
+
+        Args:
+            cumple: True si el frame tiene el EPP completo
+            detalle: texto para la LCD en las transiciones (p.ej. "Falta Hardhat")
+            ahora: marca de tiempo en segundos (por defecto time.monotonic())
+
+        Returns:
+            El nuevo estado si hubo transición, None en caso contrario
+        """
+        ahora = self._ahora(ahora)
+        if self.t_estado is None:
+            self.t_estado = ahora
+
+        if cumple:
+            self.t_ultimo_ok = ahora
+            self.consecutivos += 1
+        else:
+            self.consecutivos = 0
+            self.detalle_incumple = detalle
+
+        if self.estado == DENEGADO:
+            if cumple:
+                if self.consecutivos >= self.frames_para_permitir:
+                    return self._transicion(PERMITIDO, ahora, detalle)
+                return self._transicion(VERIFICANDO, ahora, detalle)
+
+        elif self.estado == VERIFICANDO:
+            if not cumple:
+                return self._transicion(DENEGADO, ahora, detalle)
+            if self.consecutivos >= self.frames_para_permitir:
+                return self._transicion(PERMITIDO, ahora, detalle)
+
+        elif self.estado == PERMITIDO:
+            return self._transicion(MANTENER_ABIERTO, ahora, detalle)
+
+        elif self.estado == MANTENER_ABIERTO:
+            if ahora - self.t_ultimo_ok >= self.tiempo_min_abierto:
+                return self._transicion(CERRANDO, ahora, detalle)
+
+        elif self.estado == CERRANDO:
+            if ahora - self.t_estado >= self.tiempo_cierre:
+                return self._transicion(DENEGADO, ahora, detalle)
+
+        return None
+
+    def _transicion(self, nuevo, ahora, detalle):
+        anterior = self.estado
+        self.estado = nuevo
+        self.t_estado = ahora
+        self.transiciones += 1
+        if self.actuador:
+            self._aplicar(anterior, nuevo, detalle)
+        return nuevo
+
+    def _aplicar(self, anterior, nuevo, detalle):
+        """Efectos de hardware de cada transición"""
+        if nuevo == VERIFICANDO:
+            self.actuador.lcd("VERIFICANDO EPP", "No se mueva")
+        elif nuevo == PERMITIDO:
+            self.actuador.acceso(True, "ACCESO PERMITIDO", detalle or "Puede entrar")
+        elif nuevo == CERRANDO:
+            self.actuador.acceso(False, "CERRANDO PUERTA", "")
+        elif nuevo == DENEGADO:
+            # Al cerrar el frame puede cumplir: su detalle ("EPP Completo OK") no vale
+            self.actuador.lcd("ACCESO DENEGADO", self.detalle_incumple or "Falta EPP!")
+
+    @staticmethod
+    def _ahora(ahora):
+        return time.monotonic() if ahora is None else ahora
@@ -0,0 +1,299 @@
+"""
+Cuantización INT8 estática del modelo ONNX para equipos sólo-CPU
+Calibra con frames muestreados de los videos de obra, genera un ONNX
+cuantizado (QDQ) para onnxruntime y compara contra el FP32 en un conjunto
+etiquetado aparte: mAP@0.5, latencia y recall por clase de las NO-*.
+Un detector de seguridad no puede perder recall de NO-Hardhat sin que se note.
+"""
+
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from asociacion_epp import iou
+from backend_onnx import DetectorONNX
+
+
+EXTENSIONES_VIDEO = ('.mp4', '.avi', '.mov', '.mkv')
+EXTENSIONES_IMAGEN = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+# ----------------------------------------------------------------------
+# Calibración
+# ----------------------------------------------------------------------
+
+def muestrear_frames(carpeta_videos, n_frames=300):
+    """Frames repartidos uniformemente entre todos los videos de la carpeta"""
+    videos = sorted(p for p in Path(carpeta_videos).iterdir() if p.suffix.lower() in EXTENSIONES_VIDEO)
+    if not videos:
+        raise RuntimeError(f"No hay videos en {carpeta_videos}")
+
+    por_video = max(1, n_frames // len(videos))
+    frames = []
+    for video in videos:
+        cap = cv2.VideoCapture(str(video))
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total <= 0:
+            cap.release()
+            continue
+        for pos in np.linspace(0, total - 1, min(por_video, total)).astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(pos))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+    print(f"🎞️  {len(frames)} frames de calibración de {len(videos)} videos")
+    return frames[:n_frames]
+
+
+def _lector_calibracion(detector, frames):
+    """CalibrationDataReader con el mismo preprocesado que DetectorONNX"""
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class LectorCalibracion(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter(frames)
+            self._nombre = detector.sesion.get_inputs()[0].name
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            if frame is None:
+                return None
+            detector.preprocesar(frame)
+            return {self._nombre: detector._entrada.copy()}
+
+    return LectorCalibracion()
+
+
+def _nodos_decodificacion(ruta_onnx):
+    """Nodos de la cabeza de detección que no son Conv (DFL, sigmoid, concat...)
+
+    La decodificación de cajas y puntajes es la parte más sensible a la
+    cuantización y la más barata de ejecutar: se deja en FP32.
+    """
+    import onnx
+
+    nodos = onnx.load(str(ruta_onnx)).graph.node
+    prefijo = "/".join(nodos[-1].name.split("/")[:2]) + "/"
+    return [n.name for n in nodos if n.name.startswith(prefijo) and n.op_type != 'Conv']
+
+
+def cuantizar_int8(ruta_onnx, carpeta_videos, salida=None, n_frames=300, metodo='MinMax'):
+    """Cuantiza estáticamente un ONNX FP32 a INT8 (formato QDQ)
+
+    Args:
+        ruta_onnx: modelo FP32 exportado por ultralytics
+        carpeta_videos: videos de obra de donde se muestrean los frames de calibración
+        salida: ruta del modelo cuantizado (por defecto <nombre>_int8.onnx)
+        n_frames: frames de calibración
+        metodo: 'MinMax', 'Entropy' o 'Percentile'
+    """
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    ruta_onnx = Path(ruta_onnx)
+    salida = Path(salida) if salida else ruta_onnx.with_name(f"{ruta_onnx.stem}_int8.onnx")
+    preparado = ruta_onnx.with_name(f"{ruta_onnx.stem}_prep.onnx")
+
+    frames = muestrear_frames(carpeta_videos, n_frames)
+    detector = DetectorONNX(ruta_onnx, providers=['CPUExecutionProvider'])
+
+    print("🔧 Preprocesando grafo (inferencia de formas)...")
+    quant_pre_process(str(ruta_onnx), str(preparado))
+
+    excluidos = _nodos_decodificacion(preparado)
+    print(f"🔢 Cuantizando a INT8 ({metodo}, {len(excluidos)} nodos de decodificación en FP32)...")
+    t0 = time.perf_counter()
+    quantize_static(
+        str(preparado), str(salida),
+        _lector_calibracion(detector, frames),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=getattr(CalibrationMethod, metodo),
+        nodes_to_exclude=excluidos,
+    )
+    preparado.unlink(missing_ok=True)
+    print(f"✅ Modelo INT8: {salida} ({time.perf_counter() - t0:.0f}s)")
+    return salida
+
+
+# ----------------------------------------------------------------------
+# Evaluación
+# ----------------------------------------------------------------------
+
+def cargar_conjunto(carpeta):
+    """Conjunto etiquetado en formato YOLO: carpeta/images/*.jpg + carpeta/labels/*.txt
+
+    Devuelve [(ruta_imagen, cls N, xyxy N×4 normalizado)]
+    """
+    carpeta = Path(carpeta)
+    muestras = []
+    for imagen in sorted((carpeta / "images").iterdir()):
+        if imagen.suffix.lower() not in EXTENSIONES_IMAGEN:
+            continue
+        etiqueta = carpeta / "labels" / f"{imagen.stem}.txt"
+        datos = np.zeros((0, 5), dtype=np.float32)
+        if etiqueta.exists() and etiqueta.stat().st_size > 0:
+            datos = np.loadtxt(etiqueta, dtype=np.float32, ndmin=2)[:, :5]
+        cxcywh = datos[:, 1:5]
+        xyxy = np.concatenate([cxcywh[:, :2] - cxcywh[:, 2:] / 2, cxcywh[:, :2] + cxcywh[:, 2:] / 2], axis=1)
+        muestras.append((imagen, datos[:, 0].astype(np.intp), xyxy))
+    if not muestras:
+        raise RuntimeError(f"No hay imágenes en {carpeta / 'images'}")
+    return muestras
+
+
+def _precision_promedio(aciertos, puntajes, n_gt):
+    """AP con interpolación en todos los puntos (estilo VOC/COCO)"""
+    if n_gt == 0:
+        return None
+    if len(puntajes) == 0:
+        return 0.0
+    orden = np.argsort(-puntajes)
+    tp = np.cumsum(aciertos[orden])
+    fp = np.cumsum(~aciertos[orden])
+    recall = tp / n_gt
+    precision = tp / np.maximum(tp + fp, 1e-9)
+    precision = np.maximum.accumulate(np.concatenate([[0.0], precision, [0.0]])[::-1])[::-1]
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    cambios = np.flatnonzero(recall[1:] != recall[:-1])
+    return float(np.sum((recall[cambios + 1] - recall[cambios]) * precision[cambios + 1]))
+
+
+def evaluar_modelo(detector, conjunto, umbral_iou=0.5, conf_operativa=0.25):
+    """mAP@0.5, recall por clase a la confianza operativa y latencia media
+
+    Args:
+        detector: DetectorONNX
+        conjunto: salida de cargar_conjunto()
+        umbral_iou: IoU mínimo para contar una detección como acierto
+        conf_operativa: confianza usada en producción para el recall por clase
+    """
+    num_clases = len(detector.names)
+    aciertos = [[] for _ in range(num_clases)]
+    puntajes = [[] for _ in range(num_clases)]
+    n_gt = np.zeros(num_clases, dtype=np.int64)
+    detectados_gt = np.zeros(num_clases, dtype=np.int64)
+    detector.acumulado = {'preprocess': 0.0, 'inference': 0.0, 'postprocess': 0.0, 'frames': 0}
+
+    for ruta, cls_gt, xyxy_gt in conjunto:
+        frame = cv2.imread(str(ruta))
+        h, w = frame.shape[:2]
+        gt = xyxy_gt * np.array([w, h, w, h], dtype=np.float32)
+        cajas = detector(frame, conf=0.001)[0].boxes
+        n_gt += np.bincount(cls_gt, minlength=num_clases)[:num_clases]
+
+        for k in np.union1d(np.unique(cls_gt), np.unique(cajas.cls)):
+            det = cajas.cls == k
+            xyxy_det, conf_det = cajas.xyxy[det], cajas.conf[det]
+            gt_k = gt[cls_gt == k]
+            orden = np.argsort(-conf_det)
+            xyxy_det, conf_det = xyxy_det[orden], conf_det[orden]
+
+            acierto = np.zeros(len(conf_det), dtype=bool)
+            if len(gt_k) and len(conf_det):
+                matriz = iou(xyxy_det, gt_k)
+                libre = np.ones(len(gt_k), dtype=bool)
+                for d in range(len(conf_det)):
+                    candidatos = np.where(libre, matriz[d], -1.0)
+                    g = int(np.argmax(candidatos))
+                    if candidatos[g] >= umbral_iou:
+                        acierto[d] = True
+                        libre[g] = False
+                        if conf_det[d] >= conf_operativa:
+                            detectados_gt[k] += 1
+            aciertos[k].append(acierto)
+            puntajes[k].append(conf_det)
+
+    ap = {}
+    recall = {}
+    for k in range(num_clases):
+        a = np.concatenate(aciertos[k]) if aciertos[k] else np.zeros(0, dtype=bool)
+        s = np.concatenate(puntajes[k]) if puntajes[k] else np.zeros(0, dtype=np.float32)
+        valor = _precision_promedio(a, s, int(n_gt[k]))
+        if valor is not None:
+            nombre = detector.names[k]
+            ap[nombre] = valor
+            recall[nombre] = float(detectados_gt[k] / n_gt[k])
+
+    return {
+        'map50': float(np.mean(list(ap.values()))) if ap else 0.0,
+        'ap50': ap,
+        'recall': recall,
+        'latencia_ms': detector.latencia_media(),
+        'imagenes': len(conjunto),
+    }
+
+
+def reporte_cuantizacion(ruta_fp32, ruta_int8, carpeta_validacion, tolerancia_recall=0.02,
+                         conf_operativa=0.25, salida_json=None):
+    """Compara FP32 vs INT8 en CPU y marca cualquier caída de recall en las clases NO-*
+
+    Returns:
+        dict con ambas evaluaciones y 'aprobado' (ninguna NO-* cae más que la tolerancia)
+    """
+    conjunto = cargar_conjunto(carpeta_validacion)
+    evaluaciones = {}
+    for nombre, ruta in (('fp32', ruta_fp32), ('int8', ruta_int8)):
+        print(f"📏 Evaluando {nombre}: {Path(ruta).name} ({len(conjunto)} imágenes)...")
+        detector = DetectorONNX(ruta, providers=['CPUExecutionProvider'])
+        evaluaciones[nombre] = evaluar_modelo(detector, conjunto, conf_operativa=conf_operativa)
+
+    fp32, int8 = evaluaciones['fp32'], evaluaciones['int8']
+    lat_fp32 = sum(fp32['latencia_ms'].values())
+    lat_int8 = sum(int8['latencia_ms'].values())
+
+    print("\n" + "=" * 60)
+    print("REPORTE DE CUANTIZACIÓN INT8")
+    print("=" * 60)
+    print(f"{'':<18}{'FP32':>12}{'INT8':>12}")
+    print(f"{'mAP@0.5':<18}{fp32['map50']:>12.3f}{int8['map50']:>12.3f}")
+    print(f"{'Latencia (ms)':<18}{lat_fp32:>12.1f}{lat_int8:>12.1f}")
+    if lat_int8 > 0:
+        print(f"{'Aceleración':<18}{'':>12}{lat_fp32 / lat_int8:>11.2f}x")
+
+    print(f"\nRecall @conf={conf_operativa} en clases NO-* (tolerancia {tolerancia_recall:.0%}):")
+    caidas = {}
+    for clase in sorted(c for c in fp32['recall'] if c.startswith('NO-')):
+        r32, r8 = fp32['recall'][clase], int8['recall'].get(clase, 0.0)
+        caidas[clase] = r32 - r8
+        marca = "⚠️ " if caidas[clase] > tolerancia_recall else "✅"
+        print(f"   {marca} {clase:<16}{r32:>8.3f} → {r8:.3f} ({r8 - r32:+.3f})")
+    if not caidas:
+        print("   (el conjunto de validación no tiene etiquetas NO-*)")
+
+    aprobado = all(c <= tolerancia_recall for c in caidas.values())
+    print("\n" + ("✅ INT8 aprobado" if aprobado else "❌ INT8 pierde recall en clases NO-*: no usar en producción"))
+
+    reporte = {'fp32': fp32, 'int8': int8, 'caida_recall_no': caidas,
+               'tolerancia_recall': tolerancia_recall, 'aprobado': aprobado,
+               'modelos': {'fp32': str(ruta_fp32), 'int8': str(ruta_int8)}}
+    if salida_json:
+        with open(salida_json, 'w') as f:
+            json.dump(reporte, f, indent=2)
+        print(f"📄 Reporte guardado: {salida_json}")
+    return reporte
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cuantización INT8 estática + reporte de precisión/latencia")
+    parser.add_argument("modelo", help="Modelo ONNX FP32")
+    parser.add_argument("--videos", required=True, help="Carpeta con videos de obra para calibrar")
+    parser.add_argument("--validacion", help="Conjunto etiquetado (images/ + labels/) para el reporte")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--metodo", default="MinMax", choices=["MinMax", "Entropy", "Percentile"])
+    parser.add_argument("--tolerancia", type=float, default=0.02, help="Caída máxima de recall NO-*")
+    parser.add_argument("--salida", help="Ruta del modelo INT8")
+    args = parser.parse_args()
+
+    int8 = cuantizar_int8(args.modelo, args.videos, args.salida, args.frames, args.metodo)
+    if args.validacion:
+        reporte_cuantizacion(args.modelo, int8, args.validacion, args.tolerancia,
+                             salida_json=Path(int8).with_suffix(".reporte.json"))
@@ -0,0 +1,224 @@
+"""
+Escritura de video en un hilo aparte
+La codificación sale del hilo de inferencia: los frames pasan por una cola
+acotada (con métricas de contrapresión) a un hilo escritor que usa
+cv2.VideoWriter (códec FOURCC) o un proceso ffmpeg (codificadores por
+hardware como h264_nvenc / h264_v4l2m2m, con bitrate). Opcionalmente se
+escribe a resolución reducida o sólo los frames alrededor de infracciones.
+"""
+
+import collections
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+import cv2
+
+
+_FIN = object()
+
+
+class EscritorVideo:
+    """Escritor de video asíncrono
+
+    Args:
+        ruta: archivo de salida
+        fps: FPS del video de salida
+        tamano: (ancho, alto) de los frames de entrada
+        codec: FOURCC de 4 letras para cv2 ('mp4v', 'avc1', 'MJPG') o nombre de
+            codificador ffmpeg ('libx264', 'h264_nvenc', 'h264_v4l2m2m'...)
+        bitrate: p.ej. '2M' (sólo con ffmpeg)
+        escala: factor de resolución de salida (0.5 = mitad)
+        cola_max: frames en espera antes de aplicar contrapresión
+        bloquear: True = el productor espera si la cola está llena (sin pérdidas);
+            False = se descarta el frame (el hilo de inferencia nunca espera)
+        metricas: MetricasFuente donde registrar la etapa 'escritura' por frame
+    """
+
+    def __init__(self, ruta, fps, tamano, codec='mp4v', bitrate=None, escala=1.0,
+                 cola_max=32, bloquear=True, metricas=None):
+        self.ruta = str(ruta)
+        self.fps = fps if fps and fps > 0 else 30
+        self.escala = escala
+        ancho, alto = tamano
+        self.tamano = (int(ancho * escala) // 2 * 2, int(alto * escala) // 2 * 2) if escala != 1.0 else (ancho, alto)
+        self.codec = codec
+        self.bitrate = bitrate
+        self.bloquear = bloquear
+        self.metricas_fuente = metricas
+
+        self._cola = queue.Queue(maxsize=cola_max)
+        self._hilo = None
+        self._salida = None
+        self.error = None
+
+        # Métricas de contrapresión
+        self.encolados = 0
+        self.escritos = 0
+        self.descartados = 0
+        self.esperas = 0
+        self.t_espera = 0.0
+        self.profundidad_max = 0
+        self.t_codificacion = 0.0
+
+    @property
+    def usa_ffmpeg(self):
+        return len(self.codec) != 4 or self.bitrate is not None
+
+    def iniciar(self):
+        if self.usa_ffmpeg:
+            if not shutil.which("ffmpeg"):
+                raise RuntimeError("ffmpeg no está instalado (requerido para codec/bitrate)")
+            codec = self.codec if len(self.codec) != 4 else 'libx264'
+            comando = ["ffmpeg", "-loglevel", "error", "-y",
+                       "-f", "rawvideo", "-pix_fmt", "bgr24",
+                       "-s", f"{self.tamano[0]}x{self.tamano[1]}", "-r", str(self.fps),
+                       "-i", "-", "-c:v", codec, "-pix_fmt", "yuv420p"]
+            if self.bitrate:
+                comando += ["-b:v", str(self.bitrate)]
+            if codec == 'libx264':
+                comando += ["-preset", "ultrafast"]
+            self._salida = subprocess.Popen(comando + [self.ruta], stdin=subprocess.PIPE)
+        else:
+            self._salida = cv2.VideoWriter(self.ruta, cv2.VideoWriter_fourcc(*self.codec),
+                                           self.fps, self.tamano)
+            if not self._salida.isOpened():
+                raise RuntimeError(f"No se puede crear el video {self.ruta} ({self.codec})")
+
+        self._hilo = threading.Thread(target=self._bucle, name="EscritorVideo", daemon=True)
+        self._hilo.start()
+        return self
+
+    def escribir(self, frame):
+        """Encola un frame (se copia: el llamador puede reutilizar su buffer)
+
+        Returns:
+            False si el frame se descartó por cola llena (bloquear=False)
+        """
+        if self.escala != 1.0:
+            frame = cv2.resize(frame, self.tamano, interpolation=cv2.INTER_AREA)
+        else:
+            frame = frame.copy()
+
+        try:
+            self._cola.put_nowait(frame)
+        except queue.Full:
+            if not self.bloquear:
+                self.descartados += 1
+                return False
+            self.esperas += 1
+            t0 = time.perf_counter()
+            self._cola.put(frame)
+            self.t_espera += time.perf_counter() - t0
+        self.encolados += 1
+        self.profundidad_max = max(self.profundidad_max, self._cola.qsize())
+        return True
+
+    def write(self, frame):
+        """Alias compatible con cv2.VideoWriter"""
+        self.escribir(frame)
+
+    def _bucle(self):
+        while True:
+            frame = self._cola.get()
+            if frame is _FIN:
+                return
+            if self.error is not None:
+                continue
+            t0 = time.perf_counter()
+            try:
+                if self.usa_ffmpeg:
+                    self._salida.stdin.write(frame.tobytes())
+                else:
+                    self._salida.write(frame)
+                self.escritos += 1
+            except (BrokenPipeError, OSError) as e:
+                self.error = e
+            duracion = time.perf_counter() - t0
+            self.t_codificacion += duracion
+            if self.metricas_fuente is not None:
+                self.metricas_fuente.observar('escritura', duracion)
+
+    def detener(self):
+        """Vacía la cola, cierra el archivo y devuelve las métricas"""
+        if self._hilo is not None:
+            self._cola.put(_FIN)
+            self._hilo.join()
+            self._hilo = None
+        if self._salida is not None:
+            if self.usa_ffmpeg:
+                self._salida.stdin.close()
+                self._salida.wait()
+            else:
+                self._salida.release()
+            self._salida = None
+        return self.metricas()
+
+    release = detener
+
+    def metricas(self):
+        return {
+            'encolados': self.encolados,
+            'escritos': self.escritos,
+            'descartados': self.descartados,
+            'esperas': self.esperas,
+            'segundos_espera': self.t_espera,
+            'profundidad_max': self.profundidad_max,
+            'ms_codificacion': self.t_codificacion * 1000 / max(1, self.escritos),
+        }
+
+    def resumen(self):
+        m = self.metricas()
+        return (f"{m['escritos']} frames escritos, {m['descartados']} descartados, "
+                f"{m['esperas']} esperas ({m['segundos_espera']:.2f}s), cola máx {m['profundidad_max']}, "
+                f"{m['ms_codificacion']:.1f} ms/frame codificando")
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+
+class SoloInfracciones:
+    """Filtra un escritor para guardar sólo los frames alrededor de infracciones
+
+    Guarda los últimos 'antes' frames en memoria y, cuando hay una infracción,
+    los escribe junto con los 'despues' frames siguientes.
+
+    Args:
+        escritor: EscritorVideo ya iniciado
+        antes: frames previos a la infracción
+        despues: frames posteriores a la última infracción
+    """
+
+    def __init__(self, escritor, antes=30, despues=30):
+        self.escritor = escritor
+        self.despues = despues
+        self._previos = collections.deque(maxlen=antes)
+        self._restantes = 0
+        self.segmentos = 0
+
+    def escribir(self, frame, infraccion):
+        if infraccion:
+            if self._restantes == 0:
+                self.segmentos += 1
+            while self._previos:
+                self.escritor.escribir(self._previos.popleft())
+            self._restantes = self.despues
+            self.escritor.escribir(frame)
+        elif self._restantes > 0:
+            self._restantes -= 1
+            self.escritor.escribir(frame)
+        else:
+            self._previos.append(frame.copy())
+
+    def detener(self):
+        return self.escritor.detener()
+
+    release = detener
+
+    def resumen(self):
+        return f"{self.segmentos} segmentos con infracciones; {self.escritor.resumen()}"
@@ -0,0 +1,102 @@
+"""
+Evaluación vectorizada de clases EPP
+Las clases objetivo se traducen una sola vez a ids/máscara y cada frame se
+evalúa con una operación NumPy sobre el tensor de clases de las cajas.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+RUTA_CLASES = Path(__file__).with_name("yolo11s_jetson_classes.json")
+
+
+def cargar_info_clases(ruta=RUTA_CLASES):
+    """Lee yolo11s_jetson_classes.json (names, epp_classes, no_epp_classes)"""
+    with open(ruta, encoding="utf-8") as f:
+        info = json.load(f)
+    info['names'] = {int(k): v for k, v in info['names'].items()}
+    return info
+
+
+def clases_de_resultado(resultado):
+    """Ids de clase de las cajas de un resultado de ultralytics como array int"""
+    cls = resultado.boxes.cls
+    if hasattr(cls, 'cpu'):
+        cls = cls.cpu().numpy()
+    return np.asarray(cls, dtype=np.intp)
+
+
+def confianzas_de_resultado(resultado):
+    """Confianza de cada caja de un resultado de ultralytics como array float"""
+    conf = resultado.boxes.conf
+    if hasattr(conf, 'cpu'):
+        conf = conf.cpu().numpy()
+    return np.asarray(conf, dtype=np.float32)
+
+
+class FiltroClases:
+    """Máscara de clases objetivo precalculada
+
+    Args:
+        names: dict id -> nombre (model.names o el JSON de clases)
+        clases_objetivo: nombres requeridos (None/vacío = todas las clases)
+        ids_extra: ids que el detector debe conservar aunque no sean objetivo
+            (p.ej. Person y NO-* para la asociación por persona)
+    """
+
+    def __init__(self, names, clases_objetivo=None, ids_extra=()):
+        self.names = {int(k): v for k, v in names.items()}
+        self.ids_por_nombre = {v: k for k, v in self.names.items()}
+        self.num_clases = max(self.names) + 1
+
+        objetivo = list(clases_objetivo or [])
+        desconocidas = [c for c in objetivo if c not in self.ids_por_nombre]
+        if desconocidas:
+            raise ValueError(f"Clases no presentes en el modelo: {', '.join(desconocidas)}")
+
+        self.clases_objetivo = objetivo
+        self.ids_objetivo = np.array([self.ids_por_nombre[c] for c in objetivo], dtype=np.intp)
+        self.mascara = np.zeros(self.num_clases, dtype=bool)
+        self.mascara[self.ids_objetivo] = True
+        self.ids_extra = sorted(set(int(i) for i in ids_extra))
+
+    @classmethod
+    def desde_modelo(cls, model, clases_objetivo=None, ids_extra=()):
+        """Usa model.names y, si el modelo no las trae, el JSON de clases"""
+        names = getattr(model, 'names', None) or cargar_info_clases()['names']
+        return cls(names, clases_objetivo, ids_extra)
+
+    @property
+    def classes(self):
+        """Ids para pasar como model(..., classes=...) y descartar el resto en el NMS"""
+        if not self.clases_objetivo:
+            return None
+        return sorted(set(self.ids_objetivo.tolist()) | set(self.ids_extra))
+
+    def contar(self, resultado):
+        """Conteo de detecciones por id de clase (array de num_clases)"""
+        return np.bincount(clases_de_resultado(resultado), minlength=self.num_clases)
+
+    def evaluar(self, resultado):
+        """Devuelve (conteos, presentes, todas) para un frame
+
+        conteos: detecciones por id de clase
+        presentes: bool por cada clase objetivo (en el orden de clases_objetivo)
+        todas: True si están TODAS las clases objetivo
+        """
+        conteos = self.contar(resultado)
+        presentes = conteos[self.ids_objetivo] > 0
+        todas = bool(self.clases_objetivo) and bool(presentes.all())
+        return conteos, presentes, todas
+
+    def faltantes(self, presentes):
+        """Nombres de las clases objetivo ausentes"""
+        return [self.clases_objetivo[i] for i in np.flatnonzero(~presentes)]
+
+    def a_diccionario(self, conteos, solo_objetivo=False):
+        """Convierte un array de conteos en {nombre: conteo}"""
+        ids = self.ids_objetivo if solo_objetivo else sorted(self.names)
+        return {self.names[i]: int(conteos[i]) for i in ids}
@@ -0,0 +1,122 @@
+"""
+Cola de eventos con prioridad
+Las alertas (caídas, EPP faltante) se publican sin bloquear el bucle de
+inferencia y un hilo despachador las entrega a los suscriptores por
+prioridad: una caída pasa por delante de los eventos de EPP que estén en
+espera; dentro de la misma prioridad se respeta el orden de llegada. Al
+despachar se registra el tiempo-a-alerta desde la marca del frame.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+PRIORIDAD_CAIDA = 0
+PRIORIDAD_EPP = 10
+
+
+class ColaEventos:
+    """Cola de prioridad con hilo despachador (se inicia con el primer evento)
+
+    Args:
+        max_pendientes: eventos en espera; con la cola llena se descartan los
+            de rutina y las caídas siempre entran
+    """
+
+    def __init__(self, max_pendientes=1000):
+        self.max_pendientes = max_pendientes
+        self._heap = []
+        self._orden = itertools.count()
+        self._cond = threading.Condition()
+        self._suscriptores = []
+        self._hilo = None
+        self._ocupado = False
+
+        self.publicados = 0
+        self.despachados = 0
+        self.descartados = 0
+
+    def suscribir(self, funcion):
+        """funcion(evento) se llama desde el hilo despachador (una sola vez por función)"""
+        with self._cond:
+            if funcion not in self._suscriptores:
+                self._suscriptores.append(funcion)
+        return funcion
+
+    def desuscribir(self, funcion):
+        with self._cond:
+            if funcion in self._suscriptores:
+                self._suscriptores.remove(funcion)
+
+    def publicar(self, evento, prioridad=PRIORIDAD_EPP, t_frame=None, metricas=None):
+        """Encola un evento (dict con 'tipo') sin bloquear
+
+        Args:
+            prioridad: menor = antes (PRIORIDAD_CAIDA, PRIORIDAD_EPP)
+            t_frame: time.monotonic() del frame que originó el evento
+            metricas: MetricasFuente donde registrar el tiempo-a-alerta
+        """
+        evento.setdefault('t', time.time())
+        with self._cond:
+            if len(self._heap) >= self.max_pendientes and prioridad > PRIORIDAD_CAIDA:
+                self.descartados += 1
+                return False
+            heapq.heappush(self._heap, (prioridad, next(self._orden), evento, t_frame, metricas))
+            self.publicados += 1
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._despachar, name="DespachadorEventos", daemon=True)
+                self._hilo.start()
+            self._cond.notify()
+        return True
+
+    def _despachar(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._ocupado = False
+                    self._cond.notify_all()
+                    self._cond.wait()
+                _, _, evento, t_frame, metricas = heapq.heappop(self._heap)
+                self._ocupado = True
+                suscriptores = list(self._suscriptores)
+
+            if t_frame is not None and metricas is not None:
+                metricas.observar_alerta(evento.get('tipo', 'evento'), time.monotonic() - t_frame)
+            for funcion in suscriptores:
+                try:
+                    funcion(evento)
+                except Exception as e:
+                    print(f"⚠️  Error al despachar evento {evento.get('tipo')}: {e}")
+            self.despachados += 1
+
+    def vaciar(self, timeout=2.0):
+        """Espera a que se despachen los eventos pendientes; False si vence el timeout"""
+        limite = time.monotonic() + timeout
+        with self._cond:
+            while self._heap or self._ocupado:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._cond.wait(restante)
+        return True
+
+    @property
+    def pendientes(self):
+        return len(self._heap)
+
+
+def imprimir_evento(evento):
+    """Suscriptor por defecto: una línea por alerta en consola"""
+    fuente = f"[{evento['fuente']}] " if evento.get('fuente') else ""
+    if evento.get('tipo') == 'caida':
+        print(f"🆘 {fuente}CAÍDA DETECTADA (conf {evento.get('conf', 0):.2f}) - frame {evento.get('frame')}")
+    elif evento.get('persona_id') is not None:
+        print(f"🚨 {fuente}Persona #{evento['persona_id']}: falta {', '.join(evento.get('faltantes', []))}")
+    else:
+        print(f"🚨 {fuente}{evento.get('tipo')}: {evento.get('detalle', '')}")
+
+
+# Cola compartida por el servicio, los menús y la ruta de caídas
+eventos = ColaEventos()
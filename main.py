@@ -1,16 +1,20 @@
 from ultralytics import YOLO
 import cv2
+from captura import CapturaHilo
 
 # Cargamos el modelo YOLO
 model = YOLO("C:\\Users\\Angel Del C\\Desktop\\OroParaIA\\best.pt") # Corrected path
 
 # Cargamos el video de entrada
 #video_path = "./Inputs/people_walking.mp4"
-cap = cv2.VideoCapture(0)
+# La captura corre en un hilo aparte: siempre inferimos sobre el frame más reciente
+cap = CapturaHilo(0)
+if not cap.iniciar():
+    raise SystemExit("No se puede acceder a la cámara")
 
-while cap.isOpened():
+while True:
     # Leemos el frame del video
-    ret, frame = cap.read()
+    ret, frame = cap.leer()
     if not ret:
         break
 
@@ -28,5 +32,6 @@ while cap.isOpened():
     if cv2.waitKey(1) & 0xFF == 27:
         break
 
-cap.release()
+cap.detener()
+print(f"Frames descartados por la captura: {cap.descartados}")
 cv2.destroyAllWindows()
\ No newline at end of file
@@ -6,19 +6,36 @@ Menú Principal - Gestión de detecciones en tiempo real y por video
 import os
 import sys
 from pathlib import Path
-from ultralytics import YOLO
-import cv2
+
+# cv2, numpy y ultralytics se importan dentro de cada modo (arranque rápido
+# del menú); ver arranque.py para medir el tiempo de imports
 
 
 class MenuPrincipal:
     """Menú interactivo para el sistema de detección EPP"""
     
     def __init__(self):
+        # mAP@0.5 mínimo para elegir una variante del manifiesto (EPP_MAP50_MINIMO)
+        self.map50_minimo = float(os.environ.get("EPP_MAP50_MINIMO", "0"))
+        self.backend = "ultralytics"
+        self.imgsz = 640
         self.model_path = self.buscar_modelo()
         self.running = True
         
     def buscar_modelo(self):
-        """Busca el modelo disponible"""
+        """Busca el modelo disponible
+
+        Primero la variante más rápida del manifiesto medido en este equipo
+        (variantes.py) que cumpla el mAP mínimo; si no hay, la lista fija.
+        """
+        from variantes import seleccionar_variante
+
+        variante = seleccionar_variante(map50_minimo=self.map50_minimo)
+        if variante:
+            self.backend = variante['backend']
+            self.imgsz = variante['imgsz']
+            return variante['ruta']
+        
         modelos_posibles = [
             "best.pt",
             "best.onnx",
@@ -45,7 +62,7 @@ class MenuPrincipal:
         print()
         
         if self.model_path:
-            print(f"📦 Modelo actual: {self.model_path}")
+            print(f"📦 Modelo actual: {self.model_path} ({self.backend}, imgsz={self.imgsz})")
         else:
             print("⚠️  Advertencia: No se encontró ningún modelo")
         
@@ -76,17 +93,27 @@ class MenuPrincipal:
         print(f"🔄 Cargando modelo: {self.model_path}")
         print()
         
+        import cv2
+        from captura import CapturaHilo
+        from clips import GrabadorClips, PersistenciaClases
+        from evaluacion_epp import clases_de_resultado
+        from modelos import obtener_modelo
+        from renderizado import Renderizador
+        from roi import RUTA_CONFIG, DetectorRecortes, cargar_config, envolver_modelo
+        
         try:
-            # Cargar modelo
-            model = YOLO(self.model_path)
+            # Cargar modelo (compartido entre modos, ya calentado)
+            model = obtener_modelo(self.model_path, imgsz=self.imgsz, backend=self.backend)
+            # ROI de la puerta / mosaico si existe roi_puerta.json
+            model = envolver_modelo(model, cargar_config(RUTA_CONFIG))
             print("✅ Modelo cargado correctamente")
             print()
             
-            # Abrir cámara
+            # Abrir cámara (captura en hilo de fondo, siempre el frame más reciente)
             print("📷 Iniciando cámara...")
-            cap = cv2.VideoCapture(0)
+            cap = CapturaHilo(0)
             
-            if not cap.isOpened():
+            if not cap.iniciar():
                 print("❌ Error: No se puede acceder a la cámara")
                 input("\nPresiona Enter para continuar...")
                 return
@@ -101,22 +128,33 @@ class MenuPrincipal:
             print()
             input("Presiona Enter para comenzar...")
             
+            render = Renderizador(mostrar=True, names=model.names)
+            # Clips automáticos cuando una clase NO-* persiste (pre-roll + post-roll)
+            grabador = GrabadorClips().iniciar()
+            persistencia = PersistenciaClases.clases_no(model.names)
             frame_count = 0
             captures_dir = Path("captures")
             captures_dir.mkdir(exist_ok=True)
             
-            while cap.isOpened():
+            while True:
                 # Leer frame del video (IGUAL que main.py)
-                ret, frame = cap.read()
+                ret, frame = cap.leer()
                 if not ret:
                     print("⚠️  No se pudo leer el frame")
                     break
                 
                 # Realizar inferencia de YOLO (IGUAL que main.py)
-                results = model(frame)
+                results = model(frame, imgsz=self.imgsz, verbose=False)
+                
+                # Anotar sobre un buffer reutilizado (sin copia nueva por frame)
+                annotated_frame = render.dibujar(frame, results[0])
+                if isinstance(model, DetectorRecortes):
+                    model.dibujar(annotated_frame)
                 
-                # Extraer resultados anotados (IGUAL que main.py)
-                annotated_frame = results[0].plot()
+                for k in persistencia.actualizar(clases_de_resultado(results[0])):
+                    print(f"🚨 {model.names[k]} persistente: guardando clip")
+                    grabador.disparar(model.names[k])
+                grabador.agregar(annotated_frame)
                 
                 # Agregar contador de frames
                 frame_count += 1
@@ -141,11 +179,14 @@ class MenuPrincipal:
                     print(f"📸 Captura guardada: {capture_path}")
             
             # Limpiar
-            cap.release()
+            cap.detener()
             cv2.destroyAllWindows()
+            grabador.detener()
             
             print("\n✅ Detección finalizada")
             print(f"📊 Total de frames procesados: {frame_count}")
+            print(f"📉 Frames descartados (cámara más rápida que el modelo): {cap.descartados}")
+            print(f"🎬 Clips de evidencia: {grabador.clips_escritos}")
             
         except Exception as e:
             print(f"\n❌ Error: {e}")
@@ -213,27 +254,58 @@ class MenuPrincipal:
         except:
             conf_threshold = 0.25
         
+        print("Procesar cada N frames (1 = todos, default 1): ", end="")
+        try:
+            skip_frames = max(1, int(input().strip() or "1"))
+        except:
+            skip_frames = 1
+        
+        print("Tamaño de lote (1 = frame a frame, 4-16 = más rápido offline, default 1): ", end="")
+        try:
+            lote = max(1, min(64, int(input().strip() or "1")))
+        except:
+            lote = 1
+        
+        print("FPS objetivo (salto adaptativo por latencia/movimiento, 0 = usar N fijo, default 0): ", end="")
+        try:
+            fps_objetivo = max(0.0, float(input().strip() or "0"))
+        except:
+            fps_objetivo = 0.0
+        
         print()
         print("-" * 70)
         print("🔄 Iniciando procesamiento...")
         print("-" * 70)
         print()
         
-        # PASO 3: Procesar video con funcionalidad dual
-        self._procesar_video_configurable(
-            video_path=video_path,
-            clases_objetivo=clases_objetivo,
-            conf_threshold=conf_threshold,
-            guardar_video=guardar_video,
-            mostrar_video=mostrar_video
-        )
+        # PASO 3: Procesar video (lotes y salto de frames en iterar_resultados)
+        self._deteccion_basica_video(video_path, guardar_video, mostrar_video, skip_frames, lote=lote,
+                                     fps_objetivo=fps_objetivo or None, conf=conf_threshold,
+                                     clases_objetivo=clases_objetivo)
         
         input("\nPresiona Enter para continuar...")
     
-    def _deteccion_basica_video(self, video_path, guardar_video, mostrar_video, skip_frames):
-        """Detección básica de video - SIMPLIFICADO como main.py"""
+    def _deteccion_basica_video(self, video_path, guardar_video, mostrar_video, skip_frames, lote=1,
+                                fps_objetivo=None, conf=0.25, clases_objetivo=None):
+        """Detección básica de video - SIMPLIFICADO como main.py
+
+        lote > 1 = inferencia por lotes; fps_objetivo = salto adaptativo según
+        latencia medida y movimiento (reemplaza a skip_frames);
+        clases_objetivo = sólo esas clases (None/vacío = todas)
+        """
+        import cv2
+        from caidas import DetectorCaidas
+        from escritura import EscritorVideo
+        from eventos import eventos, imprimir_evento
+        from modelos import obtener_modelo
+        from planificador import PlanificadorAdaptativo
+        from procesamiento_lotes import iterar_resultados
+        from renderizado import Renderizador
+        from roi import RUTA_CONFIG, DetectorRecortes, cargar_config, envolver_modelo
+        
         print("\n🔄 Cargando modelo...")
-        model = YOLO(self.model_path)
+        model = obtener_modelo(self.model_path, imgsz=self.imgsz, backend=self.backend)
+        model = envolver_modelo(model, cargar_config(RUTA_CONFIG))
         print("✅ Modelo cargado\n")
         
         cap = cv2.VideoCapture(video_path)
@@ -249,7 +321,26 @@ class MenuPrincipal:
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
         print(f"📊 FPS: {fps} | Resolución: {width}x{height} | Frames: {total_frames}")
-        print(f"⚙️  Procesando cada {skip_frames} frame(s)")
+        # Una caída anula el salto de frames y los lotes mientras dure
+        caidas = DetectorCaidas.para_modelo(model.names, fuente=Path(video_path).stem)
+        eventos.suscribir(imprimir_evento)
+        # Sólo las clases elegidas (classes= las descarta en el NMS); las caídas se vigilan siempre
+        classes = None
+        if clases_objetivo:
+            ids = {self._id_clase(model, c) for c in clases_objetivo}
+            if caidas:
+                ids.add(caidas.id)
+            classes = sorted(i for i in ids if i is not None)
+        planificador = None
+        if fps_objetivo:
+            planificador = PlanificadorAdaptativo(fps_objetivo=fps_objetivo,
+                                                  id_persona=self._id_clase(model, 'Person'), caidas=caidas)
+            lote = 1
+            print(f"⚙️  Salto adaptativo: objetivo {fps_objetivo} FPS")
+        else:
+            print(f"⚙️  Procesando cada {skip_frames} frame(s)")
+        if lote > 1:
+            print(f"📦 Modo por lotes: {lote} frames por inferencia")
         print()
         
         # Video de salida
@@ -257,10 +348,14 @@ class MenuPrincipal:
         if guardar_video:
             output_path = Path("detections") / f"output_{Path(video_path).stem}.mp4"
             output_path.parent.mkdir(exist_ok=True)
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
+            # Codificación en un hilo aparte: no suma latencia a la inferencia
+            out = EscritorVideo(output_path, fps, (width, height),
+                                codec=os.environ.get("EPP_CODEC", "mp4v"),
+                                bitrate=os.environ.get("EPP_BITRATE") or None).iniciar()
             print(f"💾 Guardando en: {output_path}")
         
+        render = Renderizador(mostrar=mostrar_video, guardar=out is not None, names=model.names)
+        
         print("🎬 Procesando video...")
         if mostrar_video:
             print("   Presiona 'Q' para detener")
@@ -269,24 +364,22 @@ class MenuPrincipal:
         frame_number = 0
         processed = 0
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
+        # Decodificación + inferencia (los frames saltados llegan con resultado None)
+        for frame, resultado in iterar_resultados(cap, model, lote=lote, cada=skip_frames,
+                                                  planificador=planificador, caidas=caidas,
+                                                  conf=conf, classes=classes, imgsz=self.imgsz):
             frame_number += 1
             
             # Saltar frames si es necesario
-            if skip_frames > 1 and frame_number % skip_frames != 0:
+            if resultado is None:
                 if out:
                     out.write(frame)
                 continue
             
-            # Realizar inferencia de YOLO (IGUAL que main.py)
-            results = model(frame)
-            
-            # Extraer resultados anotados (IGUAL que main.py)
-            annotated_frame = results[0].plot()
+            # Frame anotado sólo si hay ventana o video de salida
+            annotated_frame = render.procesar(frame, resultado)
+            if annotated_frame is not None and isinstance(model, DetectorRecortes):
+                model.dibujar(annotated_frame)
             
             processed += 1
             
@@ -306,10 +399,21 @@ class MenuPrincipal:
         if out:
             out.release()
             print(f"\n✅ Video guardado: {output_path}")
+            print(f"🎞️  Escritor: {out.resumen()}")
         if mostrar_video:
             cv2.destroyAllWindows()
         
+        eventos.vaciar()
         print(f"✅ Procesamiento completado: {processed} frames procesados")
+        if caidas:
+            print(f"🆘 Caídas: {caidas.resumen()}")
+        if planificador:
+            print(f"📊 Planificador: {planificador.resumen()}")
+    
+    @staticmethod
+    def _id_clase(model, nombre):
+        """Id de una clase por nombre (None si el modelo no la tiene)"""
+        return next((i for i, n in model.names.items() if n == nombre), None)
     
     def optimizar_modelo(self):
         """Optimiza el modelo para Jetson Nano"""
@@ -357,6 +461,25 @@ class MenuPrincipal:
         except Exception as e:
             print(f"\n❌ Error durante la optimización: {e}")
         
+        if self.model_path.endswith('.pt'):
+            matriz = input("\n¿Exportar la matriz de variantes y medirlas en este equipo? (s/n): ")
+            if matriz.lower().strip() == 's':
+                data = input("YAML del dataset para medir mAP (Enter = sin mAP): ").strip().strip('"')
+                try:
+                    from variantes import generar_manifiesto, seleccionar_variante
+                    generar_manifiesto(self.model_path, data=data or None)
+                    variante = seleccionar_variante(map50_minimo=self.map50_minimo)
+                    if variante:
+                        self.model_path = variante['ruta']
+                        self.backend = variante['backend']
+                        self.imgsz = variante['imgsz']
+                        print(f"\n🏆 Variante seleccionada: {self.model_path} "
+                              f"({self.backend}, imgsz={self.imgsz}, {variante['ms_media']:.1f} ms)")
+                    else:
+                        print(f"\n⚠️  Ninguna variante cumple mAP50 >= {self.map50_minimo}")
+                except Exception as e:
+                    print(f"\n❌ Error en el benchmark de variantes: {e}")
+        
         input("\nPresiona Enter para continuar...")
     
     def _configurar_clases_interactivo(self):
@@ -501,7 +624,13 @@ class MenuPrincipal:
                 input("\nPresiona Enter para continuar...")
                 return
         
+        # Liberar el modelo anterior sólo si se eligió otro archivo
+        if self.model_path and Path(self.model_path).resolve() != Path(nuevo_modelo).resolve():
+            from modelos import registro
+            registro.descargar(self.model_path)
         self.model_path = nuevo_modelo
+        self.backend = "ultralytics"
+        self.imgsz = 640
         print(f"\n✅ Modelo cambiado correctamente")
         print(f"📦 Nuevo modelo: {self.model_path}")
         
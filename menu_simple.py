@@ -1,7 +1,11 @@
-from ultralytics import YOLO
-import cv2
 from pathlib import Path
 import os
+import time
+from actuador import ActuadorPuerta, HardwareJetson, HardwareMock
+from control_acceso import MaquinaAcceso
+
+# cv2, numpy, ultralytics y el resto del pipeline se importan dentro de cada
+# modo: el menú aparece sin esperar a esos imports (ver arranque.py)
 
 class MenuEPP:
     def __init__(self):
@@ -51,102 +55,83 @@ class MenuEPP:
         # Dirección I2C de la pantalla LCD (normalmente 0x27 o 0x3F)
         self.lcd_address = 0x27
         
+        # Backend simulado (sin GPIO) para pruebas en PC: EPP_HARDWARE_MOCK=1
+        self.hardware_mock = os.environ.get("EPP_HARDWARE_MOCK") == "1"
+        self.hardware = None
+        self.actuador = None
+        
+        # Backend de inferencia para modelos .onnx: 'ultralytics' o 'onnxruntime'
+        # (letterbox, IO binding y NMS nativos, ver backend_onnx.py): EPP_BACKEND
+        self.backend = os.environ.get("EPP_BACKEND", "ultralytics")
+        self.imgsz = 640
+        
+        # Variante más rápida medida en este equipo (variantes.py) que cumpla
+        # el mAP@0.5 mínimo (EPP_MAP50_MINIMO); si no hay manifiesto, model_path
+        self.map50_minimo = float(os.environ.get("EPP_MAP50_MINIMO", "0"))
+        from variantes import seleccionar_variante
+        variante = seleccionar_variante(map50_minimo=self.map50_minimo)
+        if variante:
+            self.model_path = variante['ruta']
+            self.backend = variante['backend']
+            self.imgsz = variante['imgsz']
+        
+        # Video de salida: FOURCC de cv2 ('mp4v', 'avc1') o codificador ffmpeg
+        # ('libx264', 'h264_nvenc', 'h264_v4l2m2m'); bitrate sólo con ffmpeg
+        self.codec_salida = os.environ.get("EPP_CODEC", "mp4v")
+        self.bitrate_salida = os.environ.get("EPP_BITRATE") or None
+        self.escala_salida = 1.0
+        
+        # Clips de evidencia en vivo: segundos antes/después de cada infracción
+        self.clip_previos = 5.0
+        self.clip_posteriores = 5.0
+        
+        # Configuración del servicio multi-cámara (una puerta por cámara)
+        self.ruta_multicamara = "multicamara.json"
+        
+        # Ventana en la detección en vivo (EPP_HEADLESS=1 = sin ventana ni dibujo)
+        self.mostrar_vivo = os.environ.get("EPP_HEADLESS") != "1"
+        
+        # Polígonos de la zona de la puerta o mosaico (roi.py); sin archivo = frame completo
+        self.ruta_roi = "roi_puerta.json"     # roi.RUTA_CONFIG
+        
+        # Exigir el EPP a CADA persona (asociación EPP ↔ persona) en vez de
+        # sólo comprobar que cada clase aparezca en algún lugar del frame
+        self.asociacion_por_persona = True
+        # EPP exigido a cada persona en la detección en vivo
+        self.epp_acceso = ['Hardhat', 'Safety Vest']
+        
+        # Histéresis del control de acceso
+        self.frames_para_permitir = 5     # Frames consecutivos con EPP antes de abrir
+        self.tiempo_min_abierto = 3.0     # Segundos abierta tras el último frame válido
+        self.tiempo_cierre = 1.0          # Segundos que tarda el servo en cerrar
+        
     def limpiar(self):
         os.system('cls' if os.name == 'nt' else 'clear')
     
+    def _crear_backend_hardware(self):
+        """Crea el backend de hardware (real o simulado)"""
+        if self.hardware_mock:
+            return HardwareMock(verbose=True)
+        return HardwareJetson(self.servo_pin, self.pines_detectado,
+                              self.pines_no_detectado, self.lcd_address)
+    
     def _inicializar_hardware(self):
-        """Inicializa LCD, Servo y GPIO"""
-        try:
-            # Inicializar I2C para LCD
-            import board
-            import busio
-            from adafruit_character_lcd.character_lcd_i2c import Character_LCD_I2C
-            
-            i2c = busio.I2C(board.SCL, board.SDA)
-            self.lcd = Character_LCD_I2C(i2c, 16, 2, self.lcd_address)  # LCD 16x2
-            self.lcd.clear()
-            self.lcd.message = "Sistema EPP\nIniciando..."
-            
-            # Inicializar GPIO
-            import Jetson.GPIO as GPIO
-            GPIO.setmode(GPIO.BCM)
-            
-            # Configurar servo
-            GPIO.setup(self.servo_pin, GPIO.OUT)
-            self.servo_pwm = GPIO.PWM(self.servo_pin, 50)  # 50Hz para servo
-            self.servo_pwm.start(0)
-            
-            # Configurar pines de detección
-            for pin in self.pines_detectado:
-                GPIO.setup(pin, GPIO.OUT, initial=GPIO.LOW)
-            for pin in self.pines_no_detectado:
-                GPIO.setup(pin, GPIO.OUT, initial=GPIO.LOW)
-            
-            return True
-        except Exception as e:
-            print(f"⚠️  Hardware no disponible: {e}")
-            self.lcd = None
-            self.servo_pwm = None
+        """Inicializa LCD, Servo y GPIO y arranca el hilo actuador"""
+        self.hardware = self._crear_backend_hardware()
+        if not self.hardware.inicializar():
+            self.actuador = None
             return False
+        self.actuador = ActuadorPuerta(self.hardware).iniciar()
+        return True
     
-    def _mostrar_lcd(self, linea1, linea2=""):
-        """Muestra mensaje en LCD 16x2"""
-        if self.lcd:
-            try:
-                self.lcd.clear()
-                self.lcd.message = f"{linea1[:16]}\n{linea2[:16]}"
-            except:
-                pass
-    
-    def _abrir_puerta(self):
-        """Abre la puerta moviendo el servo a 90 grados"""
-        if self.servo_pwm:
-            try:
-                # Ciclo de trabajo para 90 grados: ~7.5%
-                self.servo_pwm.ChangeDutyCycle(7.5)
-                import time
-                time.sleep(1)
-                self.servo_pwm.ChangeDutyCycle(0)  # Detener señal
-            except:
-                pass
-    
-    def _cerrar_puerta(self):
-        """Cierra la puerta moviendo el servo a 0 grados"""
-        if self.servo_pwm:
-            try:
-                # Ciclo de trabajo para 0 grados: ~2.5%
-                self.servo_pwm.ChangeDutyCycle(2.5)
-                import time
-                time.sleep(1)
-                self.servo_pwm.ChangeDutyCycle(0)  # Detener señal
-            except:
-                pass
-    
-    def _activar_pines_acceso_permitido(self):
-        """Activa pines cuando SE detectan todos los EPP (pines_detectado=HIGH)"""
-        try:
-            import Jetson.GPIO as GPIO
-            # Activar pines de detección (señal HIGH = EPP completo)
-            for pin in self.pines_detectado:
-                GPIO.output(pin, GPIO.HIGH)
-            # Desactivar pines de no detección
-            for pin in self.pines_no_detectado:
-                GPIO.output(pin, GPIO.LOW)
-        except:
-            pass
-    
-    def _activar_pines_acceso_denegado(self):
-        """Activa pines cuando NO se detectan todos los EPP (pines_no_detectado=HIGH)"""
-        try:
-            import Jetson.GPIO as GPIO
-            # Desactivar pines de detección
-            for pin in self.pines_detectado:
-                GPIO.output(pin, GPIO.LOW)
-            # Activar pines de no detección (señal HIGH = falta EPP)
-            for pin in self.pines_no_detectado:
-                GPIO.output(pin, GPIO.HIGH)
-        except:
-            pass
+    def _crear_maquina_acceso(self, hw_ok, ahora=None):
+        """Crea la máquina de estados de acceso (sólo toca hardware en transiciones)"""
+        return MaquinaAcceso(
+            self.actuador if hw_ok else None,
+            frames_para_permitir=self.frames_para_permitir,
+            tiempo_min_abierto=self.tiempo_min_abierto,
+            tiempo_cierre=self.tiempo_cierre
+        ).iniciar(ahora)
     
     def menu_principal(self):
         while True:
@@ -165,6 +150,7 @@ class MenuEPP:
             print("  [3] 🔧 Test Hardware (LCD + Servo)")
             print("  [4] ⚡ Optimizar Modelo (ONNX)")
             print("  [5] 🔄 Cambiar Modelo")
+            print("  [6] 🚪 Multi-cámara (una puerta por cámara)")
             print("  [0] ❌ Salir")
             print("\n" + "=" * 60)
             
@@ -183,12 +169,29 @@ class MenuEPP:
                 self.optimizar()
             elif opcion == '5':
                 self.cambiar_modelo()
+            elif opcion == '6':
+                self.multicamara()
             else:
                 print("\n❌ Opción inválida")
                 input("\nPresiona Enter...")
     
     def deteccion_vivo(self):
         """Detección en tiempo real con cámara"""
+        import cv2
+        from almacen_eventos import abrir_almacen
+        from asociacion_epp import AsociadorEPP, detecciones_de_resultado
+        from caidas import DetectorCaidas
+        from captura import CapturaHilo
+        from clips import GrabadorClips, PersistenciaClases
+        from evaluacion_epp import clases_de_resultado
+        from eventos import eventos, imprimir_evento
+        from metricas import iniciar_servidor, metricas as registro_metricas
+        from modelos import obtener_modelo
+        from planificador import DETECTAR, PlanificadorAdaptativo
+        from renderizado import Renderizador
+        from roi import DetectorRecortes
+        from seguimiento import EvaluadorPorTrack
+        
         self.limpiar()
         print("=" * 60)
         print(" " * 18 + "📹 DETECCIÓN EN VIVO")
@@ -202,63 +205,175 @@ class MenuEPP:
         except:
             conf = 0.25
         
-        print("Tamaño de imagen (default 640, menor=más rápido): ", end="")
+        print(f"Tamaño de imagen (default {self.imgsz}, menor=más rápido): ", end="")
         try:
-            imgsz = int(input().strip() or "640")
+            imgsz = int(input().strip() or self.imgsz)
             imgsz = max(320, min(1280, (imgsz // 32) * 32))
         except:
-            imgsz = 640
+            imgsz = self.imgsz
+        
+        print("FPS objetivo (salto adaptativo por latencia/movimiento, 0 = todos los frames, default 0): ", end="")
+        try:
+            fps_objetivo = max(0.0, float(input().strip() or "0"))
+        except:
+            fps_objetivo = 0.0
         
         print(f"\n🔄 Cargando modelo (conf={conf}, imgsz={imgsz})...")
         
         try:
-            model = YOLO(self.model_path)
-            cap = cv2.VideoCapture(0)
+            model = self._modelo_con_roi(obtener_modelo(self.model_path, imgsz=imgsz, backend=self.backend))
+            cap = CapturaHilo(0)
             
-            if not cap.isOpened():
+            if not cap.iniciar():
                 print("❌ No se puede acceder a la cámara")
                 input("\nPresiona Enter...")
                 return
             
             print("✅ Iniciando detección")
-            print("💡 Presiona 'q' para salir\n")
+            print("💡 Presiona 'q' para salir\n" if self.mostrar_vivo else "💡 Modo headless: Ctrl+C para salir\n")
+            
+            # Latencia por etapa (línea periódica y /metrics si EPP_METRICAS_PUERTO)
+            metricas = registro_metricas.fuente("camara")
+            servidor_metricas = iniciar_servidor()
             
             # Inicializar hardware
             hw_ok = self._inicializar_hardware()
             
             if hw_ok:
-                self._mostrar_lcd("Sistema EPP", "Detectando...")
+                self.actuador.metricas = metricas
+                self.actuador.lcd("Sistema EPP", "Detectando...")
+            maquina = self._crear_maquina_acceso(hw_ok)
             
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # Detección con resize
-                results = model(frame, conf=conf, imgsz=imgsz, verbose=False)
-                annotated = results[0].plot()
-                
-                # Control de hardware según detecciones
-                if hw_ok:
-                    if len(results[0].boxes) > 0:
-                        self._activar_pines_acceso_permitido()
-                        self._mostrar_lcd("ACCESO PERMITIDO", "EPP Completo OK")
-                        self._abrir_puerta()
+            # Personas seguidas con veredicto de EPP en caché
+            asociador = AsociadorEPP(model.names, self.epp_acceso)
+            evaluador = EvaluadorPorTrack(asociador)
+            
+            # Caídas: alerta prioritaria y detección en todos los frames mientras dure
+            caidas = DetectorCaidas.para_modelo(model.names, fuente="camara", metricas=metricas)
+            eventos.suscribir(imprimir_evento)
+            
+            # Almacén de eventos (EPP_EVENTOS_BD): detecciones, decisiones e infracciones
+            almacen = abrir_almacen()
+            if almacen:
+                eventos.suscribir(almacen.registrar_evento)
+            
+            # Planificador: pasillo vacío ≈ gratis, tasa completa con personas
+            planificador = None
+            if fps_objetivo > 0:
+                planificador = PlanificadorAdaptativo(fps_objetivo=fps_objetivo,
+                                                      id_persona=asociador.id_persona, caidas=caidas)
+            
+            # Ventana opcional (EPP_HEADLESS=1 = sin ventana, Ctrl+C para salir);
+            # las capturas de alerta se dibujan aunque no haya ventana
+            render = Renderizador(mostrar=self.mostrar_vivo, names=model.names)
+            capturas = Path("captures")
+            capturas.mkdir(exist_ok=True)
+            
+            # Clips de evidencia: pre-roll JPEG en memoria, escritura en segundo plano
+            grabador = GrabadorClips(segundos_previos=self.clip_previos,
+                                     segundos_posteriores=self.clip_posteriores).iniciar()
+            persistencia = PersistenciaClases.clases_no(model.names)
+            
+            ultimo = None
+            tracks, permitido, faltantes = [], False, []
+            
+            try:
+                while True:
+                    ret, frame = cap.leer()
+                    if not ret:
+                        break
+                    # Captura = antigüedad del frame al tomarlo (espera en el buffer)
+                    metricas.observar('captura', time.monotonic() - cap.t_captura)
+                    alertas = []
+                    
+                    # Detección con resize (el planificador puede reutilizar o saltar)
+                    if planificador:
+                        accion, resultado = planificador.inferir(model, frame, ultimo, conf=conf,
+                                                                 imgsz=imgsz, verbose=False)
                     else:
-                        self._activar_pines_acceso_denegado()
-                        self._mostrar_lcd("ACCESO DENEGADO", "Falta EPP!")
-                        self._cerrar_puerta()
-                
-                cv2.imshow('Detección en Vivo - Presiona Q para salir', annotated)
-                
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+                        accion = DETECTAR
+                        resultado = model(frame, conf=conf, imgsz=imgsz, verbose=False)[0]
+                    
+                    # Decisión por persona seguida (no por frame), sólo con detecciones nuevas
+                    t_decision = time.perf_counter()
+                    if accion == DETECTAR:
+                        metricas.observar_resultado(resultado)
+                        ultimo = resultado
+                        detecciones = detecciones_de_resultado(resultado)
+                        if caidas and caidas.revisar_detecciones(*detecciones, t_frame=cap.t_captura):
+                            grabador.disparar("caida")
+                        tracks, alertas = evaluador.procesar(*detecciones)
+                        for t in alertas:
+                            print(f"🚨 Persona #{t.id}: falta {', '.join(t.faltantes)}")
+                            grabador.disparar("sin_epp", persona=t.id, faltantes=t.faltantes)
+                            if almacen:
+                                for faltante in t.faltantes:
+                                    almacen.registrar_infraccion("camara", evaluador.frames, faltante, t.id)
+                        permitido_previo = permitido
+                        permitido, faltantes = evaluador.decision()
+                        if almacen:
+                            almacen.registrar_detecciones("camara", evaluador.frames, detecciones[1],
+                                                          detecciones[2], model.names)
+                            if permitido != permitido_previo or evaluador.frames == 1:
+                                almacen.registrar_decision("camara", evaluador.frames, permitido)
+                        if permitido_previo and not permitido:
+                            grabador.disparar("acceso_denegado", faltantes=faltantes)
+                        for k in persistencia.actualizar(clases_de_resultado(resultado)):
+                            grabador.disparar(model.names[k])
+                    t_render = time.perf_counter()
+                    metricas.observar('decision', t_render - t_decision)
+                    
+                    annotated = render.procesar(frame, resultado)
+                    if annotated is not None:
+                        self._dibujar_tracks(annotated, tracks)
+                        if isinstance(model, DetectorRecortes):
+                            model.dibujar(annotated)
+                        metricas.observar('render', time.perf_counter() - t_render)
+                    
+                    grabador.agregar(annotated if annotated is not None else frame)
+                    
+                    # Captura de evento por cada persona que acaba de incumplir
+                    for t in alertas:
+                        ruta = capturas / f"alerta_{time.strftime('%Y%m%d_%H%M%S')}_p{t.id}.jpg"
+                        render.capturar(ruta, frame, resultado, annotated)
+                    
+                    # Control de hardware según detecciones: la máquina de estados
+                    # sólo envía comandos al actuador cuando cambia la decisión
+                    detalle = "EPP Completo OK" if permitido else f"Falta {(faltantes or ['EPP'])[0][:12]}"
+                    maquina.actualizar(permitido, detalle)
+                    
+                    if render.mostrar:
+                        cv2.imshow('Detección en Vivo - Presiona Q para salir', annotated)
+                        if cv2.waitKey(1) & 0xFF == ord('q'):
+                            break
+                    
+                    metricas.frame(cap.descartados)
+                    registro_metricas.reportar_si_toca()
+            except KeyboardInterrupt:
+                print("\n🛑 Detención solicitada")
             
-            cap.release()
+            cap.detener()
             cv2.destroyAllWindows()
+            grabador.detener()
+            eventos.vaciar()
+            if caidas:
+                print(f"🆘 Caídas: {caidas.resumen()}")
+            if almacen:
+                eventos.desuscribir(almacen.registrar_evento)
+                almacen.detener()
+                print(f"🗃️  Almacén de eventos: {almacen.resumen()}")
+            if servidor_metricas is not None:
+                servidor_metricas.detener()
+            print(f"⏱️  {metricas.linea()}")
+            print(f"🎬 Clips de evidencia: {grabador.clips_escritos} en {grabador.carpeta}/")
+            print(f"📉 Frames descartados por la captura: {cap.descartados}")
+            print(f"👥 Personas únicas: {evaluador.rastreador.personas_unicas} | "
+                  f"Evaluaciones EPP: {evaluador.evaluaciones}/{evaluador.frames} frames")
+            if planificador:
+                print(f"📊 Planificador: {planificador.resumen()}")
             
             if hw_ok:
-                self._mostrar_lcd("Sistema EPP", "Detenido")
+                self.actuador.lcd("Sistema EPP", "Detenido")
                 self._cleanup_gpio()
                 
         except Exception as e:
@@ -266,8 +381,63 @@ class MenuEPP:
         
         input("\nPresiona Enter...")
     
+    def multicamara(self):
+        """Varias puertas (webcams, RTSP o archivos) con un solo modelo e inferencia por lotes"""
+        from modelos import obtener_modelo
+        from multicamara import cargar_servicio
+        
+        self.limpiar()
+        print("=" * 60)
+        print(" " * 15 + "🚪 SERVICIO MULTI-CÁMARA")
+        print("=" * 60)
+        print(f"\nConfiguración (JSON, default {self.ruta_multicamara}): ", end="")
+        ruta = input().strip().strip('"') or self.ruta_multicamara
+        
+        if not Path(ruta).exists():
+            print("\n❌ Archivo no encontrado (ver el formato en multicamara.cargar_servicio)")
+            input("\nPresiona Enter...")
+            return
+        
+        print("¿Mostrar una ventana por puerta? (s/n): ", end="")
+        mostrar = input().lower().strip() == 's'
+        
+        try:
+            model = obtener_modelo(self.model_path, imgsz=self.imgsz, backend=self.backend)
+            servicio = cargar_servicio(ruta, model=model, mock=self.hardware_mock, mostrar=mostrar)
+            servicio.iniciar()
+            print(f"\n✅ {len(servicio.flujos)} puertas activas | Ctrl+C{' o Q' if mostrar else ''} para salir\n")
+            servicio.ejecutar()
+        except Exception as e:
+            print(f"\n❌ Error: {e}")
+        
+        input("\nPresiona Enter...")
+    
+    def _modelo_con_roi(self, model):
+        """Envuelve el modelo para inferir sólo en la ROI / por mosaico si hay configuración"""
+        from roi import cargar_config, envolver_modelo
+        
+        config = cargar_config(self.ruta_roi)
+        if config:
+            modo = "mosaico" if config.get('mosaico') else f"{len(config.get('regiones', []))} ROI"
+            print(f"🔲 Inferencia por {modo} ({self.ruta_roi}, imgsz={config.get('imgsz', 'por defecto')})")
+        return envolver_modelo(model, config)
+    
+    def _dibujar_tracks(self, annotated, tracks):
+        """Marco e ID por persona seguida: verde cumple, rojo le falta EPP"""
+        import cv2
+        
+        for t in tracks:
+            x1, y1, x2, y2 = t.caja.astype(int)
+            color = (0, 255, 0) if t.veredicto else (0, 0, 255)
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 3)
+            cv2.putText(annotated, f"#{t.id}", (x1, max(15, y1 - 8)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    
     def deteccion_video(self):
         """Detección en video con selección de clases"""
+        from modelos import obtener_modelo
+        from procesamiento_lotes import comparar_con_secuencial
+        
         self.limpiar()
         print("=" * 60)
         print(" " * 18 + "🎬 DETECCIÓN POR VIDEO")
@@ -304,26 +474,65 @@ class MenuEPP:
         except:
             conf = 0.25
         
-        print("Tamaño de imagen para detección (default 640, mayor=más lento): ", end="")
+        print(f"Tamaño de imagen para detección (default {self.imgsz}, mayor=más lento): ", end="")
         try:
-            imgsz = int(input().strip() or "640")
+            imgsz = int(input().strip() or self.imgsz)
             # Validar que sea múltiplo de 32
             imgsz = max(320, min(1280, (imgsz // 32) * 32))
         except:
-            imgsz = 640
+            imgsz = self.imgsz
         
         print("¿Guardar video procesado? (s/n): ", end="")
         guardar = input().lower().strip() == 's'
         
+        solo_infracciones = False
+        if guardar:
+            print("¿Guardar sólo los frames alrededor de infracciones? (s/n): ", end="")
+            solo_infracciones = input().lower().strip() == 's'
+            print(f"Escala del video de salida (0.25-1.0, default {self.escala_salida}): ", end="")
+            try:
+                self.escala_salida = max(0.25, min(1.0, float(input().strip() or self.escala_salida)))
+            except:
+                pass
+        
         print("¿Mostrar durante procesamiento? (s/n): ", end="")
         mostrar = input().lower().strip() == 's'
         
+        print(f"Procesos en paralelo por segmentos (1 = desactivado, máx {os.cpu_count()}, default 1): ", end="")
+        try:
+            procesos = max(1, min(os.cpu_count() or 1, int(input().strip() or "1")))
+        except:
+            procesos = 1
+        
+        if procesos > 1:
+            print("\n" + "-" * 60)
+            print(f"🔄 Procesando en {procesos} procesos...")
+            print("-" * 60 + "\n")
+            self._procesar_video_paralelo(video, clases_objetivo, conf, guardar, imgsz, procesos)
+            input("\nPresiona Enter...")
+            return
+        
+        print("Tamaño de lote (1 = frame a frame, 4-16 = más rápido offline, default 1): ", end="")
+        try:
+            lote = max(1, min(64, int(input().strip() or "1")))
+        except:
+            lote = 1
+        
+        if lote > 1:
+            print("¿Comparar antes FPS lote vs frame a frame? (s/n): ", end="")
+            if input().lower().strip() == 's':
+                try:
+                    model = obtener_modelo(self.model_path, imgsz=imgsz, backend=self.backend)
+                    comparar_con_secuencial(model, video, lote=lote, conf=conf, imgsz=imgsz)
+                except Exception as e:
+                    print(f"\n❌ Error en la comparación: {e}")
+        
         # Paso 3: Procesar
         print("\n" + "-" * 60)
         print("🔄 Procesando...")
         print("-" * 60 + "\n")
         
-        self._procesar_video(video, clases_objetivo, conf, guardar, mostrar, imgsz)
+        self._procesar_video(video, clases_objetivo, conf, guardar, mostrar, imgsz, lote, solo_infracciones)
         
         input("\nPresiona Enter...")
     
@@ -404,10 +613,30 @@ class MenuEPP:
                 except:
                     print("❌ Comando no válido")
     
-    def _procesar_video(self, video_path, clases_objetivo, conf, guardar, mostrar, imgsz=640):
-        """Procesa el video con las clases seleccionadas"""
+    def _procesar_video(self, video_path, clases_objetivo, conf, guardar, mostrar, imgsz=640, lote=1,
+                        solo_infracciones=False):
+        """Procesa el video con las clases seleccionadas
+
+        lote > 1 = inferencia por lotes; solo_infracciones = el video de salida
+        guarda sólo los frames alrededor de personas sin EPP
+        """
+        import cv2
+        import numpy as np
+        from almacen_eventos import abrir_almacen
+        from asociacion_epp import AsociadorEPP, detecciones_de_resultado
+        from caidas import DetectorCaidas
+        from escritura import EscritorVideo, SoloInfracciones
+        from evaluacion_epp import FiltroClases, cargar_info_clases
+        from eventos import eventos, imprimir_evento
+        from metricas import iniciar_servidor, metricas as registro_metricas
+        from modelos import obtener_modelo
+        from procesamiento_lotes import iterar_resultados
+        from renderizado import Renderizador
+        from roi import DetectorRecortes
+        from seguimiento import EvaluadorPorTrack
+        
         try:
-            model = YOLO(self.model_path)
+            model = self._modelo_con_roi(obtener_modelo(self.model_path, imgsz=imgsz, backend=self.backend))
             cap = cv2.VideoCapture(video_path)
             
             if not cap.isOpened():
@@ -423,94 +652,161 @@ class MenuEPP:
             print(f"📊 Video: {width}x{height} @ {fps}fps | {total_frames} frames")
             print(f"🎯 Confianza: {conf} | Tamaño detección: {imgsz}px")
             print(f"💡 Nota: Frames se redimensionan a {imgsz}px para detección, luego se restauran")
+            if lote > 1:
+                print(f"📦 Modo por lotes: {lote} frames por inferencia")
             
-            # Video de salida
+            # Latencia por etapa (línea periódica y /metrics si EPP_METRICAS_PUERTO)
+            metricas = registro_metricas.fuente(Path(video_path).stem)
+            servidor_metricas = iniciar_servidor()
+            
+            # Video de salida: codificación en un hilo aparte (cola acotada)
             writer = None
             if guardar:
                 output_path = f"output_{Path(video_path).stem}.mp4"
-                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-                print(f"💾 Guardando en: {output_path}")
+                writer = EscritorVideo(output_path, fps, (width, height), codec=self.codec_salida,
+                                       bitrate=self.bitrate_salida, escala=self.escala_salida,
+                                       metricas=metricas).iniciar()
+                if solo_infracciones:
+                    # Sólo ~1 s antes y después de cada infracción
+                    writer = SoloInfracciones(writer, antes=fps or 30, despues=fps or 30)
+                print(f"💾 Guardando en: {output_path} ({self.codec_salida}, escala {self.escala_salida}"
+                      f"{', sólo infracciones' if solo_infracciones else ''})")
             
             # Inicializar hardware
             hw_ok = self._inicializar_hardware()
             
             if hw_ok:
-                self._mostrar_lcd("Procesando", "Video...")
+                self.actuador.metricas = metricas
+                self.actuador.lcd("Procesando", "Video...")
+            # En video se usa el tiempo del clip para la histéresis
+            fps_clip = fps if fps > 0 else 30
+            maquina = self._crear_maquina_acceso(hw_ok, ahora=0.0)
+            
+            # Asociación por persona para el EPP seleccionado (si lo hay)
+            asociador = None
+            if clases_objetivo and self.asociacion_por_persona:
+                epp = cargar_info_clases()['epp_classes']
+                requeridos = [c for c in clases_objetivo if c in epp]
+                if requeridos:
+                    asociador = AsociadorEPP(model.names, requeridos)
+                    print(f"🧍 EPP exigido por persona: {', '.join(asociador.requeridos)}")
+            evaluador = EvaluadorPorTrack(asociador) if asociador else None
+            
+            # Sin ventana ni video de salida no se dibuja nada (modo headless)
+            render = Renderizador(mostrar=mostrar, guardar=writer is not None, names=model.names)
+            
+            # Caídas: se vigilan siempre (aunque no sean clase objetivo) y anulan los lotes
+            caidas = DetectorCaidas.para_modelo(model.names, fuente=Path(video_path).stem, metricas=metricas)
+            eventos.suscribir(imprimir_evento)
+            
+            # Detecciones por frame e infracciones al almacén (EPP_EVENTOS_BD, escritura por lotes)
+            camara = Path(video_path).stem
+            almacen = abrir_almacen()
+            if almacen:
+                eventos.suscribir(almacen.registrar_evento)
             
-            # Contadores
-            detecciones_totales = {clase: 0 for clase in self.clases}
+            # Máscara de clases objetivo (una sola vez) y contadores
+            ids_extra = list(asociador.ids_necesarios) if asociador else []
+            if caidas:
+                ids_extra.append(caidas.id)
+            filtro = FiltroClases.desde_modelo(model, clases_objetivo, ids_extra)
+            conteos_totales = np.zeros(filtro.num_clases, dtype=np.int64)
             frame_num = 0
             todas_detectadas_count = 0
+            decision_previa = None
             
             print("\n🔄 Procesando frames...\n")
             
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
+            # Decodificación + detección (por lotes en un hilo productor si lote > 1)
+            inicio = time.perf_counter()
+            # (classes= descarta las clases no pedidas dentro del NMS)
+            for frame, resultado in iterar_resultados(cap, model, lote=lote, conf=conf,
+                                                      imgsz=imgsz, classes=filtro.classes,
+                                                      metricas=metricas, caidas=caidas):
                 frame_num += 1
+                infraccion = False
+                t_decision = time.perf_counter()
+                if almacen and resultado is not None:
+                    _, cls_frame, conf_frame = detecciones_de_resultado(resultado)
+                    almacen.registrar_detecciones(camara, frame_num, cls_frame, conf_frame, model.names)
                 
-                # Detección con tamaño de imagen especificado
-                results = model(frame, conf=conf, imgsz=imgsz, verbose=False)
+                # Conteo y verificación de clases objetivo: una operación por frame
+                conteos, presentes, todas_detectadas = filtro.evaluar(resultado)
+                conteos_totales += conteos
                 
-                # Filtrar por clases objetivo
                 if clases_objetivo:
-                    boxes = results[0].boxes
-                    clases_detectadas = set()
-                    
-                    for box in boxes:
-                        clase_nombre = model.names[int(box.cls[0])]
-                        if clase_nombre in clases_objetivo:
-                            clases_detectadas.add(clase_nombre)
-                            detecciones_totales[clase_nombre] += 1
+                    faltantes = filtro.faltantes(presentes)
                     
-                    # Verificar si se detectaron TODAS las clases objetivo
-                    todas_detectadas = len(clases_detectadas) == len(clases_objetivo)
+                    # Cada persona seguida debe llevar su propio EPP (el casco de uno
+                    # no cubre a otro); el veredicto se cachea por track
+                    if evaluador:
+                        tracks, alertas = evaluador.procesar(*detecciones_de_resultado(resultado))
+                        for t in alertas:
+                            print(f"🚨 Frame {frame_num} - Persona #{t.id}: falta {', '.join(t.faltantes)}")
+                            if almacen:
+                                for faltante in t.faltantes:
+                                    almacen.registrar_infraccion(camara, frame_num, faltante, t.id)
+                        personas_ok, faltantes_personas = evaluador.decision()
+                        todas_detectadas = todas_detectadas and personas_ok
+                        if not faltantes:
+                            faltantes = faltantes_personas
                     
                     if todas_detectadas:
                         todas_detectadas_count += 1
+                    infraccion = (any(t.veredicto is False for t in tracks) if evaluador
+                                  else not todas_detectadas)
                     
-                    # Control hardware
-                    if hw_ok:
-                        if todas_detectadas:
-                            self._activar_pines_acceso_permitido()
-                            self._mostrar_lcd("ACCESO PERMITIDO", "Puede entrar")
-                            self._abrir_puerta()
-                        else:
-                            self._activar_pines_acceso_denegado()
-                            faltante = list(faltantes)[0] if faltantes else "EPP"
-                            self._mostrar_lcd("ACCESO DENEGADO", f"Falta {faltante[:12]}")
-                            self._cerrar_puerta()
-                    
-                    # Frame anotado
-                    annotated = results[0].plot()
-                    
-                    # Panel de estado
-                    panel_color = (0, 255, 0) if todas_detectadas else (0, 165, 255)  # Verde o naranja
-                    cv2.rectangle(annotated, (10, 10), (400, 100), panel_color, -1)
-                    cv2.rectangle(annotated, (10, 10), (400, 100), (255, 255, 255), 2)
-                    
-                    status = "✅ TODAS DETECTADAS" if todas_detectadas else "🔍 BUSCANDO..."
-                    cv2.putText(annotated, status, (20, 40), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+                    # Control hardware (sólo en transiciones)
+                    if todas_detectadas:
+                        detalle = "Puede entrar"
+                    else:
+                        faltante = faltantes[0] if faltantes else "EPP"
+                        detalle = f"Falta {faltante[:12]}"
+                    maquina.actualizar(todas_detectadas, detalle, ahora=frame_num / fps_clip)
+                    if almacen and todas_detectadas != decision_previa:
+                        almacen.registrar_decision(camara, frame_num, todas_detectadas, detalle)
+                    decision_previa = todas_detectadas
+                    t_render = time.perf_counter()
+                    metricas.observar('decision', t_render - t_decision)
+                    metricas.decision_tomada()
                     
-                    faltantes = set(clases_objetivo) - clases_detectadas
-                    if faltantes:
-                        texto = f"Faltan: {', '.join(list(faltantes)[:2])}"
-                        cv2.putText(annotated, texto, (20, 70), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+                    # Frame anotado (sólo si hay ventana o video de salida)
+                    annotated = render.procesar(frame, resultado)
+                    if annotated is not None:
+                        # Marco por persona: verde cumple, rojo le falta EPP
+                        if evaluador:
+                            self._dibujar_tracks(annotated, tracks)
+                        
+                        # Panel de estado
+                        panel_color = (0, 255, 0) if todas_detectadas else (0, 165, 255)  # Verde o naranja
+                        cv2.rectangle(annotated, (10, 10), (400, 100), panel_color, -1)
+                        cv2.rectangle(annotated, (10, 10), (400, 100), (255, 255, 255), 2)
+                        
+                        status = "✅ TODAS DETECTADAS" if todas_detectadas else "🔍 BUSCANDO..."
+                        cv2.putText(annotated, status, (20, 40), 
+                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+                        
+                        if faltantes:
+                            texto = f"Faltan: {', '.join(faltantes[:2])}"
+                            cv2.putText(annotated, texto, (20, 70), 
+                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
                 
                 else:
                     # Detectar todas las clases
-                    annotated = results[0].plot()
-                    for box in results[0].boxes:
-                        clase_nombre = model.names[int(box.cls[0])]
-                        detecciones_totales[clase_nombre] += 1
+                    t_render = time.perf_counter()
+                    metricas.observar('decision', t_render - t_decision)
+                    metricas.decision_tomada()
+                    annotated = render.procesar(frame, resultado)
+                
+                if annotated is not None and isinstance(model, DetectorRecortes):
+                    model.dibujar(annotated)
+                if annotated is not None:
+                    metricas.observar('render', time.perf_counter() - t_render)
                 
-                # Guardar frame
-                if writer:
+                # Guardar frame (encolado; el hilo escritor codifica)
+                if solo_infracciones and writer:
+                    writer.escribir(annotated, infraccion)
+                elif writer:
                     writer.write(annotated)
                 
                 # Mostrar
@@ -521,18 +817,36 @@ class MenuEPP:
                         break
                 
                 # Progreso
+                metricas.frame()
                 if frame_num % 30 == 0:
                     progreso = (frame_num / total_frames) * 100
                     print(f"⏳ Frame {frame_num}/{total_frames} ({progreso:.1f}%)")
+                registro_metricas.reportar_si_toca()
+            
+            segundos = time.perf_counter() - inicio
+            detecciones_totales = filtro.a_diccionario(conteos_totales)
+            # Personas y EPP por persona única (aparte de las cajas por frame)
+            conteo_personas = evaluador.conteo_unico() if evaluador else {}
             
             # Limpiar
             cap.release()
             if writer:
                 writer.release()
+                print(f"🎞️  Escritor: {writer.resumen()}")
+            eventos.vaciar()
+            if almacen:
+                eventos.desuscribir(almacen.registrar_evento)
+                almacen.detener()
+                print(f"🗃️  Almacén de eventos: {almacen.resumen()}")
+            if servidor_metricas is not None:
+                servidor_metricas.detener()
+            print(f"⏱️  {metricas.linea()}")
+            if caidas:
+                print(f"🆘 Caídas: {caidas.resumen()}")
             cv2.destroyAllWindows()
             
             if hw_ok:
-                self._mostrar_lcd("Proceso", "Completado")
+                self.actuador.lcd("Proceso", "Completado")
                 self._cleanup_gpio()
             
             # Resumen
@@ -540,13 +854,24 @@ class MenuEPP:
             print("✅ PROCESAMIENTO COMPLETADO")
             print("=" * 60)
             print(f"\n📊 Frames procesados: {frame_num}/{total_frames}")
+            if segundos > 0:
+                print(f"⚡ Rendimiento: {frame_num / segundos:.1f} FPS ({segundos:.1f}s, lote={lote})")
+            if not render.activo:
+                print("🖥️  Modo headless: sin renderizado de frames")
             
             if clases_objetivo:
-                print(f"\n🎯 Frames con TODAS las clases: {todas_detectadas_count} ({(todas_detectadas_count/frame_num)*100:.1f}%)")
-                print("\n📈 Detecciones por clase:")
+                print(f"\n🎯 Frames con TODAS las clases: {todas_detectadas_count} ({(todas_detectadas_count/max(1, frame_num))*100:.1f}%)")
+                if evaluador:
+                    print(f"\n👥 Personas únicas: {evaluador.rastreador.personas_unicas} | "
+                          f"Evaluaciones EPP: {evaluador.evaluaciones}/{evaluador.frames} frames")
+                print("\n📈 Detecciones por clase (cajas en todos los frames):")
                 for clase in clases_objetivo:
-                    count = detecciones_totales[clase]
+                    count = detecciones_totales.get(clase, 0)
                     print(f"  • {clase}: {count}")
+                if conteo_personas:
+                    print("\n🧍 Por persona única (tracks confirmados):")
+                    for clase, count in conteo_personas.items():
+                        print(f"  • {clase}: {count}")
             else:
                 print("\n📈 Detecciones totales:")
                 for clase, count in detecciones_totales.items():
@@ -561,8 +886,57 @@ class MenuEPP:
             import traceback
             traceback.print_exc()
     
+    def _procesar_video_paralelo(self, video_path, clases_objetivo, conf, guardar, imgsz, procesos):
+        """Procesa el video por segmentos en varios procesos (auditoría offline, sin hardware)"""
+        from procesamiento_paralelo import procesar_video_paralelo
+        
+        try:
+            salida = f"output_{Path(video_path).stem}.mp4" if guardar else None
+            reporte = procesar_video_paralelo(self.model_path, video_path, clases_objetivo,
+                                              conf=conf, imgsz=imgsz, procesos=procesos,
+                                              salida=salida, backend=self.backend,
+                                              ruta_roi=self.ruta_roi,
+                                              por_persona=self.asociacion_por_persona)
+            
+            frame_num = reporte['frames']
+            detecciones_totales = reporte['detecciones_totales']
+            
+            # Resumen
+            print("\n" + "=" * 60)
+            print("✅ PROCESAMIENTO COMPLETADO")
+            print("=" * 60)
+            print(f"\n📊 Frames procesados: {frame_num}/{reporte['total_frames']}")
+            print(f"⚡ Rendimiento: {reporte['fps']:.1f} FPS ({reporte['segundos']:.1f}s, "
+                  f"{reporte['procesos']} procesos)")
+            
+            if clases_objetivo:
+                todas = reporte['todas_detectadas_count']
+                print(f"\n🎯 Frames con TODAS las clases: {todas} ({(todas/max(1, frame_num))*100:.1f}%)")
+                print("\n📈 Detecciones por clase (cajas en todos los frames):")
+                for clase in clases_objetivo:
+                    print(f"  • {clase}: {detecciones_totales.get(clase, 0)}")
+                if reporte['conteo_personas']:
+                    print("\n🧍 Por persona única (tracks confirmados, por segmento):")
+                    for clase, count in reporte['conteo_personas'].items():
+                        print(f"  • {clase}: {count}")
+            else:
+                print("\n📈 Detecciones totales:")
+                for clase, count in detecciones_totales.items():
+                    if count > 0:
+                        print(f"  • {clase}: {count}")
+            
+            if salida:
+                print(f"\n💾 Video guardado: {salida}")
+            
+        except Exception as e:
+            print(f"\n❌ Error: {e}")
+            import traceback
+            traceback.print_exc()
+    
     def optimizar(self):
         """Optimiza el modelo a formato ONNX"""
+        from modelos import obtener_modelo
+        
         self.limpiar()
         print("=" * 60)
         print(" " * 15 + "⚡ OPTIMIZACIÓN DE MODELO")
@@ -571,11 +945,12 @@ class MenuEPP:
         print("(Compatible con Jetson Nano)\n")
         
         try:
-            model = YOLO(self.model_path)
+            model = obtener_modelo(self.model_path, warmup=0, backend=self.backend)
             output = model.export(format='onnx', imgsz=640, simplify=True)
             print(f"\n✅ Modelo exportado: {output}")
             print("\n💡 Para usar el modelo ONNX:")
             print(f"   model = YOLO('{output}')")
+            print("   o con el backend nativo: EPP_BACKEND=onnxruntime")
         except Exception as e:
             print(f"\n❌ Error: {e}")
         
@@ -593,46 +968,50 @@ class MenuEPP:
             if self._inicializar_hardware():
                 print("✅ Hardware inicializado correctamente\n")
                 
+                # Todo pasa por el hilo actuador (único dueño del GPIO);
+                # esperar() asegura que cada paso se aplicó antes de la pausa
+                actuador = self.actuador
+                
                 # Test LCD
                 print("📟 Probando LCD...")
-                self._mostrar_lcd("TEST LCD", "Linea 2")
-                import time
+                actuador.lcd("TEST LCD", "Linea 2")
+                actuador.esperar()
                 time.sleep(2)
                 
                 # Test Servo - Abrir
                 print("🚪 Probando Servo - Abriendo puerta...")
-                self._mostrar_lcd("Probando Servo", "Abriendo...")
-                self._abrir_puerta()
+                actuador.lcd("Probando Servo", "Abriendo...")
+                actuador.puerta(True)
+                actuador.esperar()
                 time.sleep(2)
                 
                 # Test Servo - Cerrar
                 print("🚪 Probando Servo - Cerrando puerta...")
-                self._mostrar_lcd("Probando Servo", "Cerrando...")
-                self._cerrar_puerta()
+                actuador.lcd("Probando Servo", "Cerrando...")
+                actuador.puerta(False)
+                actuador.esperar()
                 time.sleep(2)
                 
                 # Test pines de acceso permitido (señal HIGH)
                 print("✅ Probando pines de acceso permitido (GPIOs 17,18,27,22 = HIGH)...")
-                self._mostrar_lcd("ACCESO", "PERMITIDO")
-                self._activar_pines_acceso_permitido()
+                actuador.lcd("ACCESO", "PERMITIDO")
+                actuador.pines(True)
+                actuador.esperar()
                 time.sleep(3)
                 
                 # Test pines de acceso denegado (señal HIGH)
                 print("❌ Probando pines de acceso denegado (GPIOs 23,24,25,5 = HIGH)...")
-                self._mostrar_lcd("ACCESO", "DENEGADO")
-                self._activar_pines_acceso_denegado()
+                actuador.lcd("ACCESO", "DENEGADO")
+                actuador.pines(False)
+                actuador.esperar()
                 time.sleep(3)
                 
                 # Apagar todo
                 print("🔌 Apagando todos los pines...")
-                self._mostrar_lcd("Test", "Completado")
-                for pin in self.pines_detectado + self.pines_no_detectado:
-                    try:
-                        import Jetson.GPIO as GPIO
-                        GPIO.output(pin, GPIO.LOW)
-                    except:
-                        pass
+                actuador.lcd("Test", "Completado")
+                actuador.apagar_pines()
                 
+                # detener() aplica lo pendiente antes de limpiar el GPIO
                 time.sleep(1)
                 self._cleanup_gpio()
                 
@@ -659,6 +1038,10 @@ class MenuEPP:
         nueva_ruta = input().strip().strip('"')
         
         if Path(nueva_ruta).exists():
+            # Liberar el modelo anterior sólo si se eligió otro archivo
+            if Path(self.model_path).resolve() != Path(nueva_ruta).resolve():
+                from modelos import registro
+                registro.descargar(self.model_path)
             self.model_path = nueva_ruta
             print(f"\n✅ Modelo actualizado: {Path(nueva_ruta).name}")
         else:
@@ -667,12 +1050,12 @@ class MenuEPP:
         input("\nPresiona Enter...")
     
     def _cleanup_gpio(self):
-        """Limpia la configuración GPIO"""
-        try:
-            import Jetson.GPIO as GPIO
-            GPIO.cleanup()
-        except:
-            pass
+        """Detiene el hilo actuador (aplicando lo pendiente) y limpia la configuración GPIO"""
+        if self.actuador:
+            self.actuador.detener(limpiar=True)
+            self.actuador = None
+        elif self.hardware:
+            self.hardware.limpiar()
 
 if __name__ == "__main__":
     menu = MenuEPP()
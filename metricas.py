@@ -0,0 +1,351 @@
+"""
+Métricas de latencia por etapa del pipeline
+Cada fuente (cámara o video) tiene un histograma de buckets fijos por etapa
+(captura, preproceso, inferencia, postproceso, decisión, actuador, render,
+escritura): registrar una muestra es un bisect sobre 50 límites, sin
+memoria creciente. Se exponen en formato Prometheus por HTTP local y en una
+línea de log periódica con p50/p95/p99 y frames descartados por fuente.
+El tiempo-a-alerta (frame → despacho de la alerta) va en su propio
+histograma por tipo de alerta.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+ETAPAS = ('captura', 'preproceso', 'inferencia', 'postproceso', 'decision', 'actuador', 'render', 'escritura')
+
+# Límites de los buckets en segundos: 0.1 ms a ~5 s en progresión geométrica (x1.25)
+LIMITES = tuple(round(0.0001 * 1.25 ** i, 7) for i in range(50))
+
+# Etapas de ultralytics (Results.speed, en ms) → etapas propias
+_ETAPAS_SPEED = (('preprocess', 'preproceso'), ('inference', 'inferencia'), ('postprocess', 'postproceso'))
+
+
+class Histograma:
+    """Histograma acumulado con buckets fijos (estilo Prometheus)"""
+
+    __slots__ = ('limites', 'cuentas', 'suma', 'n')
+
+    def __init__(self, limites=LIMITES):
+        self.limites = limites
+        self.cuentas = [0] * (len(limites) + 1)     # El último bucket es +Inf
+        self.suma = 0.0
+        self.n = 0
+
+    def observar(self, segundos):
+        self.cuentas[bisect.bisect_left(self.limites, segundos)] += 1
+        self.suma += segundos
+        self.n += 1
+
+    def instantanea(self):
+        return list(self.cuentas), self.suma, self.n
+
+    def percentil(self, q, desde=None):
+        """Percentil q (0-1) en segundos, interpolando dentro del bucket
+
+        Args:
+            desde: instantanea() previa para calcularlo sólo sobre lo nuevo
+        """
+        cuentas = self.cuentas
+        if desde is not None:
+            cuentas = [a - b for a, b in zip(cuentas, desde[0])]
+        total = sum(cuentas)
+        if total == 0:
+            return None
+        objetivo = q * total
+        acumulado = 0
+        for i, c in enumerate(cuentas):
+            if c and acumulado + c >= objetivo:
+                inferior = self.limites[i - 1] if i > 0 else 0.0
+                superior = self.limites[i] if i < len(self.limites) else self.limites[-1]
+                return inferior + (superior - inferior) * (objetivo - acumulado) / c
+            acumulado += c
+        return self.limites[-1]
+
+
+class _Cronometro:
+    __slots__ = ('histograma', 't0')
+
+    def __init__(self, histograma):
+        self.histograma = histograma
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histograma.observar(time.perf_counter() - self.t0)
+
+
+class MetricasFuente:
+    """Histogramas por etapa y contadores de una fuente"""
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.etapas = {etapa: Histograma() for etapa in ETAPAS}
+        self.ciclo = Histograma()         # Tiempo entre frames consecutivos (todas las etapas)
+        self.latencia = Histograma()      # Frame decodificado → decisión tomada (incluye la espera del lote)
+        self.t_frame = None               # Marca (monotonic) del frame en curso; la pone quien decodifica
+        self.alertas = {}                 # tipo -> Histograma del tiempo frame → alerta despachada
+        self.frames = 0
+        self.descartados = 0
+        self._t_frame = None
+        self._previo = {}
+        self._frames_previo = 0
+        self._descartados_previo = 0
+        self._t_previo = time.monotonic()
+
+    def observar(self, etapa, segundos):
+        self.etapas[etapa].observar(segundos)
+
+    def medir(self, etapa):
+        """Context manager: with metricas.medir('render'): ..."""
+        return _Cronometro(self.etapas[etapa])
+
+    def observar_alerta(self, tipo, segundos):
+        """Tiempo-a-alerta de un evento ('caida', 'epp'...) desde la marca del frame"""
+        h = self.alertas.get(tipo)
+        if h is None:
+            h = self.alertas.setdefault(tipo, Histograma())
+        h.observar(segundos)
+
+    def observar_resultado(self, resultado):
+        """Preproceso / inferencia / postproceso desde resultado.speed (ms)"""
+        speed = getattr(resultado, 'speed', None)
+        if not speed:
+            return
+        for origen, etapa in _ETAPAS_SPEED:
+            ms = speed.get(origen)
+            if ms is not None:
+                self.etapas[etapa].observar(ms / 1000)
+
+    def decision_tomada(self):
+        """Latencia del frame en curso desde su decodificación (marca t_frame)"""
+        if self.t_frame is not None:
+            self.latencia.observar(time.monotonic() - self.t_frame)
+
+    def frame(self, descartados=None):
+        """Cuenta un frame procesado; 'descartados' = contador acumulado de la captura"""
+        ahora = time.perf_counter()
+        if self._t_frame is not None:
+            self.ciclo.observar(ahora - self._t_frame)
+        self._t_frame = ahora
+        self.frames += 1
+        if descartados is not None:
+            self.descartados = descartados
+
+    def linea(self):
+        """p50/p95/p99 (ms) de cada etapa desde la línea anterior"""
+        ahora = time.monotonic()
+        fps = (self.frames - self._frames_previo) / max(1e-9, ahora - self._t_previo)
+        partes = [f"[{self.nombre}] {fps:.1f} FPS, descartados +{self.descartados - self._descartados_previo}"]
+        histogramas = list(self.etapas.items()) + [(f"alerta:{t}", h) for t, h in list(self.alertas.items())]
+        for etapa, h in histogramas:
+            previo = self._previo.get(etapa)
+            if h.n == (previo[2] if previo else 0):
+                continue
+            p = [h.percentil(q, previo) * 1000 for q in (0.5, 0.95, 0.99)]
+            partes.append(f"{etapa} {p[0]:.1f}/{p[1]:.1f}/{p[2]:.1f}")
+            self._previo[etapa] = h.instantanea()
+        self._frames_previo, self._descartados_previo, self._t_previo = self.frames, self.descartados, ahora
+        return " | ".join(partes)
+
+    def resumen(self):
+        """Percentiles acumulados en ms (para JSON)"""
+        def percentiles(h):
+            return {'n': h.n, 'media_ms': h.suma / h.n * 1000,
+                    **{f"p{int(q * 100)}_ms": h.percentil(q) * 1000 for q in (0.5, 0.95, 0.99)}}
+
+        return {
+            'frames': self.frames,
+            'descartados': self.descartados,
+            'ciclo': percentiles(self.ciclo) if self.ciclo.n else None,
+            'latencia': percentiles(self.latencia) if self.latencia.n else None,
+            'etapas': {etapa: percentiles(h) for etapa, h in self.etapas.items() if h.n},
+            'tiempo_alerta': {tipo: percentiles(h) for tipo, h in list(self.alertas.items()) if h.n},
+        }
+
+
+class RegistroMetricas:
+    """Métricas de todas las fuentes del proceso
+
+    Args:
+        intervalo: segundos entre líneas de log de reportar_si_toca() (0 = nunca)
+    """
+
+    def __init__(self, intervalo=None):
+        if intervalo is None:
+            intervalo = float(os.environ.get("EPP_METRICAS_INTERVALO", "10"))
+        self.intervalo = intervalo
+        self._fuentes = {}
+        self._lock = threading.Lock()
+        self._proximo = time.monotonic() + intervalo
+
+    def fuente(self, nombre):
+        """Métricas de una fuente (se crean la primera vez)"""
+        with self._lock:
+            if nombre not in self._fuentes:
+                self._fuentes[nombre] = MetricasFuente(nombre)
+            return self._fuentes[nombre]
+
+    def fuentes(self):
+        with self._lock:
+            return list(self._fuentes.values())
+
+    def reportar_si_toca(self):
+        """Imprime la línea de cada fuente si pasó el intervalo (barato de llamar por frame)"""
+        if not self.intervalo:
+            return
+        ahora = time.monotonic()
+        if ahora < self._proximo:
+            return
+        self._proximo = ahora + self.intervalo
+        for fuente in self.fuentes():
+            print(f"⏱️  {fuente.linea()}")
+
+    def prometheus(self):
+        """Texto en formato de exposición de Prometheus"""
+        fuentes = self.fuentes()
+        lineas = [
+            "# HELP eppia_etapa_segundos Latencia por etapa del pipeline",
+            "# TYPE eppia_etapa_segundos histogram",
+        ]
+        for f in fuentes:
+            for etapa, h in f.etapas.items():
+                _histograma_prometheus(lineas, "eppia_etapa_segundos", f'fuente="{f.nombre}",etapa="{etapa}"', h)
+        lineas += [
+            "# HELP eppia_latencia_frame_segundos Tiempo desde la decodificación del frame hasta su decisión",
+            "# TYPE eppia_latencia_frame_segundos histogram",
+        ]
+        for f in fuentes:
+            _histograma_prometheus(lineas, "eppia_latencia_frame_segundos", f'fuente="{f.nombre}"', f.latencia)
+        lineas += [
+            "# HELP eppia_tiempo_alerta_segundos Tiempo desde el frame hasta el despacho de la alerta",
+            "# TYPE eppia_tiempo_alerta_segundos histogram",
+        ]
+        for f in fuentes:
+            for tipo, h in list(f.alertas.items()):
+                _histograma_prometheus(lineas, "eppia_tiempo_alerta_segundos", f'fuente="{f.nombre}",tipo="{tipo}"', h)
+        for nombre, ayuda, atributo in (("eppia_frames_total", "Frames procesados", "frames"),
+                                        ("eppia_frames_descartados_total", "Frames descartados por la captura",
+                                         "descartados")):
+            lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} counter"]
+            lineas += [f'{nombre}{{fuente="{f.nombre}"}} {getattr(f, atributo)}' for f in fuentes]
+        return "\n".join(lineas) + "\n"
+
+    def resumen(self):
+        return {f.nombre: f.resumen() for f in self.fuentes()}
+
+
+def _histograma_prometheus(lineas, nombre, etiquetas, h):
+    """Agrega las líneas _bucket/_sum/_count de un histograma (nada si está vacío)"""
+    if not h.n:
+        return
+    cuentas, suma, _ = h.instantanea()
+    acumulado = 0
+    for limite, c in zip(h.limites, cuentas):
+        acumulado += c
+        lineas.append(f'{nombre}_bucket{{{etiquetas},le="{limite:g}"}} {acumulado}')
+    lineas.append(f'{nombre}_bucket{{{etiquetas},le="+Inf"}} {acumulado + cuentas[-1]}')
+    lineas.append(f'{nombre}_sum{{{etiquetas}}} {suma:.6f}')
+    lineas.append(f'{nombre}_count{{{etiquetas}}} {acumulado + cuentas[-1]}')
+
+
+class ServidorMetricas:
+    """Endpoint HTTP local: /metrics (Prometheus) y /metrics.json
+
+    Args:
+        registro: RegistroMetricas a exponer
+        puerto: puerto TCP (EPP_METRICAS_PUERTO)
+        host: interfaz (por defecto sólo localhost)
+    """
+
+    def __init__(self, registro, puerto=9108, host="127.0.0.1"):
+        self.registro = registro
+        self.direccion = (host, puerto)
+        self._servidor = None
+        self._hilo = None
+
+    def iniciar(self):
+        registro = self.registro
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    cuerpo, tipo = json.dumps(registro.resumen()).encode(), "application/json"
+                elif self.path.startswith("/metrics"):
+                    cuerpo, tipo = registro.prometheus().encode(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer(self.direccion, Manejador)
+        self._servidor.daemon_threads = True
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, name="ServidorMetricas", daemon=True)
+        self._hilo.start()
+        print(f"📈 Métricas en http://{self.direccion[0]}:{self._servidor.server_address[1]}/metrics")
+        return self
+
+    def detener(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+            self._hilo = None
+
+
+# Registro compartido por los menús, el servicio y los escritores
+metricas = RegistroMetricas()
+
+
+def iniciar_servidor(puerto=None, host="127.0.0.1"):
+    """Arranca el endpoint si hay puerto (argumento o EPP_METRICAS_PUERTO); si no, None"""
+    puerto = puerto if puerto is not None else os.environ.get("EPP_METRICAS_PUERTO")
+    if not puerto:
+        return None
+    try:
+        return ServidorMetricas(metricas, int(puerto), host).iniciar()
+    except OSError as e:
+        print(f"⚠️  No se pudo abrir el endpoint de métricas en el puerto {puerto}: {e}")
+        return None
+
+
+def medir_sobrecarga(muestras=100000):
+    """Costo medio (µs) de registrar una etapa con medir() y con observar()"""
+    fuente = MetricasFuente("sobrecarga")
+    t0 = time.perf_counter()
+    for _ in range(muestras):
+        with fuente.medir('decision'):
+            pass
+    t1 = time.perf_counter()
+    for _ in range(muestras):
+        fuente.observar('render', 0.004)
+    t2 = time.perf_counter()
+    return {'medir_us': (t1 - t0) / muestras * 1e6, 'observar_us': (t2 - t1) / muestras * 1e6}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sobrecarga de la instrumentación por etapa")
+    parser.add_argument("--fps", type=float, default=30.0, help="FPS del pipeline para expresar el costo en %%")
+    args = parser.parse_args()
+
+    costo = medir_sobrecarga()
+    por_frame = costo['medir_us'] * len(ETAPAS)
+    print(f"medir(): {costo['medir_us']:.2f} µs | observar(): {costo['observar_us']:.2f} µs")
+    print(f"{len(ETAPAS)} etapas por frame: {por_frame:.1f} µs = "
+          f"{por_frame / (1e6 / args.fps) * 100:.3f}% de un frame a {args.fps:.0f} FPS")
@@ -0,0 +1,104 @@
+"""
+Registro de modelos YOLO compartido entre los modos de los menús
+Carga cada modelo una sola vez, hace una pasada de calentamiento con el
+imgsz objetivo y sólo recarga cuando cambia el archivo.
+"""
+
+import os
+
+import numpy as np
+
+
+class RegistroModelos:
+    """Caché de modelos por (ruta, mtime del archivo, ajustes de inferencia)
+
+    Args:
+        iteraciones_warmup: inferencias sobre una imagen vacía la primera vez
+            que se usa un imgsz (0 = sin calentamiento)
+    """
+
+    def __init__(self, iteraciones_warmup=2):
+        self.iteraciones_warmup = iteraciones_warmup
+        self._cache = {}
+        self.cargas = 0
+
+    @staticmethod
+    def _clave(ruta, ajustes):
+        ruta = os.path.abspath(ruta)
+        ajustes = dict(ajustes, backend=ajustes.get('backend') or 'ultralytics')
+        try:
+            mtime = os.path.getmtime(ruta)
+        except OSError:
+            mtime = None
+        return (ruta, mtime, tuple(sorted(ajustes.items())))
+
+    def obtener(self, ruta, imgsz=640, warmup=None, **ajustes):
+        """Devuelve el modelo (cargándolo y calentándolo si hace falta)
+
+        Args:
+            ruta: archivo .pt / .onnx / .engine
+            imgsz: tamaño de inferencia para el calentamiento
+            warmup: iteraciones de calentamiento (None = valor del registro)
+            **ajustes: ajustes de inferencia que afectan al backend
+                (p.ej. device, half, backend); forman parte de la clave de la caché.
+                backend='onnxruntime' con un .onnx usa DetectorONNX en lugar de YOLO
+        """
+        clave = self._clave(ruta, ajustes)
+        entrada = self._cache.get(clave)
+
+        if entrada is None:
+            # Si el archivo cambió (otro mtime) se descarta la versión anterior
+            self._descartar(lambda k: k[0] == clave[0] and k[1] != clave[1])
+            print(f"🔄 Cargando modelo: {ruta}")
+            entrada = {'modelo': self._cargar(ruta, ajustes), 'calentados': set()}
+            self._cache[clave] = entrada
+            self.cargas += 1
+        else:
+            print(f"♻️  Modelo en caché: {ruta}")
+
+        iteraciones = self.iteraciones_warmup if warmup is None else warmup
+        if iteraciones > 0 and imgsz not in entrada['calentados']:
+            self.calentar(entrada['modelo'], imgsz, iteraciones, **ajustes)
+            entrada['calentados'].add(imgsz)
+
+        return entrada['modelo']
+
+    @staticmethod
+    def _cargar(ruta, ajustes):
+        if ajustes.get('backend') == 'onnxruntime' and str(ruta).endswith('.onnx'):
+            from backend_onnx import DetectorONNX
+            return DetectorONNX(ruta)
+        # ultralytics (y torch) sólo se importan al cargar el primer modelo
+        from ultralytics import YOLO
+        task = ajustes.get('task')
+        return YOLO(ruta, task=task) if task else YOLO(ruta)
+
+    @staticmethod
+    def calentar(model, imgsz=640, iteraciones=2, **ajustes):
+        """Ejecuta inferencias sobre una imagen vacía para inicializar el backend"""
+        kwargs = {k: v for k, v in ajustes.items() if k in ('device', 'half')}
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        print(f"🔥 Calentando modelo ({iteraciones}x imgsz={imgsz})...")
+        for _ in range(iteraciones):
+            model(dummy, imgsz=imgsz, verbose=False, **kwargs)
+
+    def descargar(self, ruta=None):
+        """Libera un modelo (o todos si ruta es None)"""
+        if ruta is None:
+            self._cache.clear()
+        else:
+            ruta = os.path.abspath(ruta)
+            self._descartar(lambda k: k[0] == ruta)
+
+    def _descartar(self, condicion):
+        for clave in [k for k in self._cache if condicion(k)]:
+            del self._cache[clave]
+
+
+# Registro compartido por MenuPrincipal y MenuEPP
+registro = RegistroModelos()
+
+
+def obtener_modelo(ruta, imgsz=640, warmup=None, **ajustes):
+    """Atajo para registro.obtener()"""
+    return registro.obtener(ruta, imgsz=imgsz, warmup=warmup, **ajustes)
@@ -0,0 +1,129 @@
+"""
+Planificador adaptativo de inferencia
+Decide frame a frame si se ejecuta el detector, se reutilizan las últimas
+detecciones o se salta el frame, a partir de la latencia real medida y de un
+puntaje de movimiento barato (diferencia de frames en miniatura). Un pasillo
+vacío cuesta casi nada y con personas presentes se mantiene la tasa del modelo
+hasta donde lo permita el presupuesto de FPS.
+"""
+
+import copy
+import time
+
+import cv2
+import numpy as np
+
+
+DETECTAR = "detectar"
+REUTILIZAR = "reutilizar"
+SALTAR = "saltar"
+
+
+class PlanificadorAdaptativo:
+    """Planificador por presupuesto de tiempo (cubeta de créditos)
+
+    Args:
+        fps_objetivo: FPS del bucle completo que se quiere sostener
+        umbral_movimiento: diferencia media (0-255) en miniatura que cuenta como movimiento
+        intervalo_vacio: segundos máximos sin detectar con la escena vacía y quieta
+        id_persona: id de la clase Person (None = cualquier caja cuenta como presencia)
+        ancho_miniatura: ancho de la miniatura para el puntaje de movimiento
+        caidas: DetectorCaidas; en modo prioritario se detecta en todos los frames
+    """
+
+    def __init__(self, fps_objetivo=15.0, umbral_movimiento=3.0, intervalo_vacio=2.0,
+                 id_persona=None, ancho_miniatura=64, caidas=None):
+        self.presupuesto = 1.0 / max(fps_objetivo, 0.1)
+        self.umbral_movimiento = umbral_movimiento
+        self.intervalo_vacio = intervalo_vacio
+        self.id_persona = id_persona
+        self.ancho_miniatura = ancho_miniatura
+        self.caidas = caidas
+
+        self.latencia = None        # EMA de la latencia de inferencia (s)
+        self.credito = 0.0
+        self.hay_personas = True    # Hasta la primera detección se asume presencia
+        self.movimiento = 0.0
+        self._previa = None
+        self._t_ultima_deteccion = None
+        self.acciones = {DETECTAR: 0, REUTILIZAR: 0, SALTAR: 0}
+
+    def puntaje_movimiento(self, frame):
+        """Diferencia media absoluta entre miniaturas en gris consecutivas"""
+        alto = max(1, frame.shape[0] * self.ancho_miniatura // frame.shape[1])
+        mini = cv2.resize(frame, (self.ancho_miniatura, alto), interpolation=cv2.INTER_AREA)
+        gris = cv2.cvtColor(mini, cv2.COLOR_BGR2GRAY)
+        if self._previa is None or self._previa.shape != gris.shape:
+            puntaje = 255.0
+        else:
+            puntaje = float(cv2.absdiff(gris, self._previa).mean())
+        self._previa = gris
+        return puntaje
+
+    def decidir(self, frame, ahora=None):
+        """Devuelve DETECTAR, REUTILIZAR o SALTAR para este frame"""
+        ahora = time.monotonic() if ahora is None else ahora
+
+        # Cada frame aporta su presupuesto de tiempo; detectar gasta la latencia medida
+        self.credito += self.presupuesto
+        costo = self.latencia or 0.0
+        self.credito = min(self.credito, 2 * max(costo, self.presupuesto))
+
+        self.movimiento = self.puntaje_movimiento(frame)
+        hay_movimiento = self.movimiento >= self.umbral_movimiento
+        vencido = (self._t_ultima_deteccion is None or
+                   ahora - self._t_ultima_deteccion >= self.intervalo_vacio)
+
+        if self.caidas is not None and self.caidas.prioritario:
+            # Caída reciente: sin salto, aunque el crédito quede negativo
+            accion = DETECTAR
+            self.credito -= costo
+        elif not self.hay_personas and not hay_movimiento and not vencido:
+            accion = SALTAR
+        elif self.credito >= costo or vencido:
+            accion = DETECTAR
+            self.credito -= costo
+        else:
+            accion = REUTILIZAR if self.hay_personas else SALTAR
+
+        self.acciones[accion] += 1
+        return accion
+
+    def registrar(self, latencia, resultado=None, ahora=None, alpha=0.2):
+        """Registra la latencia de una inferencia y si había personas"""
+        self.latencia = latencia if self.latencia is None else (1 - alpha) * self.latencia + alpha * latencia
+        self._t_ultima_deteccion = time.monotonic() if ahora is None else ahora
+        if resultado is not None:
+            cls = resultado.boxes.cls
+            if hasattr(cls, 'cpu'):
+                cls = cls.cpu().numpy()
+            cls = np.asarray(cls)
+            self.hay_personas = bool((cls == self.id_persona).any() if self.id_persona is not None
+                                     else len(cls) > 0)
+
+    def inferir(self, model, frame, ultimo=None, **kwargs):
+        """Aplica la decisión: devuelve (accion, resultado)
+
+        DETECTAR ejecuta el modelo; REUTILIZAR devuelve las últimas
+        detecciones sobre el frame actual; SALTAR devuelve None.
+        """
+        accion = self.decidir(frame)
+        if accion == DETECTAR:
+            t0 = time.perf_counter()
+            resultado = model(frame, **kwargs)[0]
+            self.registrar(time.perf_counter() - t0, resultado)
+            return accion, resultado
+        if accion == REUTILIZAR and ultimo is not None:
+            return accion, reutilizar(ultimo, frame)
+        return SALTAR, None
+
+    def resumen(self):
+        total = max(1, sum(self.acciones.values()))
+        return ", ".join(f"{a}: {n} ({n / total * 100:.0f}%)" for a, n in self.acciones.items())
+
+
+def reutilizar(resultado, frame):
+    """Copia superficial de un resultado con las cajas anteriores sobre el frame actual"""
+    copia = copy.copy(resultado)
+    copia.orig_img = frame
+    return copia
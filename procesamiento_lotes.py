@@ -0,0 +1,187 @@
+"""
+Procesamiento de video por lotes
+Un hilo productor decodifica frames y los agrupa en lotes para una sola
+llamada a model(...); los resultados se entregan en orden. Pensado para
+auditorías offline donde importa el rendimiento total, no la latencia,
+salvo tras una caída: mientras dura el modo prioritario se infiere cada
+frame y los grupos se envían sin esperar a llenar el lote.
+"""
+
+import queue
+import threading
+import time
+
+import cv2
+
+from planificador import REUTILIZAR
+
+
+_FIN = object()
+
+
+def _productor(cap, lote, cada, cola, parar, metricas=None, caidas=None):
+    """Decodifica frames y los agrupa: [(frame, inferir, t_frame), ...]"""
+    grupo = []
+    pendientes = 0
+    numero = 0
+    try:
+        while not parar.is_set():
+            t0 = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if metricas is not None:
+                metricas.observar('captura', time.perf_counter() - t0)
+            numero += 1
+            prioritario = caidas is not None and caidas.prioritario
+            inferir = cada <= 1 or numero % cada == 0 or prioritario
+            grupo.append((frame, inferir, time.monotonic()))
+            pendientes += inferir
+            if pendientes >= lote or (prioritario and pendientes):
+                cola.put(grupo)
+                grupo, pendientes = [], 0
+        if grupo:
+            cola.put(grupo)
+    finally:
+        cola.put(_FIN)
+
+
+def iterar_resultados(cap, model, lote=1, cada=1, cola_max=4, planificador=None, metricas=None, caidas=None,
+                      **kwargs):
+    """Genera (frame, resultado) en orden para cada frame del video
+
+    Args:
+        cap: cv2.VideoCapture abierto
+        model: modelo YOLO
+        lote: frames por llamada al modelo (1 = frame a frame en el mismo hilo)
+        cada: inferir sólo uno de cada N frames; los demás se entregan con resultado None
+        cola_max: lotes decodificados en espera (limita la memoria)
+        planificador: PlanificadorAdaptativo que decide por frame si detectar,
+            reutilizar o saltar (sólo con lote=1; reemplaza a 'cada')
+        metricas: MetricasFuente donde registrar captura y preproceso/inferencia/postproceso;
+            antes de entregar cada frame se marca metricas.t_frame (su decodificación)
+            para que el consumidor llame a metricas.decision_tomada()
+        caidas: DetectorCaidas; revisa cada resultado y, en modo prioritario,
+            anula 'cada' y el agrupamiento en lotes
+        **kwargs: argumentos de inferencia (conf, imgsz, classes...)
+    """
+    kwargs.setdefault('verbose', False)
+
+    if lote <= 1:
+        numero = 0
+        ultimo = None
+        while True:
+            t0 = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                return
+            if metricas is not None:
+                metricas.observar('captura', time.perf_counter() - t0)
+            t_frame = time.monotonic()
+            numero += 1
+            if planificador is not None:
+                accion, resultado = planificador.inferir(model, frame, ultimo, **kwargs)
+                if resultado is not None and accion != REUTILIZAR:
+                    ultimo = resultado
+                    if metricas is not None:
+                        metricas.observar_resultado(resultado)
+                    if caidas is not None:
+                        caidas.revisar(resultado, t_frame, numero)
+                if metricas is not None:
+                    metricas.t_frame = t_frame
+                yield frame, resultado
+                continue
+            if metricas is not None:
+                metricas.t_frame = t_frame
+            if cada > 1 and numero % cada != 0 and not (caidas is not None and caidas.prioritario):
+                yield frame, None
+                continue
+            resultado = model(frame, **kwargs)[0]
+            if metricas is not None:
+                metricas.observar_resultado(resultado)
+            if caidas is not None:
+                caidas.revisar(resultado, t_frame, numero)
+            yield frame, resultado
+
+    cola = queue.Queue(maxsize=cola_max)
+    parar = threading.Event()
+    hilo = threading.Thread(target=_productor, args=(cap, lote, cada, cola, parar, metricas, caidas),
+                            name="DecodificadorLotes", daemon=True)
+    hilo.start()
+
+    numero = 0
+    try:
+        while True:
+            grupo = cola.get()
+            if grupo is _FIN:
+                return
+            frames = [f for f, inferir, _ in grupo if inferir]
+            resultados = model(frames, **kwargs) if frames else []
+            if metricas is not None:
+                for resultado in resultados:
+                    metricas.observar_resultado(resultado)
+            resultados = iter(resultados)
+            for frame, inferir, t_frame in grupo:
+                numero += 1
+                resultado = next(resultados) if inferir else None
+                if caidas is not None and resultado is not None:
+                    caidas.revisar(resultado, t_frame, numero)
+                if metricas is not None:
+                    metricas.t_frame = t_frame
+                yield frame, resultado
+    finally:
+        # Si el consumidor corta antes (tecla Q), liberar al productor
+        parar.set()
+        while hilo.is_alive():
+            try:
+                cola.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        hilo.join()
+
+
+def medir_fps(model, video_path, lote=1, max_frames=300, **kwargs):
+    """Procesa hasta max_frames del video y devuelve los FPS obtenidos"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"No se puede abrir el video: {video_path}")
+
+    frames = 0
+    inicio = time.perf_counter()
+    for _ in iterar_resultados(cap, model, lote=lote, **kwargs):
+        frames += 1
+        if max_frames and frames >= max_frames:
+            break
+    segundos = time.perf_counter() - inicio
+    cap.release()
+    return frames / segundos if segundos > 0 else 0.0
+
+
+def comparar_con_secuencial(model, video_path, lote=8, max_frames=300, **kwargs):
+    """Compara FPS del modo frame a frame contra el modo por lotes en el mismo clip"""
+    print(f"\n⏱️  Comparando sobre {max_frames} frames de {video_path}")
+    fps_simple = medir_fps(model, video_path, lote=1, max_frames=max_frames, **kwargs)
+    print(f"   Frame a frame:  {fps_simple:6.2f} FPS")
+    fps_lote = medir_fps(model, video_path, lote=lote, max_frames=max_frames, **kwargs)
+    print(f"   Lotes de {lote:<3d}:   {fps_lote:6.2f} FPS")
+    if fps_simple > 0:
+        print(f"   Aceleración:    {fps_lote / fps_simple:.2f}x")
+    return {'fps_frame_a_frame': fps_simple, 'fps_lotes': fps_lote, 'lote': lote}
+
+
+if __name__ == "__main__":
+    import argparse
+    from modelos import obtener_modelo
+
+    parser = argparse.ArgumentParser(description="Benchmark del modo por lotes")
+    parser.add_argument("modelo")
+    parser.add_argument("video")
+    parser.add_argument("--lote", type=int, default=8)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    args = parser.parse_args()
+
+    modelo = obtener_modelo(args.modelo, imgsz=args.imgsz)
+    comparar_con_secuencial(modelo, args.video, lote=args.lote, max_frames=args.frames,
+                            imgsz=args.imgsz, conf=args.conf)
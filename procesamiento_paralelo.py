@@ -0,0 +1,230 @@
+"""
+Procesamiento paralelo de videos largos por segmentos
+El video se divide en tramos de frames (búsqueda con CAP_PROP_POS_FRAMES);
+cada tramo va a un proceso con su propia instancia del modelo y al final se
+combinan los contadores y los videos anotados en un único reporte/archivo.
+Cada trabajador usa el mismo modelo que el modo secuencial (backend y
+ROI/mosaico) y, si se pide, el EPP por persona seguida; los tracks no
+cruzan segmentos, así que una persona en el corte cuenta en ambos tramos.
+"""
+
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from evaluacion_epp import FiltroClases, cargar_info_clases
+
+
+# Modelo del proceso trabajador (uno por proceso)
+_MODELO = None
+
+
+def dividir_segmentos(total_frames, partes):
+    """Divide [0, total_frames) en 'partes' tramos contiguos (inicio, fin)"""
+    partes = max(1, min(partes, total_frames))
+    base, resto = divmod(total_frames, partes)
+    segmentos = []
+    inicio = 0
+    for i in range(partes):
+        fin = inicio + base + (1 if i < resto else 0)
+        segmentos.append((inicio, fin))
+        inicio = fin
+    return segmentos
+
+
+def _inicializar_worker(model_path, imgsz, hilos, backend='ultralytics', ruta_roi=None):
+    """Carga el modelo (con su ROI/mosaico) una sola vez por proceso y limita los hilos de torch"""
+    global _MODELO
+    try:
+        import torch
+        torch.set_num_threads(hilos)
+    except Exception:
+        pass
+    cv2.setNumThreads(1)
+    from modelos import obtener_modelo
+    from roi import cargar_config, envolver_modelo
+    _MODELO = envolver_modelo(obtener_modelo(model_path, imgsz=imgsz, backend=backend),
+                              cargar_config(ruta_roi))
+
+
+def _procesar_segmento(tarea):
+    """Procesa un tramo del video dentro de un proceso trabajador"""
+    indice, video_path, inicio, fin, clases_objetivo, conf, imgsz, ruta_salida, por_persona = tarea
+
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, inicio)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    writer = None
+    if ruta_salida:
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        writer = cv2.VideoWriter(ruta_salida, fourcc, fps, (width, height))
+
+    # EPP exigido por persona seguida (como _procesar_video de MenuEPP)
+    evaluador = None
+    if clases_objetivo and por_persona:
+        from asociacion_epp import AsociadorEPP, detecciones_de_resultado
+        from seguimiento import EvaluadorPorTrack
+        epp = cargar_info_clases()['epp_classes']
+        requeridos = [c for c in clases_objetivo if c in epp]
+        if requeridos:
+            evaluador = EvaluadorPorTrack(AsociadorEPP(_MODELO.names, requeridos))
+    ids_extra = list(evaluador.asociador.ids_necesarios) if evaluador else []
+
+    filtro = FiltroClases.desde_modelo(_MODELO, clases_objetivo, ids_extra)
+    conteos_totales = np.zeros(filtro.num_clases, dtype=np.int64)
+    frames = 0
+    todas_detectadas_count = 0
+    t0 = time.perf_counter()
+
+    while inicio + frames < fin:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames += 1
+        resultado = _MODELO(frame, conf=conf, imgsz=imgsz, classes=filtro.classes,
+                            verbose=False)[0]
+        conteos, _, todas = filtro.evaluar(resultado)
+        conteos_totales += conteos
+        if evaluador:
+            evaluador.procesar(*detecciones_de_resultado(resultado))
+            todas = todas and evaluador.decision()[0]
+        todas_detectadas_count += todas
+        if writer:
+            writer.write(resultado.plot())
+
+    cap.release()
+    if writer:
+        writer.release()
+
+    return {
+        'indice': indice,
+        'inicio': inicio,
+        'frames': frames,
+        'detecciones': filtro.a_diccionario(conteos_totales),
+        'todas_detectadas_count': todas_detectadas_count,
+        'conteo_personas': evaluador.conteo_unico() if evaluador else {},
+        'segundos': time.perf_counter() - t0,
+        'ruta': ruta_salida,
+    }
+
+
+def unir_videos(rutas, salida, fps, tamano):
+    """Concatena los videos de los segmentos (ffmpeg sin recodificar si está disponible)"""
+    rutas = [r for r in rutas if r and Path(r).exists()]
+    if not rutas:
+        return None
+
+    if shutil.which("ffmpeg"):
+        lista = Path(salida).with_suffix(".txt")
+        lista.write_text("".join(f"file '{Path(r).resolve()}'\n" for r in rutas))
+        cmd = ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+               "-i", str(lista), "-c", "copy", str(salida)]
+        ok = subprocess.run(cmd).returncode == 0
+        lista.unlink()
+        if ok:
+            return salida
+
+    # Alternativa: recodificar con OpenCV
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    writer = cv2.VideoWriter(str(salida), fourcc, fps, tamano)
+    for ruta in rutas:
+        cap = cv2.VideoCapture(ruta)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            writer.write(frame)
+        cap.release()
+    writer.release()
+    return salida
+
+
+def procesar_video_paralelo(model_path, video_path, clases_objetivo=None, conf=0.25,
+                            imgsz=640, procesos=None, salida=None, backend='ultralytics',
+                            ruta_roi=None, por_persona=False):
+    """Procesa un video repartiendo tramos entre varios procesos
+
+    Args:
+        model_path: ruta del modelo (cada proceso carga su propia instancia)
+        video_path: video de entrada
+        clases_objetivo: lista de clases a contar (None = todas)
+        procesos: número de procesos (None = núcleos disponibles)
+        salida: ruta del video anotado combinado (None = no guardar)
+        backend: backend de obtener_modelo ('ultralytics' / 'onnxruntime')
+        ruta_roi: configuración de ROI/mosaico (None = frame completo)
+        por_persona: exigir el EPP de clases_objetivo a cada persona seguida
+
+    Returns:
+        dict con frames, detecciones_totales, todas_detectadas_count,
+        conteo_personas (por segmento, sumado), segundos, fps y la ruta de salida
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"No se puede abrir el video: {video_path}")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    tamano = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    cap.release()
+    if total_frames <= 0:
+        raise RuntimeError("El video no informa su número de frames; no se puede segmentar")
+
+    procesos = procesos or os.cpu_count() or 1
+    segmentos = dividir_segmentos(total_frames, procesos)
+    hilos = max(1, (os.cpu_count() or 1) // len(segmentos))
+
+    print(f"🧩 {len(segmentos)} segmentos | {len(segmentos)} procesos x {hilos} hilo(s)")
+
+    temporal = tempfile.mkdtemp(prefix="epp_segmentos_")
+    tareas = []
+    for i, (inicio, fin) in enumerate(segmentos):
+        ruta = os.path.join(temporal, f"segmento_{i:03d}.mp4") if salida else None
+        tareas.append((i, video_path, inicio, fin, clases_objetivo, conf, imgsz, ruta, por_persona))
+
+    t0 = time.perf_counter()
+    resultados = []
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(segmentos), mp_context=contexto,
+                             initializer=_inicializar_worker,
+                             initargs=(model_path, imgsz, hilos, backend, ruta_roi)) as pool:
+        for r in pool.map(_procesar_segmento, tareas):
+            print(f"   ✓ Segmento {r['indice'] + 1}/{len(segmentos)}: "
+                  f"{r['frames']} frames en {r['segundos']:.1f}s")
+            resultados.append(r)
+    segundos = time.perf_counter() - t0
+
+    # Combinar reportes
+    detecciones_totales = {}
+    conteo_personas = {}
+    for r in resultados:
+        for clase, n in r['detecciones'].items():
+            detecciones_totales[clase] = detecciones_totales.get(clase, 0) + n
+        for clase, n in r['conteo_personas'].items():
+            conteo_personas[clase] = conteo_personas.get(clase, 0) + n
+    frames = sum(r['frames'] for r in resultados)
+
+    if salida:
+        unir_videos([r['ruta'] for r in resultados], salida, fps, tamano)
+    shutil.rmtree(temporal, ignore_errors=True)
+
+    return {
+        'frames': frames,
+        'total_frames': total_frames,
+        'detecciones_totales': detecciones_totales,
+        'todas_detectadas_count': sum(r['todas_detectadas_count'] for r in resultados),
+        'conteo_personas': conteo_personas,
+        'segundos': segundos,
+        'fps': frames / segundos if segundos > 0 else 0.0,
+        'procesos': len(segmentos),
+        'salida': salida,
+    }
@@ -0,0 +1,82 @@
+"""
+Etapa de renderizado opcional
+Dibujar el frame anotado sólo tiene sentido si alguien lo va a ver: una
+ventana, un video de salida o una captura de evento. Sin ninguno de esos
+destinos el pipeline corre sin dibujar. Cuando sí hace falta, se dibuja
+sobre un buffer reutilizado en lugar de crear una copia anotada por frame.
+"""
+
+import cv2
+import numpy as np
+
+from asociacion_epp import detecciones_de_resultado
+
+
+def _paleta(n=64):
+    """Color BGR fijo por id de clase"""
+    k = np.arange(n)
+    return np.stack([(37 * k) % 255, (17 * k + 80) % 255, (97 * k + 160) % 255], axis=1).tolist()
+
+
+PALETA = _paleta()
+
+
+def dibujar_detecciones(destino, xyxy, cls, conf, names, grosor=2):
+    """Dibuja cajas y etiquetas sobre destino (in-place)"""
+    for (x1, y1, x2, y2), k, c in zip(xyxy.astype(np.int32).tolist(), cls.tolist(), conf.tolist()):
+        color = PALETA[int(k) % len(PALETA)]
+        cv2.rectangle(destino, (x1, y1), (x2, y2), color, grosor)
+        cv2.putText(destino, f"{names.get(int(k), k)} {c:.2f}", (x1, max(12, y1 - 5)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+    return destino
+
+
+class Renderizador:
+    """Renderiza sólo si hay un destino que consuma el frame anotado
+
+    Args:
+        mostrar: hay ventana de visualización
+        guardar: hay un video de salida
+        names: dict id -> nombre (None = el del resultado)
+    """
+
+    def __init__(self, mostrar=False, guardar=False, names=None):
+        self.mostrar = mostrar
+        self.guardar = guardar
+        self.names = names
+        self._buffer = None
+        self.renderizados = 0
+        self.omitidos = 0
+
+    @property
+    def activo(self):
+        """Algún destino continuo (ventana o video) necesita el frame anotado"""
+        return self.mostrar or self.guardar
+
+    def dibujar(self, frame, resultado=None):
+        """Copia el frame al buffer reutilizado y dibuja las detecciones encima
+
+        El array devuelto es válido hasta la siguiente llamada.
+        """
+        if self._buffer is None or self._buffer.shape != frame.shape:
+            self._buffer = np.empty_like(frame)
+        np.copyto(self._buffer, frame)
+        if resultado is not None:
+            names = self.names or resultado.names
+            dibujar_detecciones(self._buffer, *detecciones_de_resultado(resultado), names)
+        self.renderizados += 1
+        return self._buffer
+
+    def procesar(self, frame, resultado=None):
+        """dibujar() si hay destino activo; si no, None (sin costo de dibujo)"""
+        if not self.activo:
+            self.omitidos += 1
+            return None
+        return self.dibujar(frame, resultado)
+
+    def capturar(self, ruta, frame, resultado=None, anotado=None):
+        """Captura de evento: guarda el frame anotado aunque no haya otros destinos"""
+        if anotado is None:
+            anotado = self.dibujar(frame, resultado)
+        cv2.imwrite(str(ruta), anotado)
+        return ruta
@@ -0,0 +1,247 @@
+"""
+Regiones de interés y detección por mosaico
+Para el control de acceso sólo importa la zona frente a la puerta: se
+infiere únicamente sobre la caja envolvente de cada polígono (a un imgsz
+menor) y las cajas se devuelven en coordenadas del frame completo. Para
+cámaras gran angular con trabajadores pequeños hay un modo mosaico estilo
+SAHI (tiles con solape + NMS global).
+"""
+
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from asociacion_epp import detecciones_de_resultado
+from backend_onnx import CajasONNX, ResultadoONNX, nms
+
+
+# Configuración compartida por los menús (si no existe se usa el frame completo)
+RUTA_CONFIG = "roi_puerta.json"
+
+
+class RegionInteres:
+    """Polígono de interés
+
+    Args:
+        puntos: [(x, y), ...] en píxeles o normalizados (0-1)
+        nombre: identificador de la región
+        margen: fracción extra alrededor de la caja envolvente (contexto para el detector)
+    """
+
+    def __init__(self, puntos, nombre="roi", margen=0.05):
+        self.puntos = np.asarray(puntos, dtype=np.float32).reshape(-1, 2)
+        if len(self.puntos) < 3:
+            raise ValueError(f"La región '{nombre}' necesita al menos 3 puntos")
+        self.nombre = nombre
+        self.margen = margen
+        self.normalizado = bool(self.puntos.max() <= 1.0)
+
+    def poligono(self, forma):
+        """Vértices en píxeles para un frame de forma (alto, ancho)"""
+        if not self.normalizado:
+            return self.puntos
+        h, w = forma[:2]
+        return self.puntos * np.array([w, h], dtype=np.float32)
+
+    def caja(self, forma):
+        """Caja envolvente (x1, y1, x2, y2) con margen, recortada al frame"""
+        h, w = forma[:2]
+        pol = self.poligono(forma)
+        x1, y1 = pol.min(axis=0)
+        x2, y2 = pol.max(axis=0)
+        mx, my = (x2 - x1) * self.margen, (y2 - y1) * self.margen
+        return (int(max(0, x1 - mx)), int(max(0, y1 - my)),
+                int(min(w, np.ceil(x2 + mx))), int(min(h, np.ceil(y2 + my))))
+
+    def contiene(self, puntos, forma):
+        """Punto en polígono vectorizado (ray casting) para N puntos → N bools"""
+        pol = self.poligono(forma)
+        x, y = puntos[:, 0, None], puntos[:, 1, None]
+        xa, ya = pol[None, :, 0], pol[None, :, 1]
+        xb, yb = np.roll(pol[:, 0], -1)[None, :], np.roll(pol[:, 1], -1)[None, :]
+        cruza = (ya > y) != (yb > y)
+        x_corte = xa + (y - ya) * (xb - xa) / np.where(yb == ya, 1e-9, yb - ya)
+        return ((cruza & (x < x_corte)).sum(axis=1) % 2) == 1
+
+    def dibujar(self, frame, color=(255, 200, 0)):
+        cv2.polylines(frame, [self.poligono(frame.shape).astype(np.int32)], True, color, 2)
+
+
+def cajas_mosaico(forma, filas=2, columnas=2, solape=0.2):
+    """Tiles (x1, y1, x2, y2) que cubren el frame con el solape indicado"""
+    h, w = forma[:2]
+    ancho = int(np.ceil(w / (columnas - (columnas - 1) * solape)))
+    alto = int(np.ceil(h / (filas - (filas - 1) * solape)))
+    xs = np.linspace(0, w - ancho, columnas).astype(int) if columnas > 1 else [0]
+    ys = np.linspace(0, h - alto, filas).astype(int) if filas > 1 else [0]
+    return [(int(x), int(y), int(min(w, x + ancho)), int(min(h, y + alto))) for y in ys for x in xs]
+
+
+class DetectorRecortes:
+    """Envuelve un modelo para inferir sólo sobre recortes del frame
+
+    Con regiones: un recorte por caja envolvente de cada polígono y sólo se
+    conservan las detecciones cuyo centro cae dentro de algún polígono. Con
+    mosaico: tiles solapados (más el frame completo si incluir_completo) y
+    NMS global para unir las cajas repetidas en los bordes.
+
+    Se usa igual que el modelo: detector(frame, conf=..., classes=...) → [resultado]
+
+    Args:
+        model: modelo YOLO o DetectorONNX
+        regiones: lista de RegionInteres
+        mosaico: (filas, columnas) o None
+        imgsz: tamaño de inferencia de cada recorte (None = el que se pase en la llamada)
+        solape: solape entre tiles del mosaico
+        incluir_completo: añadir el frame completo a los tiles (objetos grandes)
+        iou_fusion: IoU del NMS que une detecciones de recortes distintos
+    """
+
+    def __init__(self, model, regiones=None, mosaico=None, imgsz=None, solape=0.2,
+                 incluir_completo=False, iou_fusion=0.5):
+        if not regiones and not mosaico:
+            raise ValueError("Indica regiones o mosaico")
+        self.model = model
+        self.regiones = regiones or []
+        self.mosaico = mosaico
+        self.imgsz = imgsz
+        self.solape = solape
+        self.incluir_completo = incluir_completo
+        self.iou_fusion = iou_fusion
+        self._forma = None
+        self._recortes = []
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def recortes(self, forma):
+        """Cajas a inferir para un frame de esta forma (en caché por resolución)"""
+        if forma[:2] != self._forma:
+            self._forma = forma[:2]
+            if self.regiones:
+                self._recortes = [r.caja(forma) for r in self.regiones]
+            else:
+                self._recortes = cajas_mosaico(forma, *self.mosaico, self.solape)
+                if self.incluir_completo:
+                    self._recortes.append((0, 0, forma[1], forma[0]))
+        return self._recortes
+
+    def __call__(self, fuente, imgsz=None, **kwargs):
+        frames = fuente if isinstance(fuente, (list, tuple)) else [fuente]
+        imgsz = self.imgsz or imgsz
+        if imgsz:
+            kwargs['imgsz'] = imgsz
+        return [self._detectar(frame, **kwargs) for frame in frames]
+
+    def _detectar(self, frame, **kwargs):
+        t0 = time.perf_counter()
+        cajas = self.recortes(frame.shape)
+        # Vistas del frame: sin copias, el letterbox del modelo las redimensiona
+        parciales = self.model([frame[y1:y2, x1:x2] for x1, y1, x2, y2 in cajas], **kwargs)
+
+        xyxy, cls, conf = [], [], []
+        for (x1, y1, _, _), resultado in zip(cajas, parciales):
+            b, c, p = detecciones_de_resultado(resultado)
+            xyxy.append(b + np.array([x1, y1, x1, y1], dtype=np.float32))
+            cls.append(c)
+            conf.append(p)
+        xyxy = np.concatenate(xyxy) if xyxy else np.zeros((0, 4), dtype=np.float32)
+        cls = np.concatenate(cls).astype(np.intp) if cls else np.zeros(0, dtype=np.intp)
+        conf = np.concatenate(conf) if conf else np.zeros(0, dtype=np.float32)
+
+        if self.regiones and len(xyxy):
+            centros = (xyxy[:, :2] + xyxy[:, 2:]) * 0.5
+            dentro = np.zeros(len(xyxy), dtype=bool)
+            for region in self.regiones:
+                dentro |= region.contiene(centros, frame.shape)
+            xyxy, cls, conf = xyxy[dentro], cls[dentro], conf[dentro]
+
+        if len(cajas) > 1 and len(xyxy):
+            # NMS por clase: desplazar cada clase a su propia región del plano
+            conservar = nms(xyxy + (cls * 8192.0)[:, None].astype(np.float32), conf, self.iou_fusion)
+            xyxy, cls, conf = xyxy[conservar], cls[conservar], conf[conservar]
+
+        speed = {'preprocess': 0.0, 'inference': 0.0, 'postprocess': 0.0}
+        for resultado in parciales:
+            for etapa in speed:
+                speed[etapa] += getattr(resultado, 'speed', {}).get(etapa) or 0.0
+        speed['total'] = (time.perf_counter() - t0) * 1000
+        return ResultadoONNX(frame, CajasONNX(xyxy, conf, cls), self.names, speed)
+
+    def dibujar(self, frame):
+        """Dibuja los polígonos (o los tiles) sobre el frame anotado"""
+        if self.regiones:
+            for region in self.regiones:
+                region.dibujar(frame)
+        else:
+            for x1, y1, x2, y2 in self.recortes(frame.shape):
+                cv2.rectangle(frame, (x1, y1), (x2 - 1, y2 - 1), (255, 200, 0), 1)
+
+
+def cargar_config(ruta=RUTA_CONFIG):
+    """Lee la configuración de ROI/mosaico (None si no existe)
+
+    Formato:
+        {"regiones": [{"nombre": "puerta", "puntos": [[0.3, 0.2], [0.7, 0.2], [0.7, 1.0], [0.3, 1.0]]}],
+         "imgsz": 416}
+        o {"mosaico": {"filas": 2, "columnas": 3, "solape": 0.2, "incluir_completo": false}, "imgsz": 640}
+    """
+    if not ruta or not Path(ruta).exists():
+        return None
+    with open(ruta, 'r') as f:
+        return json.load(f)
+
+
+def envolver_modelo(model, config):
+    """Devuelve un DetectorRecortes según la configuración, o el modelo tal cual"""
+    if not config:
+        return model
+    if config.get('regiones'):
+        regiones = [RegionInteres(r['puntos'], r.get('nombre', f"roi{i}"), r.get('margen', 0.05))
+                    for i, r in enumerate(config['regiones'])]
+        return DetectorRecortes(model, regiones=regiones, imgsz=config.get('imgsz'))
+    if config.get('mosaico'):
+        m = config['mosaico']
+        return DetectorRecortes(model, mosaico=(m.get('filas', 2), m.get('columnas', 2)),
+                                imgsz=config.get('imgsz'), solape=m.get('solape', 0.2),
+                                incluir_completo=m.get('incluir_completo', False))
+    return model
+
+
+def comparar_fps(model, videos, config, imgsz=640, max_frames=300, **kwargs):
+    """FPS del frame completo vs. ROI/mosaico sobre los mismos clips"""
+    from procesamiento_lotes import medir_fps
+
+    recortado = envolver_modelo(model, config)
+    modo = "mosaico" if config.get('mosaico') else "ROI"
+    tabla = []
+    for video in videos:
+        completo = medir_fps(model, video, max_frames=max_frames, imgsz=imgsz, **kwargs)
+        parcial = medir_fps(recortado, video, max_frames=max_frames, imgsz=imgsz, **kwargs)
+        tabla.append({'video': str(video), 'fps_completo': completo, f'fps_{modo.lower()}': parcial})
+        print(f"   {Path(video).name:<30} completo {completo:6.2f} FPS | {modo} {parcial:6.2f} FPS"
+              f" | {parcial / completo if completo else 0:.2f}x")
+    return tabla
+
+
+if __name__ == "__main__":
+    import argparse
+    from modelos import obtener_modelo
+
+    parser = argparse.ArgumentParser(description="Benchmark de ROI / mosaico contra el frame completo")
+    parser.add_argument("modelo")
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--config", default=RUTA_CONFIG, help="JSON con regiones o mosaico")
+    parser.add_argument("--imgsz", type=int, default=640, help="imgsz del frame completo")
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    configuracion = cargar_config(args.config)
+    if not configuracion:
+        parser.error(f"No existe la configuración {args.config}")
+    modelo = obtener_modelo(args.modelo, imgsz=args.imgsz)
+    comparar_fps(modelo, args.videos, configuracion, imgsz=args.imgsz, max_frames=args.frames)
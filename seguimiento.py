@@ -0,0 +1,243 @@
+"""
+Seguimiento de personas entre frames
+Rastreador ligero por IoU estilo ByteTrack (dos pasadas: detecciones de
+confianza alta y luego baja) con predicción a velocidad constante. Cada
+track guarda su veredicto de EPP, que sólo se recalcula cuando el track es
+nuevo, cambia mucho de tamaño o el veredicto envejece.
+"""
+
+import numpy as np
+
+from asociacion_epp import iou
+
+
+class Track:
+    """Persona seguida entre frames"""
+
+    def __init__(self, id_track, caja, frame):
+        self.id = id_track
+        self.caja = np.asarray(caja, dtype=np.float32)
+        self.velocidad = np.zeros(4, dtype=np.float32)
+        self.hits = 1
+        self.perdidos = 0
+        self.primer_frame = frame
+        self.ultimo_frame = frame
+        self.indice = -1            # Índice de la detección asociada en el frame actual
+
+        # Veredicto de EPP en caché
+        self.veredicto = None       # True cumple / False no cumple / None sin evaluar
+        self.faltantes = []
+        self.frame_veredicto = None
+        self.area_veredicto = None
+        self.alertado = False
+        self.clases_vistas = set()
+        self.clases_contadas = set()    # Ya sumadas a EvaluadorPorTrack.conteo_clases
+
+    @property
+    def area(self):
+        return float(max(0.0, self.caja[2] - self.caja[0]) * max(0.0, self.caja[3] - self.caja[1]))
+
+    def predecir(self):
+        self.caja = self.caja + self.velocidad
+
+    def actualizar(self, caja, frame, suavizado=0.6):
+        caja = np.asarray(caja, dtype=np.float32)
+        self.velocidad = suavizado * (caja - self.caja) + (1 - suavizado) * self.velocidad
+        self.caja = caja
+        self.hits += 1
+        self.perdidos = 0
+        self.ultimo_frame = frame
+
+
+def _emparejar(cajas_tracks, cajas_det, umbral):
+    """Emparejamiento voraz por IoU descendente → [(i_track, j_det)]"""
+    if len(cajas_tracks) == 0 or len(cajas_det) == 0:
+        return []
+    matriz = iou(cajas_tracks, cajas_det)
+    pares = []
+    while True:
+        i, j = np.unravel_index(np.argmax(matriz), matriz.shape)
+        if matriz[i, j] < umbral:
+            return pares
+        pares.append((int(i), int(j)))
+        matriz[i, :] = -1
+        matriz[:, j] = -1
+
+
+class RastreadorPersonas:
+    """Asigna IDs persistentes a las cajas de persona
+
+    Args:
+        umbral_iou: IoU mínimo para continuar un track
+        conf_alta: detecciones por encima crean tracks; las de abajo sólo continúan
+        max_perdidos: frames sin detección antes de eliminar un track
+        min_hits: frames con detección para considerar confirmado un track
+    """
+
+    def __init__(self, umbral_iou=0.3, conf_alta=0.5, max_perdidos=30, min_hits=2):
+        self.umbral_iou = umbral_iou
+        self.conf_alta = conf_alta
+        self.max_perdidos = max_perdidos
+        self.min_hits = min_hits
+        self.tracks = []
+        self.personas_unicas = 0    # Tracks que llegaron a min_hits (los eliminados no se guardan)
+        self._siguiente_id = 1
+        self.frame = 0
+
+    def actualizar(self, cajas, confianzas=None):
+        """Procesa las cajas de persona de un frame y devuelve los tracks vistos en él"""
+        self.frame += 1
+        cajas = np.asarray(cajas, dtype=np.float32).reshape(-1, 4)
+        if confianzas is None:
+            confianzas = np.ones(len(cajas), dtype=np.float32)
+        confianzas = np.asarray(confianzas, dtype=np.float32)
+
+        for t in self.tracks:
+            t.predecir()
+            t.indice = -1
+
+        altas = np.flatnonzero(confianzas >= self.conf_alta)
+        bajas = np.flatnonzero(confianzas < self.conf_alta)
+
+        # Pasada 1: detecciones de confianza alta contra todos los tracks
+        libres = list(range(len(self.tracks)))
+        usadas = set()
+        for i, j in _emparejar(self._cajas(libres), cajas[altas], self.umbral_iou):
+            self._continuar(self.tracks[libres[i]], cajas, altas[j])
+            usadas.add(int(altas[j]))
+
+        # Pasada 2: detecciones de confianza baja sólo continúan tracks existentes
+        libres = [k for k, t in enumerate(self.tracks) if t.indice < 0]
+        for i, j in _emparejar(self._cajas(libres), cajas[bajas], self.umbral_iou):
+            self._continuar(self.tracks[libres[i]], cajas, bajas[j])
+
+        # Tracks nuevos a partir de detecciones altas sin emparejar
+        for d in altas:
+            if int(d) in usadas:
+                continue
+            t = Track(self._siguiente_id, cajas[d], self.frame)
+            t.indice = int(d)
+            self._siguiente_id += 1
+            self.tracks.append(t)
+            if t.hits >= self.min_hits:
+                self.personas_unicas += 1
+
+        # Envejecer y eliminar tracks perdidos
+        for t in self.tracks:
+            if t.indice < 0:
+                t.perdidos += 1
+        self.tracks = [t for t in self.tracks if t.perdidos <= self.max_perdidos]
+
+        return [t for t in self.tracks if t.indice >= 0]
+
+    def confirmados(self):
+        return [t for t in self.tracks if t.indice >= 0 and t.hits >= self.min_hits]
+
+    def _cajas(self, indices):
+        if not indices:
+            return np.zeros((0, 4), dtype=np.float32)
+        return np.stack([self.tracks[k].caja for k in indices])
+
+    def _continuar(self, track, cajas, d):
+        track.actualizar(cajas[d], self.frame)
+        if track.hits == self.min_hits:
+            self.personas_unicas += 1
+        track.indice = int(d)
+
+
+class EvaluadorPorTrack:
+    """Veredictos de EPP por persona seguida, con caché
+
+    La asociación EPP↔persona sólo se ejecuta en los frames donde algún
+    track lo necesita (nuevo, cambio de tamaño o veredicto viejo).
+
+    Args:
+        asociador: AsociadorEPP
+        rastreador: RastreadorPersonas (se crea uno por defecto)
+        max_edad_veredicto: frames tras los que se reevalúa un track
+        cambio_tamano: razón de área que fuerza reevaluación
+    """
+
+    def __init__(self, asociador, rastreador=None, max_edad_veredicto=15, cambio_tamano=1.5):
+        self.asociador = asociador
+        self.rastreador = rastreador or RastreadorPersonas()
+        self.max_edad_veredicto = max_edad_veredicto
+        self.cambio_tamano = cambio_tamano
+        self.evaluaciones = 0
+        self.frames = 0
+        self.conteo_clases = {}     # clase -> personas únicas (confirmadas) en las que se vio
+
+    def necesita_evaluar(self, track):
+        if track.veredicto is None:
+            return True
+        if self.rastreador.frame - track.frame_veredicto >= self.max_edad_veredicto:
+            return True
+        razon = track.area / max(track.area_veredicto, 1e-9)
+        return razon > self.cambio_tamano or razon < 1.0 / self.cambio_tamano
+
+    def procesar(self, xyxy, cls, conf=None):
+        """Actualiza tracks y veredictos para un frame
+
+        Returns:
+            (tracks, nuevas_alertas): tracks vistos en el frame y los tracks
+            que acaban de pasar a "no cumple" (una alerta por persona)
+        """
+        self.frames += 1
+        es_persona = cls == self.asociador.id_persona
+        idx_personas = np.flatnonzero(es_persona)
+        tracks = self.rastreador.actualizar(
+            xyxy[idx_personas], None if conf is None else conf[idx_personas])
+
+        pendientes = [t for t in tracks if self.necesita_evaluar(t)]
+        alertas = []
+        if pendientes:
+            self.evaluaciones += 1
+            asociacion = self.asociador.evaluar(xyxy, cls)
+            # Las personas de la asociación están en el mismo orden que idx_personas
+            for t in pendientes:
+                p = t.indice
+                t.veredicto = bool(asociacion.persona_ok[p])
+                t.faltantes = [self.asociador.requeridos[k]
+                               for k in np.flatnonzero(~asociacion.cumple[p])]
+                t.frame_veredicto = self.rastreador.frame
+                t.area_veredicto = t.area
+                t.clases_vistas.update(self.asociador.requeridos[k]
+                                       for k in np.flatnonzero(asociacion.tiene[p]))
+                t.clases_vistas.update(f"NO-{self.asociador.requeridos[k]}"
+                                       for k in np.flatnonzero(asociacion.viola[p]))
+                if not t.veredicto and not t.alertado:
+                    t.alertado = True
+                    alertas.append(t)
+                elif t.veredicto:
+                    t.alertado = False
+
+        # Clases por persona única: sólo tracks confirmados, cada clase una vez
+        for t in tracks:
+            if t.hits >= self.rastreador.min_hits and len(t.clases_vistas) > len(t.clases_contadas):
+                for clase in t.clases_vistas - t.clases_contadas:
+                    self.conteo_clases[clase] = self.conteo_clases.get(clase, 0) + 1
+                t.clases_contadas |= t.clases_vistas
+        return tracks, alertas
+
+    def decision(self):
+        """Acceso: hay al menos una persona confirmada y todas cumplen"""
+        confirmados = self.rastreador.confirmados()
+        if not confirmados:
+            return False, []
+        faltantes = []
+        for t in confirmados:
+            for f in t.faltantes:
+                if f not in faltantes:
+                    faltantes.append(f)
+        return all(t.veredicto for t in confirmados), faltantes
+
+    def conteo_unico(self):
+        """Personas únicas por clase (cada track confirmado cuenta una vez)
+
+        Incluye Person y cada EPP requerido con su NO-, en 0 si no se vio.
+        """
+        conteo = {'Person': self.rastreador.personas_unicas}
+        for clase in self.asociador.requeridos:
+            conteo[clase] = self.conteo_clases.get(clase, 0)
+            conteo[f"NO-{clase}"] = self.conteo_clases.get(f"NO-{clase}", 0)
+        return conteo
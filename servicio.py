@@ -0,0 +1,207 @@
+"""
+Punto de entrada sin menú para producción (systemd)
+Lee un archivo de configuración JSON y ejecuta el pipeline de control de
+acceso de forma continua, sin input(). SIGTERM / SIGINT terminan de forma
+ordenada (actuadores detenidos y GPIO.cleanup()). Los módulos pesados
+(cv2, numpy, ultralytics, onnxruntime) se importan recién al arrancar el
+pipeline, de modo que --check / --generar-config son instantáneos.
+
+Ejemplo de unidad systemd (/etc/systemd/system/epp.service):
+
+    [Service]
+    WorkingDirectory=/opt/eppia
+    ExecStart=/usr/bin/python3 servicio.py /etc/eppia/servicio.json
+    Restart=on-failure
+    RestartSec=5
+    KillSignal=SIGTERM
+    TimeoutStopSec=15
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+
+
+log = logging.getLogger("eppia")
+
+
+# Mapa de pines por defecto (el mismo de MenuEPP.__init__)
+CONFIG_POR_DEFECTO = {
+    "modelo": "best.pt",
+    "backend": "ultralytics",
+    "motor": None,              # "engine" / {"formato": "engine", "precision": "fp16"} (cache_motores.py)
+    "imgsz": 640,
+    "conf": 0.35,
+    "requeridos": ["Hardhat", "Safety Vest"],
+    "mock": False,
+    "mostrar": False,
+    "intervalo_stats": 60,
+    "metricas_puerto": 9108,    # /metrics en formato Prometheus (None = sin endpoint)
+    "eventos_bd": "eventos_epp.db",     # SQLite WAL con detecciones/decisiones/infracciones (None = no guardar)
+    "roi": None,
+    "acceso": {"frames_para_permitir": 5, "tiempo_min_abierto": 3.0, "tiempo_cierre": 1.0},
+    "flujos": [
+        {
+            "nombre": "puerta",
+            "fuente": 0,
+            "hardware": {
+                "servo_pin": 33,
+                "pines_detectado": [17, 18, 27, 22],
+                "pines_no_detectado": [23, 24, 25, 5],
+                "lcd_address": 0x27,
+            },
+        }
+    ],
+}
+
+
+def cargar_config(ruta):
+    """Lee el JSON y completa las claves faltantes con los valores por defecto"""
+    with open(ruta, 'r') as f:
+        config = json.load(f)
+    completa = dict(CONFIG_POR_DEFECTO)
+    completa.update(config)
+    completa["acceso"] = {**CONFIG_POR_DEFECTO["acceso"], **config.get("acceso", {})}
+    return completa
+
+
+def validar_config(config):
+    """Lista de errores de configuración (vacía si es válida)"""
+    errores = []
+    if not os.path.exists(config["modelo"]):
+        errores.append(f"modelo no encontrado: {config['modelo']}")
+    if config["backend"] not in ("ultralytics", "onnxruntime"):
+        errores.append(f"backend desconocido: {config['backend']}")
+    if not config["flujos"]:
+        errores.append("no hay flujos configurados")
+    for i, flujo in enumerate(config["flujos"]):
+        if "fuente" not in flujo:
+            errores.append(f"flujo {i} sin 'fuente'")
+        hardware = flujo.get("hardware")
+        if isinstance(hardware, dict) and "servo_pin" not in hardware:
+            errores.append(f"flujo {i}: hardware sin 'servo_pin'")
+    roi = config.get("roi")
+    if isinstance(roi, str) and not os.path.exists(roi):
+        errores.append(f"configuración de ROI no encontrada: {roi}")
+    return errores
+
+
+class Servicio:
+    """Pipeline continuo de control de acceso configurado desde un archivo"""
+
+    def __init__(self, config):
+        self.config = config
+        self.servicio = None
+        self._senal = None
+
+    def instalar_senales(self):
+        for sig in (signal.SIGTERM, signal.SIGINT) + ((signal.SIGHUP,) if hasattr(signal, "SIGHUP") else ()):
+            signal.signal(sig, self._manejar_senal)
+
+    def _manejar_senal(self, signum, _frame):
+        self._senal = signum
+        log.info("Señal %s recibida: deteniendo", signal.Signals(signum).name)
+        if self.servicio is not None:
+            self.servicio.solicitar_parada()
+        else:
+            raise SystemExit(0)
+
+    def _modelo(self):
+        # Imports pesados sólo aquí
+        from cache_motores import resolver_modelo
+        from modelos import obtener_modelo
+        from roi import cargar_config as cargar_roi, envolver_modelo
+
+        c = self.config
+        # Motor ya compilado de la caché: un reinicio no reconstruye TensorRT
+        ruta = resolver_modelo(c["modelo"], c["imgsz"], c.get("motor"))
+        log.info("Cargando modelo %s (%s, imgsz=%s)", ruta, c["backend"], c["imgsz"])
+        model = obtener_modelo(ruta, imgsz=c["imgsz"], backend=c["backend"])
+        roi = c.get("roi")
+        return envolver_modelo(model, cargar_roi(roi) if isinstance(roi, str) else roi)
+
+    def ejecutar(self):
+        """Arranca el pipeline y bloquea hasta una señal; devuelve el código de salida"""
+        from metricas import iniciar_servidor
+
+        puerto = self.config.get("metricas_puerto")
+        servidor = iniciar_servidor(puerto) if puerto else None
+        try:
+            return self._pipeline()
+        finally:
+            if servidor is not None:
+                servidor.detener()
+
+    def _pipeline(self):
+        from almacen_eventos import AlmacenEventos
+        from multicamara import Flujo, ServicioMulticamara, crear_hardware
+
+        c = self.config
+        model = self._modelo()
+        flujos = [Flujo(f.get("nombre", f"puerta{i}"), f["fuente"], crear_hardware(f.get("hardware"), c["mock"]))
+                  for i, f in enumerate(c["flujos"])]
+        almacen = AlmacenEventos(c["eventos_bd"]) if c["eventos_bd"] else None
+        self.servicio = ServicioMulticamara(model, flujos, requeridos=c["requeridos"], conf=c["conf"],
+                                            imgsz=c["imgsz"], intervalo_stats=c["intervalo_stats"],
+                                            mostrar=c["mostrar"], almacen=almacen, **c["acceso"])
+        if self._senal is not None:
+            return 0
+        if almacen is not None:
+            almacen.iniciar()
+        self.servicio.iniciar()
+        log.info("Servicio activo: %d puerta(s)", len(self.servicio.flujos))
+        # ejecutar() siempre detiene actuadores y limpia GPIO al salir
+        self.servicio.ejecutar()
+
+        if self._senal is None and self.servicio.fuentes_agotadas:
+            # Se cayeron todas las cámaras: código != 0 para que systemd reinicie
+            log.error("Todas las fuentes de video terminaron")
+            return 1
+        return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio de control de acceso EPP (sin menú)")
+    parser.add_argument("config", help="Archivo JSON de configuración")
+    parser.add_argument("--check", action="store_true", help="Sólo validar la configuración")
+    parser.add_argument("--generar-config", action="store_true",
+                        help="Escribir una configuración por defecto en la ruta indicada")
+    parser.add_argument("--mock", action="store_true", help="Forzar actuadores simulados")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.generar_config:
+        with open(args.config, 'w') as f:
+            json.dump(CONFIG_POR_DEFECTO, f, indent=2)
+        log.info("Configuración por defecto escrita en %s", args.config)
+        return 0
+
+    config = cargar_config(args.config)
+    if args.mock:
+        config["mock"] = True
+    errores = validar_config(config)
+    for error in errores:
+        log.error(error)
+    if errores:
+        return 2
+    if args.check:
+        log.info("Configuración válida")
+        return 0
+
+    servicio = Servicio(config)
+    servicio.instalar_senales()
+    try:
+        return servicio.ejecutar()
+    except Exception:
+        log.exception("Error fatal en el servicio")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
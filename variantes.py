@@ -0,0 +1,249 @@
+"""
+Matriz de exportación y selección automática de la variante del modelo
+Exporta el .pt en varias combinaciones (ONNX estático/dinámico, imgsz,
+FP32/FP16/INT8, OpenVINO y TensorRT donde estén disponibles), mide cada una
+en ESTE equipo con un conjunto fijo de frames y escribe un manifiesto JSON.
+Los menús eligen la variante más rápida que cumple un mAP mínimo.
+"""
+
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+MANIFIESTO = "variantes_modelo.json"
+TAMANOS_POR_DEFECTO = (640, 480, 320)
+
+
+def _disponible(modulo):
+    return importlib.util.find_spec(modulo) is not None
+
+
+def _hay_cuda():
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+def matriz_variantes(tamanos=TAMANOS_POR_DEFECTO, int8=False):
+    """Combinaciones a exportar según lo que soporte este equipo
+
+    Args:
+        tamanos: valores de imgsz
+        int8: incluir ONNX INT8 (requiere videos de calibración)
+    """
+    cuda = _hay_cuda()
+    variantes = []
+    for imgsz in tamanos:
+        for dinamico in (False, True):
+            variantes.append({'formato': 'onnx', 'imgsz': imgsz, 'precision': 'fp32', 'dinamico': dinamico})
+        if cuda:
+            # ultralytics sólo exporta ONNX FP16 con GPU
+            variantes.append({'formato': 'onnx', 'imgsz': imgsz, 'precision': 'fp16', 'dinamico': False})
+        if int8:
+            variantes.append({'formato': 'onnx', 'imgsz': imgsz, 'precision': 'int8', 'dinamico': False})
+        if _disponible('openvino'):
+            for precision in ('fp32', 'fp16'):
+                variantes.append({'formato': 'openvino', 'imgsz': imgsz, 'precision': precision,
+                                  'dinamico': False})
+        if cuda and _disponible('tensorrt'):
+            variantes.append({'formato': 'engine', 'imgsz': imgsz, 'precision': 'fp16', 'dinamico': False})
+    return variantes
+
+
+def _nombre(ruta_pt, variante):
+    forma = 'dyn' if variante['dinamico'] else 'static'
+    sufijo = {'onnx': '.onnx', 'engine': '.engine', 'openvino': '_openvino_model'}[variante['formato']]
+    return f"{Path(ruta_pt).stem}_{variante['imgsz']}_{variante['precision']}_{forma}{sufijo}"
+
+
+def exportar_variante(ruta_pt, variante, carpeta, videos_calibracion=None):
+    """Exporta una variante a la carpeta y devuelve su ruta
+
+    INT8 parte del ONNX FP32 estático del mismo imgsz (cuantizacion.py).
+    """
+    from ultralytics import YOLO
+
+    destino = Path(carpeta) / _nombre(ruta_pt, variante)
+    if destino.exists():
+        return destino
+
+    if variante['precision'] == 'int8':
+        from cuantizacion import cuantizar_int8
+        base = exportar_variante(ruta_pt, dict(variante, precision='fp32'), carpeta)
+        return cuantizar_int8(base, videos_calibracion, salida=destino)
+
+    model = YOLO(ruta_pt)
+    kwargs = {'format': variante['formato'], 'imgsz': variante['imgsz'],
+              'half': variante['precision'] == 'fp16'}
+    if variante['formato'] == 'onnx':
+        kwargs.update(dynamic=variante['dinamico'], simplify=True, opset=12)
+    salida = model.export(**kwargs)
+    shutil.move(str(salida), str(destino))
+    return destino
+
+
+def frames_de_referencia(video=None, n_frames=50):
+    """Conjunto fijo de frames: del video indicado o sintéticos si no hay"""
+    if video:
+        import cv2
+        cap = cv2.VideoCapture(str(video))
+        frames = []
+        while len(frames) < n_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+        if frames:
+            return frames
+    from captura import fuente_sintetica
+    return list(fuente_sintetica(1280, 720, fps=None, frames=n_frames))
+
+
+def medir_variante(ruta, imgsz, frames, backend='ultralytics', conf=0.25):
+    """Latencia por frame (media y p95 en ms) con el modelo ya calentado
+
+    imgsz_medido es el tamaño con el que realmente se infirió: con
+    onnxruntime el de la entrada del ONNX (un ONNX dinámico se ajusta al
+    imgsz pedido, uno estático conserva el exportado).
+    """
+    import numpy as np
+    from modelos import obtener_modelo, registro
+
+    model = obtener_modelo(str(ruta), imgsz=imgsz, backend=backend)
+    tiempos = []
+    for frame in frames:
+        t0 = time.perf_counter()
+        model(frame, imgsz=imgsz, conf=conf, verbose=False)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    imgsz_medido = getattr(model, 'alto', imgsz)
+    registro.descargar(str(ruta))
+    tiempos = np.asarray(tiempos)
+    return {'ms_media': float(tiempos.mean()), 'ms_p95': float(np.percentile(tiempos, 95)),
+            'fps': float(1000.0 / tiempos.mean()), 'imgsz_medido': int(imgsz_medido)}
+
+
+def medir_precision(ruta, imgsz, data):
+    """mAP@0.5 con el validador de ultralytics (None si no hay dataset o falla)"""
+    if not data:
+        return None
+    from ultralytics import YOLO
+    try:
+        metricas = YOLO(str(ruta), task='detect').val(data=data, imgsz=imgsz, batch=1,
+                                                      plots=False, verbose=False)
+        return float(metricas.box.map50)
+    except Exception as e:
+        print(f"   ⚠️  No se pudo validar {Path(ruta).name}: {e}")
+        return None
+
+
+def generar_manifiesto(ruta_pt, carpeta="variantes", tamanos=TAMANOS_POR_DEFECTO, video=None,
+                       n_frames=50, data=None, videos_calibracion=None, manifiesto=MANIFIESTO):
+    """Exporta la matriz, mide cada variante en este equipo y escribe el manifiesto
+
+    Args:
+        ruta_pt: modelo .pt original
+        carpeta: carpeta donde quedan las variantes exportadas
+        tamanos: valores de imgsz a exportar
+        video: video para el conjunto fijo de frames (None = sintéticos)
+        n_frames: frames del benchmark
+        data: YAML del dataset de validación para el mAP (None = sin mAP)
+        videos_calibracion: carpeta de videos para INT8 (None = sin INT8)
+        manifiesto: ruta del JSON de salida
+    """
+    Path(carpeta).mkdir(exist_ok=True)
+    frames = frames_de_referencia(video, n_frames)
+    entradas = []
+
+    for variante in matriz_variantes(tamanos, int8=bool(videos_calibracion)):
+        etiqueta = _nombre(ruta_pt, variante)
+        print(f"\n📦 {etiqueta}")
+        try:
+            ruta = exportar_variante(ruta_pt, variante, carpeta, videos_calibracion)
+        except Exception as e:
+            print(f"   ✗ Exportación fallida: {e}")
+            continue
+
+        map50 = medir_precision(ruta, variante['imgsz'], data)
+        backends = ['ultralytics'] + (['onnxruntime'] if variante['formato'] == 'onnx' else [])
+        for backend in backends:
+            try:
+                tiempos = medir_variante(ruta, variante['imgsz'], frames, backend)
+            except Exception as e:
+                print(f"   ✗ Benchmark fallido ({backend}): {e}")
+                continue
+            if tiempos['imgsz_medido'] != variante['imgsz']:
+                print(f"   ⚠️  {backend}: se midió a imgsz={tiempos['imgsz_medido']}, "
+                      f"no a {variante['imgsz']}; se descarta")
+                continue
+            print(f"   {backend:<12} {tiempos['ms_media']:7.1f} ms  p95 {tiempos['ms_p95']:7.1f} ms"
+                  f"  {tiempos['fps']:6.1f} FPS  mAP50 {map50 if map50 is not None else '-'}")
+            entradas.append(dict(variante, ruta=str(ruta), backend=backend, map50=map50, **tiempos))
+
+    datos = {
+        'host': platform.node(),
+        'procesador': platform.processor() or platform.machine(),
+        'creado': datetime.now().isoformat(timespec='seconds'),
+        'modelo_origen': str(ruta_pt),
+        'frames': len(frames),
+        'variantes': sorted(entradas, key=lambda e: e['ms_media']),
+    }
+    with open(manifiesto, 'w') as f:
+        json.dump(datos, f, indent=2)
+    print(f"\n📄 Manifiesto guardado: {manifiesto} ({len(entradas)} variantes)")
+    return datos
+
+
+def seleccionar_variante(manifiesto=MANIFIESTO, map50_minimo=0.0):
+    """Variante más rápida del manifiesto con mAP@0.5 >= map50_minimo
+
+    Con map50_minimo > 0 las variantes sin mAP medido no se aceptan. Sólo
+    cuenta el manifiesto medido en este mismo equipo. Devuelve None si no
+    hay manifiesto o ninguna variante cumple.
+    """
+    if not Path(manifiesto).exists():
+        return None
+    with open(manifiesto, 'r') as f:
+        datos = json.load(f)
+    if datos.get('host') != platform.node():
+        print(f"⚠️  {manifiesto} se midió en otro equipo ({datos.get('host')}); se ignora")
+        return None
+
+    candidatas = [
+        v for v in datos['variantes']
+        if os.path.exists(v['ruta']) and
+        (map50_minimo <= 0 or (v['map50'] is not None and v['map50'] >= map50_minimo))
+    ]
+    return min(candidatas, key=lambda v: v['ms_media'], default=None)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exporta la matriz de variantes y las mide en este equipo")
+    parser.add_argument("modelo", help="Modelo .pt original")
+    parser.add_argument("--carpeta", default="variantes")
+    parser.add_argument("--imgsz", type=int, nargs="+", default=list(TAMANOS_POR_DEFECTO))
+    parser.add_argument("--video", help="Video para el conjunto fijo de frames")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--data", help="YAML del dataset para medir mAP")
+    parser.add_argument("--videos-calibracion", help="Carpeta de videos para variantes INT8")
+    parser.add_argument("--map-minimo", type=float, default=0.0)
+    args = parser.parse_args()
+
+    generar_manifiesto(args.modelo, args.carpeta, args.imgsz, args.video, args.frames,
+                       args.data, args.videos_calibracion)
+    mejor = seleccionar_variante(map50_minimo=args.map_minimo)
+    if mejor:
+        print(f"🏆 Seleccionada: {mejor['ruta']} ({mejor['backend']}, imgsz={mejor['imgsz']}, "
+              f"{mejor['ms_media']:.1f} ms)")
+    else:
+        print("⚠️  Ninguna variante cumple el mAP mínimo")